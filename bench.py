@@ -3,13 +3,15 @@
 Benchmarking I/O performance for HPC purpose
 '''
 
-import configparser
+import configparser, functools
 from mpi4py import MPI
-from common import common
+from common import common, workload, histogram, results, sweep, retry, streaming
 from tool.bench_azure_blob import AzureBlobBench
 from tool.bench_azure_file import AzureFileBench
 from tool.bench_cirrus_lustre import CirrusLustreBench
+from tool.bench_mpiio import MPIIOBench
 from tool.base_bench import BaseBench
+from tool.emulator import EmulatedLink, EmulatedBlockBlobService, EmulatedFileService
 
 def bench():
 	# Configurations
@@ -24,6 +26,14 @@ def bench():
 		print('Rank {0} of {1}. Proc name:{2}'.format(rank, size, proc_name))
 		print()
 
+	workload.configure(common.get_config(config_bench, 'workload_pattern', 'constant'), common.get_config(config_bench, 'workload_seed', 0, int))
+
+	# Sweep mode
+	if config.has_section('SWEEP') and common.get_config(config['SWEEP'], 'patterns') is not None:
+		MPI.COMM_WORLD.Barrier()
+		__sweep(config)
+		return
+
 	# Bench specifications
 	bench_items = config_bench['bench_items']
 	bench_targets = config_bench['bench_targets']
@@ -31,8 +41,6 @@ def bench():
 	bench_pattern = config_bench['bench_pattern']
 
 	# Bench infos
-	account_name = config_azure['account_name']
-	account_key = config_azure['account_key']
 	container_name = config_azure['container_name']
 	directory_name = config_azure['directory_name']
 	file_name = config_azure['file_name']
@@ -45,54 +53,322 @@ def bench():
 		print('Bench Target: {0}, Bench Item: {1}, Bench Pattern:{2}, Bench repeat {3} times'.format(bench_targets, bench_items, bench_pattern, repeat_times))
 
 	# Get tool
-	if bench_targets == 'azure_blob':
-		bench_tool = AzureBlobBench(account_name, account_key, [container_name])
-	elif bench_targets == 'azure_file':
-		bench_tool = AzureFileBench(account_name, account_key, [container_name])
-	elif bench_targets == 'cirrus_lustre':
-		bench_tool = CirrusLustreBench()
-	else:
-		bench_tool = BaseBench(None, None, [])
-	
+	request_histogram = histogram.LatencyHistogram()
+	retry_policy = __get_retry_policy(config_bench)
+	bench_tool = __get_bench_tool(bench_targets, config, request_histogram, retry_policy)
+	bench_func = __get_bench_func(bench_tool, bench_items, bench_pattern, config_bench, container_name, directory_name, file_name, output_per_rank, rank)
+
+	# Results
+	result_sink = None
+	nodes = common.get_node_count()
+	results_path = common.get_config(config_bench, 'results_path')
+	if results_path is not None:
+		logical_bytes = __get_logical_bytes(bench_tool, bench_items, bench_pattern, config_bench, container_name, directory_name, file_name, output_per_rank)
+	if results_path is not None and 0 == rank:
+		result_sink = results.ResultSink(results_path, common.get_config(config_bench, 'results_format'))
+		environment = results.get_environment(config_bench, MPI.Get_library_version())
+
+	for repetition in range(0, repeat_times):
+		request_histogram.reset()
+		retry_policy.counters.reset()
+		metrics = bench_func()
+		__print_metrics(*metrics)
+		merged, counters = __print_request_metrics(request_histogram, retry_policy.counters)
+		if result_sink is not None:
+			result_sink.write(results.make_record(bench_targets, bench_items, bench_pattern, repetition, size, nodes, metrics, merged, environment, counters, logical_bytes=logical_bytes))
+
+	bench_tool.close()
+	if result_sink is not None:
+		result_sink.close()
+
+def __sweep(config):
+	'''
+	Run the matrix of targets x patterns x sizes x concurrency x request sizes x rank counts of the SWEEP section in a single launch.
+
+	Each rank count runs on a sub-communicator of the first ranks of MPI.COMM_WORLD, other ranks wait for the point to finish.
+	Bench tools, their storage services and read buffers are reused between points,
+	and every completed point is recorded in the checkpoint so that an interrupted sweep resumes where it stopped.
+	'''
+	config_bench = config['BENCH']
+	config_azure = config['AZURE']
+	config_sweep = config['SWEEP']
+	rank, size, _ = common.get_mpi_env()
+
+	repeat_times = int(config_bench['repeat_time'])
+	container_name = config_azure['container_name']
+	directory_name = config_azure['directory_name']
+	file_name = config_azure['file_name']
+	targets = sweep.parse_list(common.get_config(config_sweep, 'targets', config_bench['bench_targets']))
+	patterns = sweep.parse_list(config_sweep['patterns'])
+	sizes = sweep.parse_list(common.get_config(config_sweep, 'sizes', config_bench['output_per_rank']), int)
+	concurrency = sweep.parse_list(common.get_config(config_sweep, 'concurrency', common.get_config(config_bench, 'read_concurrency', '1')), int)
+	ranks = sweep.parse_list(common.get_config(config_sweep, 'ranks', str(size)), int)
+	request_sizes = sweep.parse_list(common.get_config(config_sweep, 'request_sizes', ''), int) or [None]
+	if max(ranks) > size:
+		raise ValueError('Sweep over {0} ranks exceeds the {1} launched processes'.format(max(ranks), size))
+
+	# Points left from previous launches
+	checkpoint = None
+	points = None
+	if 0 == rank:
+		checkpoint = sweep.Checkpoint(common.get_config(config_sweep, 'checkpoint'))
+		points = [point for point in sweep.expand(targets, patterns, sizes, concurrency, ranks, request_sizes) if not checkpoint.is_completed(point)]
+		print('Sweep of {0} points, {1} left'.format(len(targets) * len(patterns) * len(sizes) * len(concurrency) * len(request_sizes) * len(ranks), len(points)))
+	points = MPI.COMM_WORLD.bcast(points, root=0)
+
+	result_sink = None
+	results_path = common.get_config(config_bench, 'results_path')
+	if results_path is not None and 0 == rank:
+		result_sink = results.ResultSink(results_path, common.get_config(config_bench, 'results_format'))
+		environment = results.get_environment(config_bench, MPI.Get_library_version())
+
+	request_histogram = histogram.LatencyHistogram()
+	retry_policy = __get_retry_policy(config_bench)
+	comms = {}
+	bench_tools = {}
+	for point in points:
+		if point['ranks'] not in comms:
+			comms[point['ranks']] = MPI.COMM_WORLD.Split(0 if rank < point['ranks'] else MPI.UNDEFINED, rank)
+		comm = comms[point['ranks']]
+
+		if comm != MPI.COMM_NULL:
+			if 0 == rank:
+				print('Bench Target: {target}, Bench Item: {item}, Bench Pattern:{pattern}, Size: {size} MiB, Concurrency: {concurrency}, Request Size: {request_size} KiB, Ranks: {ranks}'.format(**point))
+			key = (point['target'], point['concurrency'], point['request_size'])
+			if key not in bench_tools:
+				bench_tools[key] = __get_bench_tool(point['target'], config, request_histogram, retry_policy, point['concurrency'], point['request_size'], comm)
+			bench_tool = bench_tools[key]
+			bench_tool.set_comm(comm)
+			bench_func = __get_bench_func(bench_tool, point['item'], point['pattern'], config_bench, container_name, directory_name,
+				file_name.format(size=point['size']), point['size'], rank, point['concurrency'])
+			nodes = common.get_node_count(comm)
+			if results_path is not None:
+				logical_bytes = __get_logical_bytes(bench_tool, point['item'], point['pattern'], config_bench, container_name, directory_name,
+					file_name.format(size=point['size']), point['size'], comm)
+
+			for repetition in range(0, repeat_times):
+				request_histogram.reset()
+				retry_policy.counters.reset()
+				metrics = bench_func()
+				__print_metrics(*metrics)
+				merged, counters = __print_request_metrics(request_histogram, retry_policy.counters, comm)
+				if result_sink is not None:
+					result_sink.write(results.make_record(point['target'], point['item'], point['pattern'], repetition, point['ranks'], nodes, metrics, merged, environment, counters,
+						concurrency=point['concurrency'], request_size=point['request_size'], logical_bytes=logical_bytes))
+
+		MPI.COMM_WORLD.Barrier()
+		if checkpoint is not None:
+			checkpoint.complete(point)
+
+	for bench_tool in bench_tools.values():
+		bench_tool.close()
+	for comm in comms.values():
+		if comm != MPI.COMM_NULL:
+			comm.Free()
+	if result_sink is not None:
+		result_sink.close()
+
+def __get_bench_func(bench_tool, bench_items, bench_pattern, config_bench, container_name, directory_name, file_name, output_per_rank, rank, concurrency = None):
+	'''
+	Bind a bench pattern of a tool to its arguments, concurrency optionally overrides small_object_concurrency of the BENCH section
+
+	return:
+	 bench_func: callable running one repetition of the bench
+	'''
 	if bench_items == 'input':
 		if bench_pattern == 'SFMR':
-			for _ in range(0, repeat_times):
-				max_time, min_time, avg_time = bench_tool.bench_inputs_with_single_file_multiple_readers(container_name, None, file_name)
-				__print_metrics(max_time, min_time, avg_time)
+			return functools.partial(bench_tool.bench_inputs_with_single_file_multiple_readers, container_name, None, file_name)
 		elif bench_pattern == 'MFMR':
-			for _ in range(0, repeat_times):
-				max_time, min_time, avg_time = bench_tool.bench_inputs_with_multiple_files_multiple_readers(container_name, None, file_name)
-				__print_metrics(max_time, min_time, avg_time)
+			return functools.partial(bench_tool.bench_inputs_with_multiple_files_multiple_readers, container_name, None, file_name)
+		elif bench_pattern == 'SRB':
+			srb_reader = common.get_config(config_bench, 'srb_reader', 'root')
+			broadcast_chunk_size = common.get_config(config_bench, 'broadcast_chunk_size', bench_tool.BROADCAST_CHUNK_DEFAULT, int)
+			return functools.partial(bench_tool.bench_inputs_with_single_reader_broadcast, container_name, directory_name, file_name, srb_reader, broadcast_chunk_size)
+		elif bench_pattern == 'SFPR':
+			partition_layout = common.get_config(config_bench, 'partition_layout', 'contiguous')
+			partition_stripe_size = common.get_config(config_bench, 'partition_stripe_size', bench_tool.PARTITION_STRIPE_DEFAULT, int)
+			partition_allgather = common.get_config(config_bench, 'partition_allgather', False, common.str_to_bool)
+			return functools.partial(bench_tool.bench_inputs_with_single_file_partitioned_readers, container_name, directory_name, file_name, partition_layout, partition_stripe_size, partition_allgather)
+		elif bench_pattern == 'SFSR':
+			stream_chunk_size = common.get_config(config_bench, 'stream_chunk_size', bench_tool.STREAM_CHUNK_DEFAULT, int)
+			stream_buffers = common.get_config(config_bench, 'stream_buffers', 2, int)
+			kernel = streaming.get_kernel(common.get_config(config_bench, 'compute_kernel', 'none'), common.get_config(config_bench, 'compute_repeat', 1, int),
+				common.get_config(config_bench, 'compute_sleep', 0, float))
+			return functools.partial(bench_tool.bench_inputs_with_streaming_readers, container_name, directory_name, file_name, stream_chunk_size, stream_buffers, kernel)
+		elif bench_pattern == 'SFMRNC':
+			return functools.partial(bench_tool.bench_inputs_with_node_cache, container_name, directory_name, file_name)
+		elif bench_pattern == 'SFMRCC':
+			cache_dir = common.get_config(config_bench, 'chunk_cache_dir', bench_tool.CHUNK_CACHE_DIR_DEFAULT)
+			cache_size = common.get_config(config_bench, 'chunk_cache_size', bench_tool.CHUNK_CACHE_SIZE_DEFAULT, int)
+			return functools.partial(bench_tool.bench_inputs_with_chunk_cache, container_name, directory_name, file_name, cache_dir, cache_size)
 		elif bench_pattern == 'MFMRMC':
-			for _ in range(0, repeat_times):
-				max_time, min_time, avg_time = bench_tool.bench_inputs_with_multiple_files_multiple_readers_multiple_containers(container_name, None, file_name)
-				__print_metrics(max_time, min_time, avg_time)
+			return functools.partial(bench_tool.bench_inputs_with_multiple_files_multiple_readers_multiple_containers, container_name, None, file_name)
 		else:
 			raise NotImplementedError()
 	elif bench_items == 'output':
+		# Objects of MSO are generated by the pattern, no payload of output_per_rank is needed
+		if bench_pattern == 'MSO':
+			object_count = common.get_config(config_bench, 'small_object_count', bench_tool.SMALL_OBJECT_COUNT_DEFAULT, int)
+			object_size = common.get_config(config_bench, 'small_object_size', bench_tool.SMALL_OBJECT_SIZE_DEFAULT, int)
+			if concurrency is None:
+				concurrency = common.get_config(config_bench, 'small_object_concurrency', common.get_config(config_bench, 'write_concurrency', None, int), int)
+			return functools.partial(bench_tool.bench_metadata_operations, container_name, directory_name, file_name, object_count, object_size, concurrency)
+		data = common.workload_generator(rank, output_per_rank << 20)
 		if bench_pattern == 'SFMW':
-			data = common.workload_generator(rank, output_per_rank << 20)
-			for _ in range(0, repeat_times):
-				max_time, min_time, avg_time = bench_tool.bench_outputs_with_single_file_multiple_writers(container_name, directory_name, file_name, output_per_rank, data)
-				__print_metrics(max_time, min_time, avg_time)
+			return functools.partial(bench_tool.bench_outputs_with_single_file_multiple_writers, container_name, directory_name, file_name, output_per_rank, data)
 		elif bench_pattern == 'MFMW':
-			data = common.workload_generator(rank, output_per_rank << 20)
-			for _ in range(0, repeat_times):
-				max_time, min_time, avg_time = bench_tool.bench_outputs_with_multiple_files_multiple_writers(container_name, directory_name, file_name, output_per_rank, data = data)
-				__print_metrics(max_time, min_time, avg_time)
+			return functools.partial(bench_tool.bench_outputs_with_multiple_files_multiple_writers, container_name, directory_name, file_name, output_per_rank, data = data)
 		elif bench_pattern == 'MFMWMC':
-			data = common.workload_generator(rank, output_per_rank << 20)
-			for _ in range(0, repeat_times):
-				max_time, min_time, avg_time = bench_tool.bench_outputs_with_multiple_files_multiple_writers_multiple_containers(container_name, directory_name, file_name, output_per_rank, data = data)
-				__print_metrics(max_time, min_time, avg_time)
+			return functools.partial(bench_tool.bench_outputs_with_multiple_files_multiple_writers_multiple_containers, container_name, directory_name, file_name, output_per_rank, data = data)
+		elif bench_pattern in ('SFAW', 'MFAW'):
+			aggregators = common.get_config(config_bench, 'aggregators_per_node', 1, int)
+			layout = 'single' if bench_pattern == 'SFAW' else 'multiple'
+			return functools.partial(bench_tool.bench_outputs_with_aggregated_writers, container_name, directory_name, file_name, output_per_rank, data, aggregators, layout)
+		elif bench_pattern == 'SFWB':
+			write_behind_memory = common.get_config(config_bench, 'write_behind_memory', bench_tool.WRITE_BEHIND_CAP_DEFAULT, int)
+			write_behind_threads = common.get_config(config_bench, 'write_behind_threads', None, int)
+			return functools.partial(bench_tool.bench_outputs_with_write_behind, container_name, directory_name, file_name, output_per_rank, data, write_behind_memory, write_behind_threads)
 		else:
 			raise NotImplementedError()
+	else:
+		raise NotImplementedError()
+
+def __get_logical_bytes(bench_tool, bench_items, bench_pattern, config_bench, container_name, directory_name, file_name, output_per_rank, comm = MPI.COMM_WORLD):
+	'''
+	Bytes of all ranks written by an output pattern, or delivered to the application by an input pattern, in one repetition,
+	whatever the requests, shares or retries used to move them. Sources are named the same way as in __get_bench_func.
+
+	return:
+	 logical_bytes: total bytes of all ranks
+	'''
+	nprocs = comm.Get_size()
+	if bench_items == 'output':
+		if bench_pattern == 'MSO':
+			object_count = common.get_config(config_bench, 'small_object_count', bench_tool.SMALL_OBJECT_COUNT_DEFAULT, int)
+			object_size = common.get_config(config_bench, 'small_object_size', bench_tool.SMALL_OBJECT_SIZE_DEFAULT, int)
+			return object_count * (object_size << 10) * nprocs
+		return (output_per_rank << 20) * nprocs
+	if bench_pattern == 'MFMR':
+		return comm.allreduce(bench_tool.get_input_size(container_name, None, file_name, 'multiple'), op=MPI.SUM)
+	if bench_pattern == 'MFMRMC':
+		return comm.allreduce(bench_tool.get_input_size(container_name, None, file_name, 'multiple_containers'), op=MPI.SUM)
+	input_size = None
+	if 0 == comm.Get_rank():
+		input_size = bench_tool.get_input_size(container_name, None if bench_pattern == 'SFMR' else directory_name, file_name)
+	input_size = comm.bcast(input_size, root=0)
+	# Without allgather each share of SFPR is delivered to a single rank
+	if bench_pattern == 'SFPR' and not common.get_config(config_bench, 'partition_allgather', False, common.str_to_bool):
+		return input_size
+	return input_size * nprocs
+
+def __get_retry_policy(config_bench):
+	'''
+	Create the retry policy of Azure Blob and Azure File requests from the BENCH section
+
+	return:
+	 retry_policy: RetryPolicy, optionally paced by a per-rank token bucket
+	'''
+	rate_limiter = None
+	rate_limit = common.get_config(config_bench, 'rate_limit', 0, float)
+	if rate_limit > 0:
+		rate_limiter = retry.TokenBucket(rate_limit, common.get_config(config_bench, 'rate_burst', None, float))
+	return retry.RetryPolicy(common.get_config(config_bench, 'retry_max', 5, int), common.get_config(config_bench, 'retry_backoff', 100, float) / 1000,
+		common.get_config(config_bench, 'retry_max_backoff', 10000, float) / 1000, common.get_config(config_bench, 'retry_jitter', 1, float), rate_limiter)
+
+def __get_bench_tool(bench_targets, config, request_histogram = None, retry_policy = None, concurrency = None, request_size = None, comm = MPI.COMM_WORLD):
+	'''
+	Create the bench tool of a bench target
+
+	param:
+	 bench_targets: `azure_blob`, `azure_file`, their asyncio variants `azure_blob_async` and `azure_file_async`,
+	  their local emulations `emulated_blob` and `emulated_file`, `cirrus_lustre`, or `mpiio`
+	 config: parsed config.ini
+	 request_histogram: optional LatencyHistogram recording every storage request
+	 retry_policy: optional RetryPolicy of Azure Blob and Azure File requests
+	 concurrency: optional read and write concurrency overriding the BENCH section
+	 request_size: optional size of each request in KiB overriding read_chunk_size, block_size and write_chunk_size of the BENCH section,
+	  Azure File writes are capped at FILE_CHUNK_LIMIT, reads use the parallel read engine
+	 comm: communicator of processes taking part in the benches
+
+	return:
+	 bench_tool: bench tool of the target
+	'''
+	config_bench = config['BENCH']
+	config_azure = config['AZURE']
+	account_name = config_azure['account_name']
+	account_key = config_azure['account_key']
+	container_name = config_azure['container_name']
+
+	if bench_targets == 'cirrus_lustre':
+		return CirrusLustreBench(common.get_config(config_bench, 'lustre_read_engine', 'text'), common.get_config(config_bench, 'lustre_read_chunk_size', None, int),
+			common.get_config(config_bench, 'lustre_madvise', 'sequential'), common.get_config(config_bench, 'lustre_fsync', False, common.str_to_bool),
+			sweep.parse_list(common.get_config(config_bench, 'lustre_stripe_count', ''), int), sweep.parse_list(common.get_config(config_bench, 'lustre_stripe_size', ''), int),
+			common.get_config(config_bench, 'lustre_write_chunk_size', CirrusLustreBench.WRITE_BEHIND_CHUNK_DEFAULT, int), request_histogram=request_histogram, comm=comm)
+	if bench_targets == 'mpiio':
+		hints = dict(hint.split('=', 1) for hint in sweep.parse_list(common.get_config(config_bench, 'mpiio_hints', '')))
+		return MPIIOBench(common.get_config(config_bench, 'mpiio_access', 'independent'), hints, common.get_config(config_bench, 'mpiio_chunk_size', MPIIOBench.CHUNK_DEFAULT, int),
+			request_histogram=request_histogram, comm=comm)
+	if bench_targets not in ('azure_blob', 'azure_file', 'azure_blob_async', 'azure_file_async', 'emulated_blob', 'emulated_file'):
+		return BaseBench(None, None, [], comm)
+
+	io_engine = 'asyncio' if bench_targets.endswith('_async') else 'threads'
+	read_engine = common.get_config(config_bench, 'read_engine', 'parallel' if io_engine == 'asyncio' else 'sequential')
+	read_concurrency = common.get_config(config_bench, 'read_concurrency', 1, int)
+	write_concurrency = common.get_config(config_bench, 'write_concurrency', 1, int)
+	if concurrency is not None:
+		read_concurrency = write_concurrency = concurrency
+	# Only the parallel read engine splits reads into read_chunk_size requests, the sequential engine reads sections of SECTION_LIMIT
+	if request_size is not None:
+		read_engine = 'parallel'
+
+	storage_service = None
+	if bench_targets.startswith('emulated_'):
+		config_emulator = config['EMULATOR']
+		link = EmulatedLink(common.get_config(config_emulator, 'latency', 0, float), common.get_config(config_emulator, 'bandwidth', 0, float),
+			common.get_config(config_emulator, 'request_rate', 0, float), common.get_config(config_emulator, 'throttle_probability', 0, float),
+			common.get_config(config_emulator, 'seed', 0, int) + MPI.COMM_WORLD.Get_rank())
+		emulator_root = common.get_config(config_emulator, 'root', 'emulator')
+		if bench_targets == 'emulated_blob':
+			storage_service = EmulatedBlockBlobService(emulator_root, link)
+		else:
+			storage_service = EmulatedFileService(emulator_root, link)
+
+	# Every ranged read goes through a chunk cache shared by the processes of a node once a cache directory is set,
+	# SFMRCC measures its own cache of each rank instead
+	chunk_cache_dir = common.get_config(config_bench, 'chunk_cache_dir', None)
+	chunk_cache_size = common.get_config(config_bench, 'chunk_cache_size', BaseBench.CHUNK_CACHE_SIZE_DEFAULT, int)
+
+	if bench_targets in ('azure_blob', 'azure_blob_async', 'emulated_blob'):
+		read_chunk_size = common.get_config(config_bench, 'read_chunk_size', AzureBlobBench.READ_CHUNK_DEFAULT, int)
+		block_size = common.get_config(config_bench, 'block_size', AzureBlobBench.BLOCK_LIMIT << 10, int)
+		if request_size is not None:
+			read_chunk_size = block_size = request_size
+		return AzureBlobBench(account_name, account_key, [container_name], read_engine=read_engine, read_concurrency=read_concurrency, read_chunk_size=read_chunk_size,
+			write_concurrency=write_concurrency, block_size=block_size, io_engine=io_engine, storage_service=storage_service, request_histogram=request_histogram, retry_policy=retry_policy, comm=comm,
+			chunk_cache_dir=chunk_cache_dir, chunk_cache_size=chunk_cache_size)
+	else:
+		read_chunk_size = common.get_config(config_bench, 'read_chunk_size', AzureFileBench.READ_CHUNK_DEFAULT, int)
+		write_chunk_size = common.get_config(config_bench, 'write_chunk_size', AzureFileBench.FILE_CHUNK_LIMIT << 10, int)
+		write_layout = common.get_config(config_bench, 'write_layout', 'contiguous')
+		if request_size is not None:
+			read_chunk_size = request_size
+			write_chunk_size = min(request_size, AzureFileBench.FILE_CHUNK_LIMIT << 10)
+		return AzureFileBench(account_name, account_key, [container_name], read_engine=read_engine, read_concurrency=read_concurrency, read_chunk_size=read_chunk_size,
+			write_concurrency=write_concurrency, write_chunk_size=write_chunk_size, write_layout=write_layout, io_engine=io_engine, storage_service=storage_service, request_histogram=request_histogram, retry_policy=retry_policy, comm=comm,
+			chunk_cache_dir=chunk_cache_dir, chunk_cache_size=chunk_cache_size)
 
 def __print_metrics(*items):
 	rank, _, _ = common.get_mpi_env()
 	if 0 == rank:
 		print(str(items)[1:-1])
 
+def __print_request_metrics(request_histogram, request_counters, comm = MPI.COMM_WORLD):
+	merged = request_histogram.reduce(comm)
+	counters = request_counters.reduce(comm)
+	if merged is not None:
+		print(', '.join('{0}: {1}'.format(name, value) for name, value in merged.summary() + counters))
+	return merged, counters
+
 
 if __name__ == '__main__':
 	bench()
\ No newline at end of file
@@ -0,0 +1,194 @@
+'''
+On-disk chunk cache for azure-hpc-io benchmarking
+
+Chunks of remote objects are kept as files on local disk, e.g. the temporary storage of a VM, so that repeated reads across
+repetitions or jobs are served locally. A chunk is keyed by container/object/etag/range: a modified object has a new etag
+and misses, its stale chunks age out. The total size of chunks is bounded with a least recently used eviction policy,
+recency is kept in the modification time of chunk files so that it survives across jobs.
+'''
+
+import os, hashlib, threading, collections
+
+CHUNK_SUFFIX = '.chunk'
+
+class ChunkCache(object):
+	'''
+	Size-bounded LRU cache of object chunks in a local directory.
+	Processes may share a directory, chunks are written atomically and each process enforces the capacity from its own view.
+
+	param:
+	 root: cache directory, created if missing
+	 capacity: maximum total size of chunks in bytes
+	'''
+	__slots__ = ('__root', '__capacity', '__index', '__size', '__lock', '__hits', '__misses')
+
+	def __init__(self, root, capacity):
+		if capacity <= 0:
+			raise ValueError('Cache capacity of {} bytes is not positive'.format(capacity))
+		os.makedirs(root, exist_ok=True)
+		self.__root = root
+		self.__capacity = capacity
+		self.__lock = threading.Lock()
+		self.__hits = 0
+		self.__misses = 0
+		# Chunk paths and sizes, least recently used first
+		entries = []
+		for name in os.listdir(root):
+			if name.endswith(CHUNK_SUFFIX):
+				path = os.path.join(root, name)
+				try:
+					stat = os.stat(path)
+				except FileNotFoundError:
+					continue
+				entries.append((stat.st_mtime, path, stat.st_size))
+		self.__index = collections.OrderedDict((path, size) for _, path, size in sorted(entries))
+		self.__size = sum(self.__index.values())
+		with self.__lock:
+			self.__evict()
+
+	@property
+	def size(self):
+		'''
+		Total size of cached chunks in bytes
+		'''
+		return self.__size
+
+	@property
+	def hits(self):
+		return self.__hits
+
+	@property
+	def misses(self):
+		return self.__misses
+
+	def reset_counters(self):
+		self.__hits = 0
+		self.__misses = 0
+
+	def __get_path(self, name, start, end):
+		key = hashlib.sha1('{0}/{1}-{2}'.format(name, start, end).encode('utf-8')).hexdigest()
+		return os.path.join(self.__root, key + CHUNK_SUFFIX)
+
+	def __evict(self):
+		while self.__size > self.__capacity and self.__index:
+			path, size = self.__index.popitem(last=False)
+			self.__size = self.__size - size
+			try:
+				os.remove(path)
+			except FileNotFoundError:
+				pass
+
+	def read_into(self, name, start, end, view):
+		'''
+		Read a cached chunk into view
+
+		param:
+		 name: object name, composed of container/object/etag
+		 start: start of the inclusive range of the chunk
+		 end: end of the inclusive range of the chunk
+		 view: writable memoryview of end - start + 1 bytes
+
+		return:
+		 hit: indicate whether the chunk was cached
+		'''
+		path = self.__get_path(name, start, end)
+		try:
+			with open(path, 'rb', buffering=0) as f:
+				count = f.readinto(view)
+			os.utime(path)
+		except FileNotFoundError:
+			count = -1
+		with self.__lock:
+			if count != len(view):
+				self.__misses = self.__misses + 1
+				return False
+			self.__hits = self.__hits + 1
+			if path in self.__index:
+				self.__index.move_to_end(path)
+			else:
+				self.__index[path] = count
+				self.__size = self.__size + count
+				self.__evict()
+		return True
+
+	def write(self, name, start, end, view):
+		'''
+		Cache a chunk, chunks larger than the capacity are not cached
+		'''
+		if len(view) > self.__capacity:
+			return
+		path = self.__get_path(name, start, end)
+		temp_path = '{0}.{1}.{2}.tmp'.format(path, os.getpid(), threading.get_ident())
+		with open(temp_path, 'wb', buffering=0) as f:
+			f.write(view)
+		os.replace(temp_path, path)
+		with self.__lock:
+			self.__size = self.__size + len(view) - self.__index.pop(path, 0)
+			self.__index[path] = len(view)
+			self.__evict()
+
+	def remove(self, name, start, end):
+		'''
+		Drop a chunk from the cache if it is cached
+		'''
+		path = self.__get_path(name, start, end)
+		with self.__lock:
+			self.__size = self.__size - self.__index.pop(path, 0)
+		try:
+			os.remove(path)
+		except FileNotFoundError:
+			pass
+
+	def clear(self):
+		'''
+		Drop every chunk from the cache
+		'''
+		with self.__lock:
+			paths = list(self.__index)
+			self.__index.clear()
+			self.__size = 0
+		for path in paths:
+			try:
+				os.remove(path)
+			except FileNotFoundError:
+				pass
+
+	def drop_page_cache(self):
+		'''
+		Write cached chunks back and drop them from the page cache with posix_fadvise, so that following hits read the local disk
+		instead of memory. Nothing is dropped where posix_fadvise is not available.
+		'''
+		if not hasattr(os, 'posix_fadvise'):
+			return
+		with self.__lock:
+			paths = list(self.__index)
+		for path in paths:
+			try:
+				fd = os.open(path, os.O_RDONLY)
+			except FileNotFoundError:
+				continue
+			try:
+				os.fdatasync(fd)
+				os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+			finally:
+				os.close(fd)
+
+	def fetch_into(self, fetch_into, name, start, end, view):
+		'''
+		Read a chunk through the cache, fetching and caching it on a miss
+
+		param:
+		 fetch_into: callable(start, end, view) which reads the inclusive range [start, end] from storage into view
+		 name: object name, composed of container/object/etag
+		 start: start of the inclusive range of the chunk
+		 end: end of the inclusive range of the chunk
+		 view: writable memoryview of end - start + 1 bytes
+
+		return:
+		 hit: indicate whether the chunk was cached
+		'''
+		if self.read_into(name, start, end, view):
+			return True
+		fetch_into(start, end, view)
+		self.write(name, start, end, view)
+		return False
@@ -0,0 +1,230 @@
+'''
+MPI collective helpers for azure-hpc-io benchmarking
+'''
+
+import bisect, itertools
+from mpi4py import MPI
+from common import ranged_io
+
+# Counts and displacements of MPI collectives are C int, larger exchanges are split into rounds of at most ROUND_LIMIT bytes
+ROUND_LIMIT = 1 << 30 # in bytes
+
+def get_broadcast_comm(reader, comm = MPI.COMM_WORLD):
+	'''
+	Get the communicator used for distributing data read by a single reader
+
+	param:
+	 reader: `root` for a single reader on rank 0 of comm, `node` for one reader per node
+	 comm: parent communicator
+
+	return:
+	 broadcast_comm: communicator whose rank 0 is the reader, should be freed by the caller if it is not comm
+	'''
+	if reader == 'root':
+		return comm
+	elif reader == 'node':
+		return comm.Split_type(MPI.COMM_TYPE_SHARED, key=comm.Get_rank())
+	else:
+		raise ValueError('Unknown reader {}'.format(reader))
+
+def pipelined_broadcast(comm, fetch_into, size, chunk_size):
+	'''
+	Read an object on rank 0 of comm and broadcast it to every ranks in chunks.
+
+	Two chunk buffers are used, the reader fetches the next chunk while the previous one is being broadcast.
+
+	param:
+	 comm: communicator whose rank 0 is the reader
+	 fetch_into: callable(start, end, view) which reads the inclusive range [start, end] into view, only called on the reader
+	 size: size of the object in bytes
+	 chunk_size: size of each broadcast chunk in bytes
+	'''
+	is_reader = 0 == comm.Get_rank()
+	slots = [memoryview(bytearray(min(chunk_size, size))) for _ in range(0, 2)]
+	request = None
+	for index, (start, end) in enumerate(ranged_io.split_ranges(0, size, chunk_size)):
+		view = slots[index % 2][0:end - start + 1]
+		if is_reader:
+			fetch_into(start, end, view)
+		# The slot is reused only after the broadcast issued two chunks earlier has completed
+		if request is not None:
+			request.Wait()
+		request = comm.Ibcast([view, MPI.BYTE], root=0)
+	if request is not None:
+		request.Wait()
+
+def partitioned_read(comm, fetch_into, size, layout, stripe_size, allgather):
+	'''
+	Read an object cooperatively, each rank fetches only its share of bytes.
+
+	With allgather, shares are exchanged with MPI_Allgatherv so that every rank ends up with the entire object.
+	For the `strided` layout the stripes are packed in a staging buffer, so that a single Allgatherv exchanges up to ROUND_LIMIT bytes of stripes.
+
+	param:
+	 comm: communicator sharing the object
+	 fetch_into: callable(start, end, view) which reads the inclusive range [start, end] into view
+	 size: size of the object in bytes
+	 layout: `contiguous` or `strided`, see ranged_io.partition_ranges
+	 stripe_size: size of each stripe in bytes for the `strided` layout
+	 allgather: indicate whether to gather the entire object on every ranks
+
+	return:
+	 read_bytes: number of bytes fetched by current rank
+	'''
+	rank = comm.Get_rank()
+	nprocs = comm.Get_size()
+	ranges = ranged_io.partition_ranges(size, rank, nprocs, layout, stripe_size)
+	read_bytes = sum(end - start + 1 for start, end in ranges)
+
+	if not allgather:
+		view = ranged_io.get_read_buffer(read_bytes)
+		offset = 0
+		for start, end in ranges:
+			fetch_into(start, end, view[offset:offset + end - start + 1])
+			offset = offset + end - start + 1
+		return read_bytes
+
+	view = ranged_io.get_read_buffer(size)
+	for start, end in ranges:
+		fetch_into(start, end, view[start:end + 1])
+	allgather_partitions(comm, view, size, layout, stripe_size)
+
+	return read_bytes
+
+def allgather_partitions(comm, view, size, layout, stripe_size):
+	'''
+	Exchange the shares of an object partitioned with ranged_io.partition_ranges, so that every rank holds the entire object
+
+	param:
+	 comm: communicator sharing the object
+	 view: writable memoryview of `size` bytes holding the share of current rank at its offsets in the object
+	 size: size of the object in bytes
+	 layout: `contiguous` or `strided`
+	 stripe_size: size of each stripe in bytes for the `strided` layout
+	'''
+	nprocs = comm.Get_size()
+	shares = [ranged_io.partition_ranges(size, proc, nprocs, layout, stripe_size) for proc in range(0, nprocs)]
+	if layout == 'contiguous' and size <= ROUND_LIMIT:
+		counts = [share[0][1] - share[0][0] + 1 if share else 0 for share in shares]
+		displacements = [share[0][0] if share else 0 for share in shares]
+		comm.Allgatherv(MPI.IN_PLACE, [view, (counts, displacements), MPI.BYTE])
+	else:
+		__allgather_in_rounds(comm, view, shares)
+
+def __allgather_in_rounds(comm, view, shares):
+	'''
+	Allgatherv of the shares of view in rounds through a staging buffer of at most ROUND_LIMIT bytes.
+	The ranges of each share are packed back to back in the staging buffer, each round exchanges the next ROUND_LIMIT // nprocs bytes of every share
+
+	param:
+	 comm: communicator sharing view
+	 view: writable memoryview holding the share of current rank
+	 shares: list of inclusive (start, end) ranges of view owned by each rank
+	'''
+	rank = comm.Get_rank()
+	nprocs = comm.Get_size()
+	# Offset of each range in its packed share, followed by the length of the share
+	packed_offsets = [[0] + list(itertools.accumulate(end - start + 1 for start, end in share)) for share in shares]
+	lengths = [offsets[-1] for offsets in packed_offsets]
+	round_size = min(ROUND_LIMIT // nprocs, max(lengths))
+	if round_size == 0:
+		return
+	staging = memoryview(bytearray(round_size * nprocs))
+	round_displacements = [proc * round_size for proc in range(0, nprocs)]
+	for round_start in range(0, max(lengths), round_size):
+		round_counts = [max(0, min(round_size, length - round_start)) for length in lengths]
+		position = round_displacements[rank]
+		for start, end in __get_packed_ranges(shares[rank], packed_offsets[rank], round_start, round_counts[rank]):
+			staging[position:position + end - start + 1] = view[start:end + 1]
+			position = position + end - start + 1
+		comm.Allgatherv(MPI.IN_PLACE, [staging, (round_counts, round_displacements), MPI.BYTE])
+		for proc in range(0, nprocs):
+			if proc == rank:
+				continue
+			position = round_displacements[proc]
+			for start, end in __get_packed_ranges(shares[proc], packed_offsets[proc], round_start, round_counts[proc]):
+				view[start:end + 1] = staging[position:position + end - start + 1]
+				position = position + end - start + 1
+
+def __get_packed_ranges(share, packed_offsets, packed_start, count):
+	'''
+	Get the ranges of view holding `count` bytes of a packed share from `packed_start`
+
+	param:
+	 share: inclusive (start, end) ranges of view
+	 packed_offsets: offset of each range in the packed share
+	 packed_start: offset of the first byte in the packed share
+	 count: number of bytes
+
+	return:
+	 ranges: list of inclusive (start, end) tuples
+	'''
+	ranges = []
+	packed_end = packed_start + count
+	index = bisect.bisect_right(packed_offsets, packed_start) - 1
+	while packed_start < packed_end:
+		start, end = share[index]
+		start = start + packed_start - packed_offsets[index]
+		length = min(end - start + 1, packed_end - packed_start)
+		ranges.append((start, start + length - 1))
+		packed_start = packed_start + length
+		index = index + 1
+	return ranges
+
+def get_aggregation_comms(aggregators, comm = MPI.COMM_WORLD):
+	'''
+	Split the ranks of each node into groups served by an aggregator.
+
+	Ranks on a node, found with MPI_Comm_split_type, are divided into `aggregators` groups of consecutive node ranks,
+	rank 0 of each group is its aggregator. Nodes with fewer ranks than aggregators get one aggregator per rank.
+
+	param:
+	 aggregators: number of aggregators per node
+	 comm: parent communicator
+
+	return:
+	 group_comm: communicator of the group of current rank, rank 0 is the aggregator
+	 aggregator_comm: communicator of all aggregators ordered by rank in comm, MPI.COMM_NULL on other ranks
+	 both should be freed by the caller
+	'''
+	node_comm = comm.Split_type(MPI.COMM_TYPE_SHARED, key=comm.Get_rank())
+	node_rank = node_comm.Get_rank()
+	node_size = node_comm.Get_size()
+	node_aggregators = max(1, min(aggregators, node_size))
+	group_comm = node_comm.Split(node_rank * node_aggregators // node_size, node_rank)
+	node_comm.Free()
+	aggregator_comm = comm.Split(0 if 0 == group_comm.Get_rank() else MPI.UNDEFINED, comm.Get_rank())
+	return group_comm, aggregator_comm
+
+def gather_to_aggregator(group_comm, view):
+	'''
+	Gather the data of every rank of a group on its aggregator with MPI_Gatherv, ordered by group rank
+
+	param:
+	 group_comm: communicator whose rank 0 is the aggregator
+	 view: bytes-like data of current rank
+
+	return:
+	 aggregated: memoryview of the data of the whole group on the aggregator, None on other ranks
+	'''
+	counts = group_comm.allgather(len(view))
+	is_aggregator = 0 == group_comm.Get_rank()
+	aggregated = memoryview(bytearray(sum(counts))) if is_aggregator else None
+	displacements = [sum(counts[0:i]) for i in range(0, len(counts))]
+	if sum(counts) <= ROUND_LIMIT:
+		group_comm.Gatherv([view, MPI.BYTE], [aggregated, (counts, displacements), MPI.BYTE] if is_aggregator else None, root=0)
+		return aggregated
+
+	# Each round gathers the next ROUND_LIMIT // group size bytes of every rank in a staging buffer of the aggregator
+	round_size = ROUND_LIMIT // len(counts)
+	staging = memoryview(bytearray(round_size * len(counts))) if is_aggregator else None
+	round_displacements = [i * round_size for i in range(0, len(counts))]
+	for round_start in range(0, max(counts), round_size):
+		round_counts = [max(0, min(round_size, count - round_start)) for count in counts]
+		send = view[round_start:round_start + round_counts[group_comm.Get_rank()]]
+		group_comm.Gatherv([send, MPI.BYTE], [staging, (round_counts, round_displacements), MPI.BYTE] if is_aggregator else None, root=0)
+		if is_aggregator:
+			for i, count in enumerate(round_counts):
+				start = displacements[i] + round_start
+				aggregated[start:start + count] = staging[round_displacements[i]:round_displacements[i] + count]
+	return aggregated
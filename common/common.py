@@ -6,13 +6,15 @@ Common tools for azure-hpc-io benchmarking
 import sys, configparser
 import numpy as np
 from mpi4py import MPI
+from common import workload, ranged_io
 
-def collect_bench_metrics(time, precision = 3):
+def collect_bench_metrics(time, precision = 3, comm = MPI.COMM_WORLD):
 	'''
 	Clollect input benchmarking metrics
 
 	param:
 	 time: elapsed time for a single reading
+	 comm: communicator of processes taking part in the bench
 	
 	return:
 	 max_time: maximum operation time
@@ -26,16 +28,128 @@ def collect_bench_metrics(time, precision = 3):
 	avg_read_time = np.zeros(1)
 	read_time[0] = time
 
-	MPI.COMM_WORLD.Reduce(read_time, max_read_time, MPI.MAX)
-	MPI.COMM_WORLD.Reduce(read_time, min_read_time, MPI.MIN)
-	MPI.COMM_WORLD.Reduce(read_time, avg_read_time, MPI.SUM)
+	comm.Reduce(read_time, max_read_time, MPI.MAX)
+	comm.Reduce(read_time, min_read_time, MPI.MIN)
+	comm.Reduce(read_time, avg_read_time, MPI.SUM)
 
 	max_read_time[0] = round(max_read_time[0], precision)
 	min_read_time[0] = round(min_read_time[0], precision)
-	avg_read_time[0] = round(avg_read_time[0] / MPI.COMM_WORLD.Get_size(), precision)
+	avg_read_time[0] = round(avg_read_time[0] / comm.Get_size(), precision)
 
 	return max_read_time[0], min_read_time[0], avg_read_time[0]
 
+def collect_bench_bandwidth(total_bytes, max_time, precision = 3):
+	'''
+	Collective bandwidth of an operation, total bytes moved by all processes divided by the time of the slowest process
+
+	param:
+	 total_bytes: bytes moved by all processes
+	 max_time: maximum operation time
+
+	return:
+	 bandwidth: bandwidth in MiB/s, 0 if max_time is not available
+	'''
+	if max_time <= 0:
+		return 0
+	return round(total_bytes / max_time / (1 << 20), precision)
+
+def collect_overlap_metrics(time, io_time, compute_time, wait_time, precision = 3, comm = MPI.COMM_WORLD):
+	'''
+	Collect metrics of an input overlapped with compute
+
+	param:
+	 time: elapsed time of streaming and compute
+	 io_time: time spent fetching chunks
+	 compute_time: time spent computing on chunks
+	 wait_time: time compute waited for chunks
+	 comm: communicator of processes taking part in the bench
+
+	return:
+	 max_time: maximum elapsed time
+	 min_time: minimum elapsed time
+	 avg_time: average elapsed time
+	 avg_io_time: average I/O time
+	 avg_compute_time: average compute time
+	 avg_wait_time: average time compute waited for I/O
+	 hidden_io: fraction of I/O time hidden behind compute
+	'''
+	max_time, min_time, avg_time = collect_bench_metrics(time, precision, comm)
+	_, _, avg_io_time = collect_bench_metrics(io_time, precision, comm)
+	_, _, avg_compute_time = collect_bench_metrics(compute_time, precision, comm)
+	_, _, avg_wait_time = collect_bench_metrics(wait_time, precision, comm)
+	hidden_io = round(max(0, 1 - avg_wait_time / avg_io_time), precision) if avg_io_time > 0 else 0
+	return max_time, min_time, avg_time, avg_io_time, avg_compute_time, avg_wait_time, hidden_io
+
+def collect_bench_rate(total_count, max_time, precision = 3):
+	'''
+	Collective operation rate, operations of all processes divided by the time of the slowest process
+
+	param:
+	 total_count: operations performed by all processes
+	 max_time: maximum operation time
+
+	return:
+	 rate: operations per second, 0 if max_time is not available
+	'''
+	if max_time <= 0:
+		return 0
+	return round(total_count / max_time, precision)
+
+def time_phase(func, items, concurrency, comm = MPI.COMM_WORLD):
+	'''
+	Time a phase of operations, func(*item) is called for every item with at most `concurrency` calls in flight, between barriers
+
+	return:
+	 time: elapsed time of the phase on current rank
+	'''
+	comm.Barrier()
+	start = MPI.Wtime()
+	ranged_io.run_concurrently(func, items, concurrency)
+	end = MPI.Wtime()
+	comm.Barrier()
+	return end - start
+
+def collect_bench_rates(phase_times, phase_counts, precision = 3, comm = MPI.COMM_WORLD):
+	'''
+	Collective operation rates of phases timed with time_phase.
+	Unlike collect_bench_metrics, maximum times are not rounded, so that phases shorter than the precision still get a rate.
+
+	param:
+	 phase_times: elapsed time of each phase on current rank
+	 phase_counts: operations performed by current rank in each phase
+
+	return:
+	 rates: operations per second of all processes in each phase
+	'''
+	return [collect_bench_rate(comm.allreduce(count, op=MPI.SUM), comm.allreduce(time, op=MPI.MAX), precision) for time, count in zip(phase_times, phase_counts)]
+
+def collect_write_behind_metrics(visible_time, durable_time, stall_time, total_bytes, precision = 3, comm = MPI.COMM_WORLD):
+	'''
+	Collect metrics of write-behind outputs
+
+	param:
+	 visible_time: time the application was blocked handing buffers over
+	 durable_time: time until outputs were durable, including the visible time
+	 stall_time: time the application was blocked by the memory cap, included in the visible time
+	 total_bytes: bytes written by all processes
+	 comm: communicator of processes taking part in the bench
+
+	return:
+	 max_visible_time: maximum visible time
+	 min_visible_time: minimum visible time
+	 avg_visible_time: average visible time
+	 max_durable_time: maximum time to durability
+	 min_durable_time: minimum time to durability
+	 avg_durable_time: average time to durability
+	 bandwidth: collective bandwidth in MiB/s, total bytes divided by maximum time to durability
+	 max_stall_time: maximum time blocked by the memory cap
+	'''
+	max_visible_time, min_visible_time, avg_visible_time = collect_bench_metrics(visible_time, precision, comm)
+	max_durable_time, min_durable_time, avg_durable_time = collect_bench_metrics(durable_time, precision, comm)
+	max_stall_time, _, _ = collect_bench_metrics(stall_time, precision, comm)
+	bandwidth = collect_bench_bandwidth(total_bytes, max_durable_time, precision)
+	return max_visible_time, min_visible_time, avg_visible_time, max_durable_time, min_durable_time, avg_durable_time, bandwidth, max_stall_time
+
 def get_mpi_env():
 	'''
 	Get MPI environmental parameters.
@@ -47,5 +161,48 @@ def get_mpi_env():
 	'''
 	return MPI.COMM_WORLD.Get_rank(), MPI.COMM_WORLD.Get_size(), MPI.Get_processor_name()
 
+def get_node_count(comm = MPI.COMM_WORLD):
+	'''
+	Get the number of distinct nodes processes of a communicator run on
+
+	return:
+	 [int]nodes : number of distinct processor names
+	'''
+	return len(set(comm.allgather(MPI.Get_processor_name())))
+
+def get_config(section, key, fallback = None, convert = str):
+	'''
+	Get an optional configuration entry
+
+	param:
+	 section: configuration section
+	 key: configuration key
+	 fallback: value used when the entry is missing or left empty
+	 convert: conversion applied on the raw value
+
+	return:
+	 value: converted configuration value or fallback
+	'''
+	value = section.get(key, '').strip()
+	if value == '':
+		return fallback
+	return convert(value)
+
+def str_to_bool(value):
+	'''
+	Convert configuration strings such as `true`, `yes`, `on` or `1` to bool
+	'''
+	return value.strip().lower() in ('true', 'yes', 'on', '1')
+
 def workload_generator(item, count):
-	return bytes(item for i in range(0, count))
\ No newline at end of file
+	'''
+	Generate workload for outputs, see common.workload for the content of workloads
+
+	param:
+	 item: rank the workload belongs to
+	 count: size of workload in bytes
+
+	return:
+	 data: cached bytes of workload
+	'''
+	return workload.generate(item, count)
\ No newline at end of file
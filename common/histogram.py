@@ -0,0 +1,155 @@
+'''
+Per-request latency histograms for azure-hpc-io benchmarking
+
+Latencies are recorded in microseconds into fixed log-linear buckets (HDR-style):
+values below 2 * SUB_BUCKETS are exact, larger values keep a relative precision of 1 / SUB_BUCKETS.
+'''
+
+import threading
+import numpy as np
+from mpi4py import MPI
+
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAGNITUDES = 32 # up to 2^37 us, about 38 hours
+BUCKETS = 2 * SUB_BUCKETS + MAGNITUDES * SUB_BUCKETS
+
+def bucket_index(value):
+	'''
+	Index of the bucket holding a latency in microseconds
+	'''
+	if value < 2 * SUB_BUCKETS:
+		return value
+	exponent = value.bit_length() - SUB_BUCKET_BITS - 1
+	index = 2 * SUB_BUCKETS + (exponent - 1) * SUB_BUCKETS + (value >> exponent) - SUB_BUCKETS
+	return min(index, BUCKETS - 1)
+
+def bucket_value(index):
+	'''
+	Representative latency in microseconds of a bucket, the middle of its range
+	'''
+	if index < 2 * SUB_BUCKETS:
+		return index
+	exponent, mantissa = divmod(index - 2 * SUB_BUCKETS, SUB_BUCKETS)
+	exponent = exponent + 1
+	return ((mantissa + SUB_BUCKETS) << exponent) + (1 << (exponent - 1))
+
+class LatencyHistogram(object):
+	'''
+	Histogram of request latencies with request count and bytes moved.
+	Recording is thread safe so that concurrent engines can share one histogram.
+	'''
+	__slots__ = ('__counts', '__bytes', '__lock')
+
+	def __init__(self):
+		self.__counts = np.zeros(BUCKETS, dtype=np.int64)
+		self.__bytes = 0
+		self.__lock = threading.Lock()
+
+	def record(self, latency, size = 0):
+		'''
+		Record a request
+
+		param:
+		 latency: latency of the request in seconds
+		 size: bytes moved by the request
+		'''
+		index = bucket_index(max(0, int(latency * 1e6)))
+		with self.__lock:
+			self.__counts[index] = self.__counts[index] + 1
+			self.__bytes = self.__bytes + size
+
+	def reset(self):
+		with self.__lock:
+			self.__counts[:] = 0
+			self.__bytes = 0
+
+	@property
+	def requests(self):
+		return int(self.__counts.sum())
+
+	@property
+	def bytes(self):
+		return self.__bytes
+
+	def percentile(self, percentile):
+		'''
+		Latency in seconds below which `percentile` percent of requests fall, 0 if nothing is recorded
+		'''
+		requests = self.requests
+		if requests == 0:
+			return 0
+		rank = max(1, int(np.ceil(requests * percentile / 100.0)))
+		index = int(np.searchsorted(np.cumsum(self.__counts), rank))
+		return bucket_value(index) / 1e6
+
+	def reduce(self, comm = MPI.COMM_WORLD, root = 0):
+		'''
+		Merge histograms of all ranks with a single MPI reduction
+
+		return:
+		 histogram: merged histogram on root, None on other ranks
+		'''
+		local = np.append(self.__counts, np.int64(self.__bytes))
+		merged = np.zeros_like(local) if comm.Get_rank() == root else None
+		comm.Reduce(local, merged, MPI.SUM, root=root)
+		if comm.Get_rank() != root:
+			return None
+		histogram = LatencyHistogram()
+		histogram.__counts[:] = merged[0:BUCKETS]
+		histogram.__bytes = int(merged[BUCKETS])
+		return histogram
+
+	def summary(self, percentiles = (50, 90, 99, 99.9), precision = 6):
+		'''
+		Summary of recorded requests
+
+		return:
+		 summary: list of (name, value) with request count, bytes moved and latency percentiles in seconds
+		'''
+		items = [('requests', self.requests), ('bytes', self.bytes)]
+		for percentile in percentiles:
+			items.append(('p{:g}'.format(percentile), round(self.percentile(percentile), precision)))
+		return items
+
+def transfer_size(args, kwargs, result):
+	'''
+	Bytes moved by a storage request, taken from the payload it uploads or the content or range it downloads
+	'''
+	for value in list(args) + list(kwargs.values()):
+		if isinstance(value, (bytes, bytearray, memoryview)):
+			return len(value)
+	content = getattr(result, 'content', None)
+	if isinstance(content, bytes):
+		return len(content)
+	if kwargs.get('start_range') is not None and kwargs.get('end_range') is not None:
+		return kwargs['end_range'] - kwargs['start_range'] + 1
+	return 0
+
+class InstrumentedService(object):
+	'''
+	Proxy of a storage service which records the latency and size of every call into a histogram
+
+	param:
+	 service: storage service to be proxied
+	 histogram: LatencyHistogram receiving the records
+	'''
+	__slots__ = ('__service', '__histogram')
+
+	def __init__(self, service, histogram):
+		self.__service = service
+		self.__histogram = histogram
+
+	def __getattr__(self, name):
+		attribute = getattr(self.__service, name)
+		if not callable(attribute):
+			return attribute
+		histogram = self.__histogram
+
+		def instrumented(*args, **kwargs):
+			start = MPI.Wtime()
+			result = attribute(*args, **kwargs)
+			histogram.record(MPI.Wtime() - start, transfer_size(args, kwargs, result))
+			return result
+
+		return instrumented
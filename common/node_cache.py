@@ -0,0 +1,72 @@
+'''
+Node-level read cache for azure-hpc-io benchmarking
+
+An object is fetched once per node into an MPI shared-memory window (MPI_Win_allocate_shared).
+Every rank on the node fetches one share of the object, and all ranks then access the whole object in place, without copying.
+'''
+
+from mpi4py import MPI
+from common import ranged_io
+
+class NodeCache(object):
+	'''
+	Shared-memory buffer of an object on each node
+
+	param:
+	 size: size of the object in bytes
+	 comm: communicator of processes reading the object, split into nodes with MPI_Comm_split_type
+	'''
+	__slots__ = ('__node_comm', '__window', '__view', '__size')
+
+	def __init__(self, size, comm = MPI.COMM_WORLD):
+		self.__size = size
+		self.__node_comm = comm.Split_type(MPI.COMM_TYPE_SHARED, key=comm.Get_rank())
+		# The whole object is allocated on the first rank of the node, the other ranks query its address
+		self.__window = MPI.Win.Allocate_shared(size if 0 == self.__node_comm.Get_rank() else 0, 1, comm=self.__node_comm)
+		buffer, _ = self.__window.Shared_query(0)
+		self.__view = memoryview(buffer)[0:size]
+		# Loads and stores on the window are synchronized within a single passive target epoch
+		self.__window.Lock_all(MPI.MODE_NOCHECK)
+
+	@property
+	def node_comm(self):
+		'''
+		Communicator of ranks sharing the cache
+		'''
+		return self.__node_comm
+
+	@property
+	def view(self):
+		'''
+		Memoryview of the cached object, valid until close
+		'''
+		return self.__view
+
+	def fill(self, fetch_into):
+		'''
+		Fetch the object into the cache, each rank of the node fetches one contiguous share.
+		Returns once the whole object is visible to every rank of the node.
+
+		param:
+		 fetch_into: callable(start, end, view) which reads the inclusive range [start, end] into view
+
+		return:
+		 fetched_bytes: number of bytes fetched by current rank
+		'''
+		fetched_bytes = 0
+		for start, end in ranged_io.partition_ranges(self.__size, self.__node_comm.Get_rank(), self.__node_comm.Get_size(), 'contiguous', 0):
+			fetch_into(start, end, self.__view[start:end + 1])
+			fetched_bytes = fetched_bytes + end - start + 1
+		self.__window.Sync()
+		self.__node_comm.Barrier()
+		self.__window.Sync()
+		return fetched_bytes
+
+	def close(self):
+		'''
+		Free the shared-memory window and the node communicator
+		'''
+		self.__view.release()
+		self.__window.Unlock_all()
+		self.__window.Free()
+		self.__node_comm.Free()
@@ -0,0 +1,174 @@
+'''
+Ranged I/O engines for azure-hpc-io benchmarking
+'''
+
+import mmap
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+DIRECT_IO_ALIGNMENT = 4096 # in bytes, alignment of offsets, sizes and buffers of O_DIRECT reads
+
+__executors = {}
+__buffer = bytearray(0)
+__aligned_buffer = None
+
+class MemoryviewWriter(object):
+	'''
+	File-like writer that fills a preallocated memoryview in place.
+	Used as the target stream of ranged gets so that no intermediate bytes are allocated.
+
+	param:
+	 view: writable memoryview to be filled
+	'''
+	__slots__ = ('__view', '__offset')
+
+	def __init__(self, view):
+		self.__view = view
+		self.__offset = 0
+
+	def write(self, data):
+		length = len(data)
+		self.__view[self.__offset:self.__offset + length] = data
+		self.__offset = self.__offset + length
+		return length
+
+	def seek(self, offset, whence = 0):
+		self.__offset = offset
+		return self.__offset
+
+	def tell(self):
+		return self.__offset
+
+	def seekable(self):
+		return True
+
+def split_ranges(offset, length, chunk_size):
+	'''
+	Split bytes [offset, offset + length) into ranges no larger than chunk_size
+
+	param:
+	 offset: start offset in bytes
+	 length: length in bytes
+	 chunk_size: maximum size of each range in bytes
+
+	return:
+	 ranges: list of inclusive (start, end) tuples
+	'''
+	end = offset + length
+	return [(start, min(start + chunk_size, end) - 1) for start in range(offset, end, chunk_size)]
+
+def partition_ranges(size, rank, nprocs, layout, stripe_size):
+	'''
+	Get the ranges of an object owned by a rank when the object is partitioned among processes
+
+	param:
+	 size: size of the object in bytes
+	 rank: rank of the owner
+	 nprocs: number of processes sharing the object
+	 layout: `contiguous` for one balanced contiguous share per rank, `strided` for stripes assigned round-robin
+	 stripe_size: size of each stripe in bytes for the `strided` layout
+
+	return:
+	 ranges: list of inclusive (start, end) tuples, empty if the rank owns nothing
+	'''
+	if layout == 'contiguous':
+		share, remainder = divmod(size, nprocs)
+		start = rank * share + min(rank, remainder)
+		length = share + (1 if rank < remainder else 0)
+		return [(start, start + length - 1)] if length else []
+	elif layout == 'strided':
+		return [(start, min(start + stripe_size, size) - 1) for start in range(rank * stripe_size, size, nprocs * stripe_size)]
+	else:
+		raise ValueError('Unknown partition layout {}'.format(layout))
+
+def get_executor(concurrency):
+	'''
+	Get a thread pool with `concurrency` workers, pools are cached and reused between repetitions
+	'''
+	executor = __executors.get(concurrency)
+	if executor is None:
+		executor = ThreadPoolExecutor(max_workers=concurrency)
+		__executors[concurrency] = executor
+	return executor
+
+def run_concurrently(func, items, concurrency):
+	'''
+	Call func(*item) for every item with at most `concurrency` calls in flight
+
+	param:
+	 func: callable to be applied
+	 items: list of argument tuples
+	 concurrency: maximum number of in-flight calls
+
+	return:
+	 results: list of results in the order of items, the first exception raised is propagated
+	'''
+	if concurrency <= 1:
+		return [func(*item) for item in items]
+	executor = get_executor(concurrency)
+	futures = [executor.submit(func, *item) for item in items]
+	return [future.result() for future in futures]
+
+def get_read_buffer(size):
+	'''
+	Get a writable memoryview of `size` bytes backed by a single buffer reused across calls.
+	The buffer only grows when a larger size is requested.
+	'''
+	global __buffer
+	if len(__buffer) < size:
+		__buffer = bytearray(size)
+	return memoryview(__buffer)[0:size]
+
+def get_aligned_buffer(size):
+	'''
+	Get a writable memoryview of `size` bytes backed by a page aligned anonymous mapping reused across calls, as required by O_DIRECT.
+	`size` is rounded up to a multiple of DIRECT_IO_ALIGNMENT.
+	'''
+	global __aligned_buffer
+	size = -(-size // DIRECT_IO_ALIGNMENT) * DIRECT_IO_ALIGNMENT
+	if __aligned_buffer is None or len(__aligned_buffer) < size:
+		__aligned_buffer = mmap.mmap(-1, size)
+	return memoryview(__aligned_buffer)[0:size]
+
+def parallel_ranged_read(fetch_into, offset, length, view, chunk_size, concurrency):
+	'''
+	Read bytes [offset, offset + length) with concurrent ranged requests
+
+	param:
+	 fetch_into: callable(start, end, view) which reads the inclusive range [start, end] into view
+	 offset: start offset in bytes
+	 length: length in bytes
+	 view: writable memoryview of at least `length` bytes receiving the data
+	 chunk_size: size of each ranged request in bytes
+	 concurrency: number of in-flight ranged requests
+	'''
+	def fetch(start, end):
+		fetch_into(start, end, view[start - offset:end - offset + 1])
+
+	run_concurrently(fetch, split_ranges(offset, length, chunk_size), concurrency)
+
+def read_file_range_into(f, start, view):
+	'''
+	Read len(view) bytes from a binary file starting at `start` into view, retrying on short reads
+
+	param:
+	 f: file object opened in binary mode
+	 start: start offset in bytes
+	 view: writable memoryview receiving the data
+	'''
+	f.seek(start)
+	offset = 0
+	length = len(view)
+	while offset < length:
+		count = f.readinto(view[offset:])
+		if not count:
+			raise EOFError('Unexpected end of file at offset {}'.format(start + offset))
+		offset = offset + count
+
+def size_connection_pool(session, concurrency):
+	'''
+	Enlarge the HTTP connection pool of a requests session so that concurrent requests are not serialized
+	'''
+	adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+	session.mount('https://', adapter)
+	session.mount('http://', adapter)
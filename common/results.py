@@ -0,0 +1,226 @@
+'''
+Machine-readable results for azure-hpc-io benchmarking
+
+Each repetition of a benchmark produces one record, written as a JSON line or a CSV row.
+Records of many runs can be aggregated into the latency and bandwidth tables used in doc/INPUT.md and doc/OUTPUT.md.
+'''
+
+import os, csv, json, time, socket, platform
+from collections import OrderedDict
+
+FIELDS = ('timestamp', 'target', 'item', 'pattern', 'repetition', 'ranks', 'nodes', 'concurrency', 'request_size', 'size', 'bytes', 'bytes_moved', 'requests',
+	'max_time', 'min_time', 'avg_time', 'bandwidth', 'p50', 'p90', 'p99', 'p99.9', 'throttled', 'retried', 'failed', 'backoff_time', 'paced_time',
+	'extra', 'environment')
+
+# Index in the metrics of a pattern of the time bandwidth is derived from, the maximum time (index 0) for patterns not listed
+BANDWIDTH_TIME_INDEX = {
+	'SFWB': 3, # maximum time to durability, the maximum time is the time the application was blocked
+}
+
+TARGET_LABELS = {
+	'azure_blob': 'Blob',
+	'azure_blob_async': 'Blob Async',
+	'azure_file': 'File',
+	'azure_file_async': 'File Async',
+	'emulated_blob': 'Emulated Blob',
+	'emulated_file': 'Emulated File',
+	'cirrus_lustre': 'Cirrus',
+	'mpiio': 'MPI-IO',
+}
+
+def get_environment(config = None, mpi_library = None):
+	'''
+	Environment of a run
+
+	param:
+	 config: optional mapping of bench configurations to be recorded
+	 mpi_library: optional MPI library version string
+
+	return:
+	 environment: dict of host, python, MPI library and configurations
+	'''
+	environment = OrderedDict()
+	environment['host'] = socket.gethostname()
+	environment['platform'] = platform.platform()
+	environment['python'] = platform.python_version()
+	if mpi_library:
+		environment['mpi'] = mpi_library.strip().splitlines()[0]
+	if config is not None:
+		environment['config'] = OrderedDict((key, value) for key, value in config.items() if value != '')
+	return environment
+
+def make_record(target, item, pattern, repetition, ranks, nodes, metrics, request_histogram, environment, request_counters = None, precision = 3, concurrency = None, request_size = None, logical_bytes = None):
+	'''
+	Build the record of a repetition
+
+	param:
+	 target: bench target
+	 item: `input` or `output`
+	 pattern: bench pattern
+	 repetition: index of the repetition
+	 ranks: number of processes
+	 nodes: number of nodes
+	 metrics: tuple returned by the bench tool, maximum, minimum and average time followed by pattern specific metrics
+	 request_histogram: merged LatencyHistogram of the repetition
+	 environment: environment of the run, see get_environment
+	 request_counters: optional list of (name, value) of throttled and retried requests, see common.retry.RequestCounters
+	 concurrency: optional in-flight requests per rank of a sweep point
+	 request_size: optional size of each request in KiB of a sweep point
+	 logical_bytes: bytes of all ranks written or delivered to the application by the pattern, size and bandwidth are derived from them,
+	  bytes of requests including retried attempts are kept as bytes_moved. Bytes of requests are used if not given.
+	  Bandwidth is divided by the time of the pattern in BANDWIDTH_TIME_INDEX
+
+	return:
+	 record: OrderedDict with keys of FIELDS
+	'''
+	max_time, min_time, avg_time = metrics[0:3]
+	bandwidth_time = metrics[BANDWIDTH_TIME_INDEX.get(pattern, 0)]
+	total_bytes = request_histogram.bytes if logical_bytes is None else logical_bytes
+	percentiles = OrderedDict(request_histogram.summary()[2:])
+	record = OrderedDict()
+	record['timestamp'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+	record['target'] = target
+	record['item'] = item
+	record['pattern'] = pattern
+	record['repetition'] = repetition
+	record['ranks'] = ranks
+	record['nodes'] = nodes
+	record['concurrency'] = concurrency
+	record['request_size'] = request_size
+	record['size'] = round(total_bytes / float(ranks) / (1 << 20), precision)
+	record['bytes'] = total_bytes
+	record['bytes_moved'] = request_histogram.bytes
+	record['requests'] = request_histogram.requests
+	record['max_time'] = max_time
+	record['min_time'] = min_time
+	record['avg_time'] = avg_time
+	record['bandwidth'] = round(total_bytes / bandwidth_time / (1 << 20), precision) if bandwidth_time > 0 else 0
+	for name in ('p50', 'p90', 'p99', 'p99.9'):
+		record[name] = percentiles.get(name, 0)
+	counters = dict(request_counters or [])
+	for name in ('throttled', 'retried', 'failed', 'backoff_time', 'paced_time'):
+		record[name] = counters.get(name, 0)
+	record['extra'] = list(metrics[3:])
+	record['environment'] = environment
+	return record
+
+class ResultSink(object):
+	'''
+	Writer of benchmarking records
+
+	param:
+	 path: output file, records are appended to existing results
+	 format: `jsonl` or `csv`, inferred from the extension of path if not given
+	 stream: indicate whether to flush every record to disk as soon as it is written
+	'''
+	__slots__ = ('__file', '__format', '__stream', '__writer')
+
+	def __init__(self, path, format = None, stream = True):
+		if format is None:
+			format = 'csv' if path.endswith('.csv') else 'jsonl'
+		if format not in ('jsonl', 'csv'):
+			raise ValueError('Unknown results format {}'.format(format))
+		write_header = format == 'csv' and (not os.path.exists(path) or os.path.getsize(path) == 0)
+		self.__file = open(path, 'a', newline='')
+		self.__format = format
+		self.__stream = stream
+		self.__writer = None
+		if format == 'csv':
+			self.__writer = csv.DictWriter(self.__file, fieldnames=FIELDS)
+			if write_header:
+				self.__writer.writeheader()
+
+	def write(self, record):
+		if self.__format == 'csv':
+			row = dict(record)
+			row['extra'] = json.dumps(record['extra'])
+			row['environment'] = json.dumps(record['environment'])
+			self.__writer.writerow(row)
+		else:
+			self.__file.write(json.dumps(record) + '\n')
+		if self.__stream:
+			self.__file.flush()
+
+	def close(self):
+		self.__file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+def load_records(path):
+	'''
+	Load records from a JSON Lines or CSV result file
+
+	return:
+	 records: list of dicts, numeric fields of CSV rows are converted back to numbers
+	'''
+	records = []
+	with open(path, newline='') as f:
+		if path.endswith('.csv'):
+			for row in csv.DictReader(f):
+				for key, value in row.items():
+					if key in ('extra', 'environment'):
+						row[key] = json.loads(value) if value else None
+					elif key not in ('timestamp', 'target', 'item', 'pattern'):
+						row[key] = float(value) if value else 0
+				records.append(row)
+		else:
+			for line in f:
+				if line.strip():
+					records.append(json.loads(line))
+	return records
+
+def summarize(records, metric = 'max_time'):
+	'''
+	Aggregate records into markdown tables, one table per item, pattern, process count and sweep parameters.
+	Rows are sizes per rank and columns are latency and bandwidth of each target averaged over repetitions.
+
+	param:
+	 records: records of one or many runs
+	 metric: time used as latency, `max_time`, `avg_time` or a latency percentile such as `p99`
+
+	return:
+	 tables: markdown text
+	'''
+	groups = OrderedDict()
+	for record in records:
+		key = (record['item'], record['pattern'], int(record['ranks']), int(record['nodes']), record.get('concurrency') or None, record.get('request_size') or None)
+		size = round(float(record['size']), 3)
+		cell = groups.setdefault(key, OrderedDict()).setdefault(size, OrderedDict()).setdefault(record['target'], [])
+		cell.append((float(record[metric]), float(record['bandwidth'])))
+
+	lines = []
+	for (item, pattern, ranks, nodes, concurrency, request_size), sizes in groups.items():
+		targets = []
+		for cells in sizes.values():
+			for target in cells:
+				if target not in targets:
+					targets.append(target)
+		title = '#### {0} {1}, {2} processes on {3} nodes'.format(item.capitalize(), pattern, ranks, nodes)
+		if concurrency:
+			title = title + ', {0:g} requests in flight'.format(concurrency)
+		if request_size:
+			title = title + ', {0:g} KiB requests'.format(request_size)
+		lines.append(title)
+		header = '| Size per Rank (MiB) |'
+		for target in targets:
+			label = TARGET_LABELS.get(target, target)
+			header = header + ' {0} Latency (s) | {0} Bandwidth (MiB/s) |'.format(label)
+		lines.append(header)
+		lines.append('| :------ |' + ' :-------| :-------|' * len(targets))
+		for size in sorted(sizes):
+			row = '| {0:g} |'.format(size)
+			for target in targets:
+				samples = sizes[size].get(target)
+				if samples:
+					latency = sum(sample[0] for sample in samples) / len(samples)
+					bandwidth = sum(sample[1] for sample in samples) / len(samples)
+					row = row + ' {0:.3f} | {1:.3f} |'.format(latency, bandwidth)
+				else:
+					row = row + ' N/A | N/A |'
+			lines.append(row)
+		lines.append('')
+	return '\n'.join(lines)
@@ -0,0 +1,218 @@
+'''
+Throttling-aware request execution for azure-hpc-io benchmarking
+
+Requests rejected by the storage account (503 Server Busy, 500 Operation Timeout), as well as requests failing on a broken or timed out
+connection, are retried with exponential backoff and jitter,
+optionally paced by a per-rank token bucket, and every throttled and retried request is counted
+so that results show where the request-rate ceiling of an account is hit.
+'''
+
+import time, random, threading, asyncio
+import numpy as np
+import requests
+from mpi4py import MPI
+
+THROTTLE_STATUS = (500, 503)
+RETRY_STATUS = (408, 500, 502, 503, 504)
+# Errors without response, raised by requests under the SDK or as ConnectionError by the asyncio client
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError, asyncio.TimeoutError, requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError)
+
+def no_retry(retry_context):
+	'''
+	Retry function of Azure Storage SDK services disabling the retries of the SDK, so that every retry goes through a RetryPolicy
+	'''
+	return None
+
+def get_status_code(error):
+	'''
+	HTTP status code of a storage error, None for errors without response
+	'''
+	return getattr(error, 'status_code', None)
+
+def is_transient(error):
+	'''
+	Indicate whether an error is a broken or timed out connection.
+	The SDK wraps errors of requests in AzureException, so the errors it was raised from are checked as well.
+	'''
+	while error is not None:
+		if isinstance(error, TRANSIENT_ERRORS):
+			return True
+		error = error.__cause__ or error.__context__
+	return False
+
+class TokenBucket(object):
+	'''
+	Client-side rate limiter of a rank
+
+	param:
+	 rate: requests per second
+	 burst: requests allowed at once after idling, rate by default
+	'''
+	__slots__ = ('__rate', '__burst', '__tokens', '__refilled_at', '__lock')
+
+	def __init__(self, rate, burst = None):
+		self.__rate = float(rate)
+		self.__burst = float(burst or max(1, rate))
+		self.__tokens = self.__burst
+		self.__refilled_at = time.time()
+		self.__lock = threading.Lock()
+
+	def reserve(self):
+		'''
+		Take a token
+
+		return:
+		 delay: time in seconds the request should wait before being issued
+		'''
+		with self.__lock:
+			now = time.time()
+			self.__tokens = min(self.__burst, self.__tokens + (now - self.__refilled_at) * self.__rate)
+			self.__refilled_at = now
+			self.__tokens = self.__tokens - 1
+			if self.__tokens >= 0:
+				return 0
+			return -self.__tokens / self.__rate
+
+class RequestCounters(object):
+	'''
+	Thread safe counters of requests going through a RetryPolicy
+	'''
+	NAMES = ('throttled', 'retried', 'failed', 'backoff_time', 'paced_time')
+
+	__slots__ = ('__values', '__lock')
+
+	def __init__(self):
+		self.__values = np.zeros(len(self.NAMES))
+		self.__lock = threading.Lock()
+
+	def add(self, name, value = 1):
+		with self.__lock:
+			self.__values[self.NAMES.index(name)] += value
+
+	def reset(self):
+		with self.__lock:
+			self.__values[:] = 0
+
+	def reduce(self, comm = MPI.COMM_WORLD, root = 0, precision = 3):
+		'''
+		Sum counters of all ranks
+
+		return:
+		 summary: list of (name, value) on root, None on other ranks
+		'''
+		merged = np.zeros_like(self.__values) if comm.Get_rank() == root else None
+		comm.Reduce(self.__values, merged, MPI.SUM, root=root)
+		if comm.Get_rank() != root:
+			return None
+		return [(name, int(value) if not name.endswith('_time') else round(value, precision)) for name, value in zip(self.NAMES, merged)]
+
+class RetryPolicy(object):
+	'''
+	Exponential backoff with jitter, the n-th retry waits for a random time between (1 - jitter) and 1 times min(max_backoff, backoff * 2^n)
+
+	param:
+	 max_retries: retries of a request before the error is raised
+	 backoff: backoff of the first retry in seconds
+	 max_backoff: upper bound of a backoff in seconds
+	 jitter: fraction of each backoff that is randomized, 1 for full jitter
+	 rate_limiter: optional TokenBucket pacing every attempt
+	 seed: seed of the jitter generator
+	'''
+	__slots__ = ('__max_retries', '__backoff', '__max_backoff', '__jitter', '__rate_limiter', '__random', '__counters')
+
+	def __init__(self, max_retries = 5, backoff = 0.1, max_backoff = 10, jitter = 1, rate_limiter = None, seed = None):
+		if not 0 <= jitter <= 1:
+			raise ValueError('Jitter of {} is not between 0 and 1'.format(jitter))
+		self.__max_retries = max_retries
+		self.__backoff = backoff
+		self.__max_backoff = max_backoff
+		self.__jitter = jitter
+		self.__rate_limiter = rate_limiter
+		self.__random = random.Random(seed)
+		self.__counters = RequestCounters()
+
+	@property
+	def counters(self):
+		return self.__counters
+
+	def __pace(self):
+		if self.__rate_limiter is None:
+			return 0
+		delay = self.__rate_limiter.reserve()
+		if delay > 0:
+			self.__counters.add('paced_time', delay)
+		return delay
+
+	def __get_backoff(self, error, retries):
+		'''
+		Backoff before the next attempt, None if the error should be raised
+		'''
+		status_code = get_status_code(error)
+		if status_code in THROTTLE_STATUS:
+			self.__counters.add('throttled')
+		if status_code not in RETRY_STATUS and not (status_code is None and is_transient(error)):
+			return None
+		if retries >= self.__max_retries:
+			self.__counters.add('failed')
+			return None
+		backoff = min(self.__max_backoff, self.__backoff * (1 << retries))
+		backoff = backoff * (1 - self.__jitter * self.__random.random())
+		self.__counters.add('retried')
+		self.__counters.add('backoff_time', backoff)
+		return backoff
+
+	def call(self, func, *args, **kwargs):
+		'''
+		Call func, retrying throttled and transient errors
+		'''
+		retries = 0
+		while True:
+			delay = self.__pace()
+			if delay > 0:
+				time.sleep(delay)
+			try:
+				return func(*args, **kwargs)
+			except Exception as error:
+				backoff = self.__get_backoff(error, retries)
+				if backoff is None:
+					raise
+			time.sleep(backoff)
+			retries = retries + 1
+
+	async def call_async(self, coroutine_func, *args):
+		'''
+		Await coroutine_func, retrying throttled and transient errors without blocking the event loop
+		'''
+		retries = 0
+		while True:
+			delay = self.__pace()
+			if delay > 0:
+				await asyncio.sleep(delay)
+			try:
+				return await coroutine_func(*args)
+			except Exception as error:
+				backoff = self.__get_backoff(error, retries)
+				if backoff is None:
+					raise
+			await asyncio.sleep(backoff)
+			retries = retries + 1
+
+class RetryingService(object):
+	'''
+	Proxy of a storage service issuing every call through a RetryPolicy
+
+	param:
+	 service: storage service to be proxied
+	 policy: RetryPolicy applied to every call
+	'''
+	__slots__ = ('__service', '__policy')
+
+	def __init__(self, service, policy):
+		self.__service = service
+		self.__policy = policy
+
+	def __getattr__(self, name):
+		attribute = getattr(self.__service, name)
+		if not callable(attribute):
+			return attribute
+		return lambda *args, **kwargs: self.__policy.call(attribute, *args, **kwargs)
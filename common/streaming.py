@@ -0,0 +1,139 @@
+'''
+Streaming reads overlapping compute and I/O for azure-hpc-io benchmarking
+
+A StreamingReader yields an object chunk by chunk while a prefetch thread fetches the following chunks into a bounded set of buffers,
+so that a consumer processes the current chunk while the next ones are downloading.
+'''
+
+import time, zlib, queue, threading
+import numpy as np
+from common import ranged_io
+
+KERNELS = ('none', 'sum', 'crc32', 'sleep')
+
+class StreamingReader(object):
+	'''
+	Iterator over the chunks of an object, each item is (start, view) where view is only valid until the next item is requested
+
+	param:
+	 fetch_into: callable(start, end, view) which reads the inclusive range [start, end] into view
+	 size: size of the object in bytes
+	 chunk_size: size of each chunk in bytes
+	 buffers: number of chunk buffers, 2 for double buffering, at least 2 so that a chunk is fetched while another one is consumed
+	'''
+	__slots__ = ('__fetch_into', '__size', '__chunk_size', '__free', '__ready', '__thread', '__stopped', '__io_time', '__wait_time')
+
+	def __init__(self, fetch_into, size, chunk_size, buffers = 2):
+		if buffers < 2:
+			raise ValueError('Streaming needs at least 2 buffers, {} given'.format(buffers))
+		self.__fetch_into = fetch_into
+		self.__size = size
+		self.__chunk_size = chunk_size
+		self.__free = queue.Queue()
+		for _ in range(0, buffers):
+			self.__free.put(memoryview(bytearray(min(chunk_size, size))))
+		# Chunks in flight are bounded by the buffers, so the ready queue never blocks the prefetch thread
+		self.__ready = queue.Queue()
+		self.__stopped = threading.Event()
+		self.__io_time = 0
+		self.__wait_time = 0
+		self.__thread = None
+
+	@property
+	def io_time(self):
+		'''
+		Time spent by the prefetch thread fetching chunks
+		'''
+		return self.__io_time
+
+	@property
+	def wait_time(self):
+		'''
+		Time spent by the consumer waiting for chunks, i.e. I/O time that was not hidden behind compute
+		'''
+		return self.__wait_time
+
+	def __prefetch(self):
+		try:
+			for start, end in ranged_io.split_ranges(0, self.__size, self.__chunk_size):
+				buffer = self.__free.get()
+				if self.__stopped.is_set():
+					return
+				view = buffer[0:end - start + 1]
+				fetch_start = time.perf_counter()
+				self.__fetch_into(start, end, view)
+				self.__io_time = self.__io_time + time.perf_counter() - fetch_start
+				self.__ready.put((start, view, buffer))
+			self.__ready.put(None)
+		except Exception as error:
+			self.__ready.put(error)
+
+	def __iter__(self):
+		self.__thread = threading.Thread(target=self.__prefetch, daemon=True)
+		self.__thread.start()
+		buffer = None
+		try:
+			while True:
+				wait_start = time.perf_counter()
+				item = self.__ready.get()
+				self.__wait_time = self.__wait_time + time.perf_counter() - wait_start
+				# The previous chunk has been consumed, its buffer can be refilled
+				if buffer is not None:
+					self.__free.put(buffer)
+				if item is None:
+					return
+				if isinstance(item, Exception):
+					raise item
+				start, view, buffer = item
+				yield start, view
+		finally:
+			self.__stopped.set()
+			self.__free.put(None)
+			self.__thread.join()
+
+def get_kernel(name, repeat = 1, sleep = 0):
+	'''
+	Synthetic compute kernel applied on every chunk
+
+	param:
+	 name: `none`, `sum` for a NumPy reduction, `crc32` for a checksum, or `sleep` for a fixed compute time per MiB
+	 repeat: times the `sum` and `crc32` kernels are applied on a chunk
+	 sleep: compute time of the `sleep` kernel in ms per MiB
+
+	return:
+	 kernel: callable(view)
+	'''
+	if name == 'none':
+		return lambda view: None
+	elif name == 'sum':
+		def kernel(view):
+			array = np.frombuffer(view, dtype=np.uint8)
+			for _ in range(0, repeat):
+				array.sum(dtype=np.uint64)
+		return kernel
+	elif name == 'crc32':
+		def kernel(view):
+			for _ in range(0, repeat):
+				zlib.crc32(view)
+		return kernel
+	elif name == 'sleep':
+		return lambda view: time.sleep(sleep / 1000.0 * len(view) / (1 << 20))
+	else:
+		raise ValueError('Unknown compute kernel {}'.format(name))
+
+def stream_and_compute(fetch_into, size, chunk_size, buffers, kernel):
+	'''
+	Stream an object and apply kernel on every chunk
+
+	return:
+	 io_time: time spent fetching chunks
+	 compute_time: time spent in the kernel
+	 wait_time: time the kernel waited for chunks
+	'''
+	reader = StreamingReader(fetch_into, size, chunk_size, buffers)
+	compute_time = 0
+	for _, view in reader:
+		compute_start = time.perf_counter()
+		kernel(view)
+		compute_time = compute_time + time.perf_counter() - compute_start
+	return reader.io_time, compute_time, reader.wait_time
@@ -0,0 +1,87 @@
+'''
+Parameter sweeps for azure-hpc-io benchmarking
+
+A sweep is the matrix of targets x patterns x sizes x concurrency x request sizes x rank counts, run in a single MPI launch.
+Completed points are recorded in a checkpoint so that an interrupted sweep resumes where it stopped.
+'''
+
+import os, json, itertools
+
+INPUT_PATTERNS = ('SFMR', 'MFMR', 'SRB', 'SFPR', 'SFSR', 'MFMRMC', 'SFMRNC', 'SFMRCC')
+OUTPUT_PATTERNS = ('SFMW', 'MFMW', 'MFMWMC', 'SFWB', 'SFAW', 'MFAW', 'MSO')
+
+def parse_list(value, convert = str):
+	'''
+	Parse a comma separated configuration entry, an empty entry gives an empty list
+	'''
+	return [convert(item.strip()) for item in value.split(',') if item.strip()]
+
+def get_item(pattern):
+	'''
+	Bench item of a pattern, `input` or `output`
+	'''
+	if pattern in INPUT_PATTERNS:
+		return 'input'
+	elif pattern in OUTPUT_PATTERNS:
+		return 'output'
+	else:
+		raise ValueError('Unknown bench pattern {}'.format(pattern))
+
+def expand(targets, patterns, sizes, concurrency, ranks, request_sizes = (None,)):
+	'''
+	Expand a sweep into its points.
+	Points are ordered so that rank counts vary slowest, then concurrency and request sizes,
+	which keeps sub-communicators and bench tools alive over as many points as possible.
+
+	param:
+	 targets: bench targets
+	 patterns: bench patterns
+	 sizes: sizes per rank in MiB
+	 concurrency: in-flight requests per rank
+	 ranks: numbers of processes
+	 request_sizes: sizes of each read and write request in KiB, None for the sizes of the BENCH section
+
+	return:
+	 points: list of dicts with keys target, item, pattern, size, concurrency, request_size and ranks
+	'''
+	points = []
+	for nprocs, requests, request_size, target, pattern, size in itertools.product(ranks, concurrency, request_sizes, targets, patterns, sizes):
+		points.append({'target': target, 'item': get_item(pattern), 'pattern': pattern, 'size': size, 'concurrency': requests, 'request_size': request_size, 'ranks': nprocs})
+	return points
+
+def point_key(point):
+	'''
+	Key identifying a point in a checkpoint
+	'''
+	key = '{target}/{pattern}/{size}MiB/c{concurrency}/n{ranks}'.format(**point)
+	if point.get('request_size') is not None:
+		key = key + '/r{}KiB'.format(point['request_size'])
+	return key
+
+class Checkpoint(object):
+	'''
+	Completed points of a sweep, saved to a JSON file after each point
+
+	param:
+	 path: checkpoint file, None to disable checkpointing
+	'''
+	__slots__ = ('__path', '__completed')
+
+	def __init__(self, path = None):
+		self.__path = path
+		self.__completed = set()
+		if path is not None and os.path.exists(path):
+			with open(path) as f:
+				self.__completed = set(json.load(f)['completed'])
+
+	def is_completed(self, point):
+		return point_key(point) in self.__completed
+
+	def complete(self, point):
+		self.__completed.add(point_key(point))
+		if self.__path is None:
+			return
+		temp_path = self.__path + '.tmp'
+		with open(temp_path, 'w') as f:
+			json.dump({'completed': sorted(self.__completed)}, f, indent=1)
+		os.replace(temp_path, self.__path)
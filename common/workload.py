@@ -0,0 +1,67 @@
+'''
+Workload generation for azure-hpc-io benchmarking
+
+Payloads are built with vectorized numpy operations and cached by rank and size,
+so that repetitions reuse the same buffers and generation never shows up in timings.
+'''
+
+import numpy as np
+
+PATTERNS = ('constant', 'pattern', 'random')
+
+__pattern = 'constant'
+__seed = 0
+__cache = {}
+
+def configure(pattern = 'constant', seed = 0):
+	'''
+	Configure the content of generated workloads, cached workloads are dropped
+
+	param:
+	 pattern: `constant` fills every byte with the rank, `pattern` repeats a per-rank byte sequence,
+	  `random` uses seeded pseudo-random bytes which can not be compressed
+	 seed: base seed for the `random` pattern, the seed of each rank is seed + rank
+	'''
+	global __pattern, __seed
+	if pattern not in PATTERNS:
+		raise ValueError('Unknown workload pattern {}'.format(pattern))
+	__pattern = pattern
+	__seed = seed
+	__cache.clear()
+
+def generate(rank, size):
+	'''
+	Get workload of a rank
+
+	param:
+	 rank: rank the workload belongs to
+	 size: size of workload in bytes
+
+	return:
+	 data: bytes of workload, the same object is returned for the same rank and size
+	'''
+	key = (rank, size)
+	data = __cache.get(key)
+	if data is None:
+		if __pattern == 'constant':
+			data = np.full(size, rank % 256, dtype=np.uint8).tobytes()
+		elif __pattern == 'pattern':
+			tile = np.arange(0, 256, dtype=np.uint8) + np.uint8(rank % 256)
+			data = np.resize(tile, size).tobytes()
+		else:
+			data = np.random.RandomState(__seed + rank).bytes(size)
+		__cache[key] = data
+	return data
+
+def generate_view(rank, size):
+	'''
+	Get workload of a rank as a memoryview, slicing the view does not copy the payload
+
+	param:
+	 rank: rank the workload belongs to
+	 size: size of workload in bytes
+
+	return:
+	 view: read-only memoryview of workload
+	'''
+	return memoryview(generate(rank, size))
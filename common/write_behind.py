@@ -0,0 +1,87 @@
+'''
+Write-behind outputs for azure-hpc-io benchmarking
+
+Buffers handed to a WriteBehind are staged and uploaded on background threads, so that the application continues at once.
+Staged bytes are bounded by a memory cap: once it is reached, submitting blocks until earlier uploads drain (backpressure).
+'''
+
+import time, threading
+from concurrent.futures import wait
+from common import ranged_io
+
+class WriteBehind(object):
+	'''
+	Staging area draining uploads on background threads
+
+	param:
+	 memory_cap: maximum staged bytes, a single buffer larger than the cap is staged alone
+	 threads: number of background upload threads
+	 copy: indicate whether to copy submitted buffers, so that the application can reuse them once submit returns
+	'''
+	__slots__ = ('__memory_cap', '__threads', '__copy', '__condition', '__staged', '__futures', '__stall_time', '__peak')
+
+	def __init__(self, memory_cap, threads = 1, copy = True):
+		if memory_cap <= 0:
+			raise ValueError('Memory cap of {} bytes is not positive'.format(memory_cap))
+		self.__memory_cap = memory_cap
+		self.__threads = max(1, threads)
+		self.__copy = copy
+		self.__condition = threading.Condition()
+		self.__staged = 0
+		self.__futures = []
+		self.__stall_time = 0
+		self.__peak = 0
+
+	@property
+	def stall_time(self):
+		'''
+		Time submit was blocked by the memory cap
+		'''
+		return self.__stall_time
+
+	@property
+	def peak(self):
+		'''
+		Peak staged bytes
+		'''
+		return self.__peak
+
+	def submit(self, data, upload):
+		'''
+		Stage data and return at once, upload(staged_data) is called on a background thread
+
+		param:
+		 data: bytes-like buffer to be written
+		 upload: callable(staged_data) writing the buffer to storage
+		'''
+		size = len(data)
+		with self.__condition:
+			if self.__staged and self.__staged + size > self.__memory_cap:
+				stall_start = time.perf_counter()
+				while self.__staged and self.__staged + size > self.__memory_cap:
+					self.__condition.wait()
+				self.__stall_time = self.__stall_time + time.perf_counter() - stall_start
+			self.__staged = self.__staged + size
+			self.__peak = max(self.__peak, self.__staged)
+		staged_data = bytes(data) if self.__copy else data
+		self.__futures.append(ranged_io.get_executor(self.__threads).submit(self.__upload, upload, staged_data, size))
+
+	def __upload(self, upload, staged_data, size):
+		try:
+			return upload(staged_data)
+		finally:
+			with self.__condition:
+				self.__staged = self.__staged - size
+				self.__condition.notify_all()
+
+	def flush(self):
+		'''
+		Wait until every submitted buffer is uploaded
+
+		return:
+		 results: results of upload calls in the order of submission, the first exception raised is propagated
+		'''
+		futures = self.__futures
+		self.__futures = []
+		wait(futures)
+		return [future.result() for future in futures]
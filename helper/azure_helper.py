@@ -3,8 +3,10 @@
 Script for Azure environment setup & task submission
 '''
 
-import configparser, os, time
+import configparser, argparse, os, json, time, datetime
+from concurrent.futures import ThreadPoolExecutor
 from azure.storage import blob, file
+from azure.common import AzureMissingResourceHttpError
 from azure.batch.batch_service_client import BatchServiceClient
 from azure.batch.batch_auth import SharedKeyCredentials
 from mpi4py import MPI
@@ -61,51 +63,112 @@ def application_source_cleanup():
 	print('Deleting container [{}]...'.format(source_container))
 	block_blob_service.delete_container(source_container)
 
-def container_create(container_name, multi = False, count = 0):
+def lifecycle_run(operations, workers = 16, retries = 3, dry_run = False):
+	'''
+	Run management operations concurrently on a bounded worker pool
+
+	Operations should be idempotent, e.g. creating with fail_on_exist=False or deleting with fail_not_exist=False,
+	so that a failed call is simply retried with exponential backoff.
+
+	param:
+	 operations: list of (description, callable) tuples
+	 workers: maximum number of calls in flight
+	 retries: retries of a failed call before giving up
+	 dry_run: only list the operations
+	'''
+	if dry_run:
+		for description, _ in operations:
+			print('[dry-run] {}'.format(description))
+		return
+
+	def run(operation):
+		description, call = operation
+		for attempt in range(0, retries + 1):
+			try:
+				print(description)
+				return call()
+			except Exception as error:
+				if attempt == retries:
+					raise
+				print('{0} failed with {1}, retrying'.format(description, error))
+				time.sleep(min(2 ** attempt, 30))
+
+	with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+		list(executor.map(run, operations))
+
+def __get_container_names(container_name, multi, count):
+	'''
+	Names of containers, container_name + '{:0>5}'.format(id) where id lies in range(0, count) for multiple containers
+	'''
+	if multi:
+		return [container_name + '{:0>5}'.format(i) for i in range(0, count)]
+	return [container_name]
+
+def __share_empty(share_name, directory_name = None):
+	'''
+	Delete files and directories within a share recursively, keeping the share
+	'''
+	for item in file_service.list_directories_and_files(share_name, directory_name):
+		path = item.name if directory_name is None else directory_name + '/' + item.name
+		if isinstance(item, file.models.Directory):
+			__share_empty(share_name, path)
+			file_service.delete_directory(share_name, path, fail_not_exist=False)
+		else:
+			file_service.delete_file(share_name, directory_name, item.name)
+
+def __container_empty(container_name):
+	'''
+	Delete blobs within a container, keeping the container
+	'''
+	for item in block_blob_service.list_blobs(container_name):
+		block_blob_service.delete_blob(container_name, item.name)
+
+def container_create(container_name, multi = False, count = 0, workers = 16, retries = 3, dry_run = False):
 	'''
 	Create input containers for Azure Blob and Azure File
 
 	Multiple containers will name after container_name + '{:0>5}'.formate(id) where id lies in range(0, count)
+	Existing containers and shares are reused, so that environments can be prepared again without tearing them down.
 
 	param:
 	 container_name: container to be created
 	 multi: indicate whether to create multiple containers
 	 count: count of multiple containers
+	 workers: maximum number of management calls in flight
+	 retries: retries of a failed management call
+	 dry_run: only list the management calls
 	'''
-	if multi:
-		for i in range(0, count):
-			sub_container_name = container_name + '{:0>5}'.format(i)
-			print('Creating container [{}]'.format(sub_container_name))
-			block_blob_service.create_container(sub_container_name, fail_on_exist=False, public_access=blob.PublicAccess.Blob)
-			print('Creating share [{}]'.format(sub_container_name))
-			file_service.create_share(sub_container_name)
-	else:
-		print('Creating container [{}]'.format(container_name))
-		block_blob_service.create_container(container_name, fail_on_exist=False, public_access=blob.PublicAccess.Blob)
-		print('Creating share [{}]'.format(container_name))
-		file_service.create_share(container_name)
+	operations = []
+	for name in __get_container_names(container_name, multi, count):
+		operations.append(('Creating container [{}]'.format(name), lambda name=name: block_blob_service.create_container(name, fail_on_exist=False, public_access=blob.PublicAccess.Blob)))
+		operations.append(('Creating share [{}]'.format(name), lambda name=name: file_service.create_share(name, fail_on_exist=False)))
+	lifecycle_run(operations, workers, retries, dry_run)
 
-def container_destroy(container_name, multi = False, count = 0):
+def container_destroy(container_name, multi = False, count = 0, workers = 16, retries = 3, dry_run = False, reuse = False):
 	'''
 	Delete containers for Azure Blob and Azure File
 
+	A deleted container cannot be created again with the same name for a while, with reuse only the objects are deleted
+	and containers and shares are kept for the next run.
+
 	param:
 	 container_name: container to be deleted
 	 multi: indicate whether to create multiple containers
 	 count: count of multiple containers
+	 workers: maximum number of management calls in flight
+	 retries: retries of a failed management call
+	 dry_run: only list the management calls
+	 reuse: indicate whether to keep containers and shares, deleting their objects only
 	'''
-	if multi:
-		for i in range(0, count):
-			sub_container_name = container_name + '{:0>5}'.format(i)
-			print('Deleting container [{}]'.format(sub_container_name))
-			block_blob_service.delete_container(sub_container_name)
-			print('Deleting share [{}]'.format(sub_container_name))
-			file_service.delete_share(sub_container_name)
-	else:
-		print('Deleting container [{}]'.format(container_name))
-		block_blob_service.delete_container(container_name)
-		print('Deleting share [{}]'.format(container_name))
-		file_service.delete_share(container_name)
+	operations = []
+	for name in __get_container_names(container_name, multi, count):
+		if reuse:
+			operations.append(('Emptying container [{}]'.format(name), lambda name=name: __container_empty(name)))
+			operations.append(('Emptying share [{}]'.format(name), lambda name=name: __share_empty(name)))
+		else:
+			operations.append(('Deleting container [{}]'.format(name), lambda name=name: block_blob_service.delete_container(name, fail_not_exist=False)))
+			operations.append(('Deleting share [{}]'.format(name), lambda name=name: file_service.delete_share(name, fail_not_exist=False)))
+	lifecycle_run(operations, workers, retries, dry_run)
 
 def pool_create():
 	image_reference = batchmodel.ImageReference(
@@ -158,22 +221,38 @@ def job_create():
 def job_destroy():
 	batch_service.job.delete(config_azure['job_id'])
 
+def __get_lifecycle_options():
+	'''
+	Worker pool size, retries and dry run of container and share management from the configuration
+	'''
+	workers = int(config_azure.get('lifecycle_workers', '') or 16)
+	retries = int(config_azure.get('lifecycle_retries', '') or 3)
+	dry_run = config_azure.get('lifecycle_dry_run', '').lower() in ('true', 'yes', 'on', '1')
+	return workers, retries, dry_run
+
 def env_prepare():
-	container_create(config_azure['source_container'])
-	container_create(config_azure['input_container'])
-	container_create(config_azure['output_container'])
-	container_create(config_azure['input_container'], True, int(config_azure['task_number_of_procs']))
-	container_create(config_azure['output_container'], True, int(config_azure['task_number_of_procs']))
+	workers, retries, dry_run = __get_lifecycle_options()
+	container_create(config_azure['source_container'], workers=workers, retries=retries, dry_run=dry_run)
+	container_create(config_azure['input_container'], workers=workers, retries=retries, dry_run=dry_run)
+	container_create(config_azure['output_container'], workers=workers, retries=retries, dry_run=dry_run)
+	container_create(config_azure['input_container'], True, int(config_azure['task_number_of_procs']), workers, retries, dry_run)
+	container_create(config_azure['output_container'], True, int(config_azure['task_number_of_procs']), workers, retries, dry_run)
+	if dry_run:
+		return
 	application_source_upload()
 	pool_create()
 	job_create()
 
 def env_destroy():
-	container_destroy(config_azure['source_container'])
-	container_destroy(config_azure['input_container'])
-	container_destroy(config_azure['output_container'])
-	container_destroy(config_azure['input_container'], True, int(config_azure['task_number_of_procs']))
-	container_destroy(config_azure['output_container'], True, int(config_azure['task_number_of_procs']))
+	workers, retries, dry_run = __get_lifecycle_options()
+	reuse = config_azure.get('lifecycle_reuse', '').lower() in ('true', 'yes', 'on', '1')
+	container_destroy(config_azure['source_container'], workers=workers, retries=retries, dry_run=dry_run)
+	container_destroy(config_azure['input_container'], workers=workers, retries=retries, dry_run=dry_run, reuse=reuse)
+	container_destroy(config_azure['output_container'], workers=workers, retries=retries, dry_run=dry_run, reuse=reuse)
+	container_destroy(config_azure['input_container'], True, int(config_azure['task_number_of_procs']), workers, retries, dry_run, reuse)
+	container_destroy(config_azure['output_container'], True, int(config_azure['task_number_of_procs']), workers, retries, dry_run, reuse)
+	if dry_run:
+		return
 	pool_destory()
 	job_destroy()
 
@@ -219,7 +298,7 @@ def task_submit(task_name):
     batch_service.task.add(config_azure['job_id'], task)
 
 def input_blob_upload(blob_name = 'test', blob_size = 1024 * 1024 * 1, multiple_blob = False, multiple_container = False, count = 0):
-	content = bytes(0 for i in range(0, blob_size))
+	content = bytes(blob_size)
 
 	if multiple_blob:
 		if multiple_container:
@@ -238,8 +317,7 @@ def input_blob_upload(blob_name = 'test', blob_size = 1024 * 1024 * 1, multiple_
 		block_blob_service.create_blob_from_bytes(input_container, blob_name, content)	
 
 def input_file_upload(file_name = 'test', file_size = 1024 * 1024 * 1, multiple_file = False, multiple_contaienr = False, count = 0):
-	content = '0' * file_size
-	content = bytes(content, 'utf-8')
+	content = bytes(file_size)
 
 	if multiple_file:
 		if multiple_contaienr:
@@ -257,6 +335,146 @@ def input_file_upload(file_name = 'test', file_size = 1024 * 1024 * 1, multiple_
 		print('Upload file {0} with size of {1} to {2}'.format(file_name, file_size, input_container))
 		file_service.create_file_from_bytes(input_container, None, file_name, content)
 
+def input_provision(target = 'blob', object_name = 'test', object_size = 1024 * 1024 * 1, multiple_container = False, count = 0, max_connections = 4, threads = 1, manifest_path = None, comm = MPI.COMM_WORLD):
+	'''
+	Integrated with MPI to provision inputs for SFMR, MFMR and MFMRMC in parallel.
+
+	Objects are distributed round-robin across MPI ranks, each rank keeps `threads` uploads in flight and every object
+	is uploaded in parallel blocks or ranges over `max_connections` connections.
+	Objects that already exist with the expected size are skipped. With a manifest, their etag should also match the etag
+	recorded when they were uploaded, so that re-staging is incremental. The manifest is merged and saved by rank 0.
+
+	param:
+	 target: `blob` or `file`
+	 object_name: name of the object, or base name of objects composed of object_name + '{:0>5}'.format(id) when count is given
+	 object_size: size of each object in bytes
+	 multiple_container: indicate whether object id is stored in container input_container + '{:0>5}'.format(id)
+	 count: count of multiple objects, 0 for a single object
+	 max_connections: connections used to upload each object
+	 threads: uploads in flight per rank
+	 manifest_path: optional JSON manifest of provisioned objects and their etags
+	 comm: communicator of processes provisioning the objects
+	'''
+	rank = comm.Get_rank()
+	size = comm.Get_size()
+	if target not in ('blob', 'file'):
+		raise ValueError('Unknown provisioning target {}'.format(target))
+
+	objects = [(input_container, object_name)]
+	if count:
+		objects = [(input_container + '{:0>5}'.format(i) if multiple_container else input_container, object_name + '{:0>5}'.format(i)) for i in range(0, count)]
+	manifest = {}
+	if manifest_path is not None and os.path.exists(manifest_path):
+		with open(manifest_path) as f:
+			manifest = json.load(f)
+	content = bytes(object_size)
+
+	def get_properties(container_name, name):
+		try:
+			if target == 'blob':
+				return block_blob_service.get_blob_properties(container_name, name).properties
+			else:
+				return file_service.get_file_properties(container_name, None, name).properties
+		except AzureMissingResourceHttpError:
+			return None
+
+	def provision(container_name, name):
+		key = '{0}/{1}/{2}'.format(target, container_name, name)
+		properties = get_properties(container_name, name)
+		if properties is not None and properties.content_length == object_size:
+			if manifest_path is None or manifest.get(key, {}).get('etag') == properties.etag:
+				return key, properties.etag, False
+		print('Upload {0} {1} with size of {2} to {3}'.format(target, name, object_size, container_name))
+		if target == 'blob':
+			block_blob_service.create_blob_from_bytes(container_name, name, content, max_connections=max_connections)
+		else:
+			file_service.create_file_from_bytes(container_name, None, name, content, max_connections=max_connections)
+		return key, get_properties(container_name, name).etag, True
+
+	comm.Barrier()
+	start = MPI.Wtime()
+	with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+		results = list(executor.map(lambda item: provision(*item), objects[rank::size]))
+	end = MPI.Wtime()
+	comm.Barrier()
+
+	rank_results = comm.gather(results, root=0)
+	elapsed = comm.reduce(end - start, op=MPI.MAX, root=0)
+	if 0 == rank:
+		uploaded = 0
+		for key, etag, is_uploaded in (result for results in rank_results for result in results):
+			manifest[key] = {'size': object_size, 'etag': etag}
+			uploaded = uploaded + (1 if is_uploaded else 0)
+		if manifest_path is not None:
+			temp_path = manifest_path + '.tmp'
+			with open(temp_path, 'w') as f:
+				json.dump(manifest, f, indent=1, sort_keys=True)
+			os.replace(temp_path, manifest_path)
+		print('Provisioned {0} objects in {1:.3f} s, {2} uploaded, {3} skipped'.format(len(objects), elapsed, uploaded, len(objects) - uploaded))
+
+def input_replicate(target = 'blob', object_name = 'test', object_size = 1024 * 1024 * 1, multiple_container = False, count = 0, max_connections = 4, threads = 16, poll_interval = 1):
+	'''
+	Integrated with MPI to replicate inputs for MFMR and MFMRMC with server-side copies.
+
+	A template object object_name + '.template' is uploaded once to input_container, unless it already exists with the expected size,
+	then the objects object_name + '{:0>5}'.format(id) are created with copy_blob or copy_file from the template.
+	Copies are distributed round-robin across MPI ranks, each rank keeps `threads` copies in flight and polls them until done,
+	so that the client egress is a single object size instead of count times.
+
+	param:
+	 target: `blob` or `file`
+	 object_name: base name of objects
+	 object_size: size of each object in bytes
+	 multiple_container: indicate whether object id is stored in container input_container + '{:0>5}'.format(id)
+	 count: count of objects
+	 max_connections: connections used to upload the template
+	 threads: copies in flight per rank
+	 poll_interval: interval of polling the copy status in seconds
+	'''
+	rank = MPI.COMM_WORLD.Get_rank()
+	size = MPI.COMM_WORLD.Get_size()
+	if target not in ('blob', 'file'):
+		raise ValueError('Unknown replication target {}'.format(target))
+	template_name = object_name + '.template'
+	expiry = datetime.datetime.utcnow() + datetime.timedelta(days=1)
+
+	# Template upload
+	if 0 == rank:
+		input_provision(target, template_name, object_size, max_connections=max_connections, comm=MPI.COMM_SELF)
+	MPI.COMM_WORLD.Barrier()
+	if target == 'blob':
+		sas_token = block_blob_service.generate_blob_shared_access_signature(input_container, template_name, permission=blob.BlobPermissions.READ, expiry=expiry)
+		source_url = block_blob_service.make_blob_url(input_container, template_name, sas_token=sas_token)
+	else:
+		sas_token = file_service.generate_file_shared_access_signature(input_container, None, template_name, permission=file.FilePermissions.READ, expiry=expiry)
+		source_url = file_service.make_file_url(input_container, None, template_name, sas_token=sas_token)
+
+	def replicate(container_name, name):
+		print('Copy {0} {1} to {2} {3}'.format(target, template_name, container_name, name))
+		if target == 'blob':
+			copy = block_blob_service.copy_blob(container_name, name, source_url)
+			get_copy = lambda: block_blob_service.get_blob_properties(container_name, name).properties.copy
+		else:
+			copy = file_service.copy_file(container_name, None, name, source_url)
+			get_copy = lambda: file_service.get_file_properties(container_name, None, name).properties.copy
+		while copy.status == 'pending':
+			time.sleep(poll_interval)
+			copy = get_copy()
+		if copy.status != 'success':
+			raise RuntimeError('Copy of {0} to {1}/{2} ended with status {3}'.format(template_name, container_name, name, copy.status))
+
+	objects = [(input_container + '{:0>5}'.format(i) if multiple_container else input_container, object_name + '{:0>5}'.format(i)) for i in range(0, count)]
+	MPI.COMM_WORLD.Barrier()
+	start = MPI.Wtime()
+	with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+		list(executor.map(lambda item: replicate(*item), objects[rank::size]))
+	end = MPI.Wtime()
+	MPI.COMM_WORLD.Barrier()
+
+	elapsed = MPI.COMM_WORLD.reduce(end - start, op=MPI.MAX, root=0)
+	if 0 == rank:
+		print('Replicated {0} objects in {1:.3f} s'.format(len(objects), elapsed))
+
 def large_input_blob_upload(blob_name = 'test', inputs_per_rank = 1024 * 25):
     '''
     Integrated with MPI to upload large inputs.
@@ -275,11 +493,9 @@ def large_input_blob_upload(blob_name = 'test', inputs_per_rank = 1024 * 25):
         section_size += 1
     
     
-    data = '0' * (block_limit << 20)
-    data = bytes(data, 'utf-8')
+    data = bytes(block_limit << 20)
     if inputs_per_rank % block_limit:
-        last_data = '0' * ((inputs_per_rank % block_limit) << 20 )
-        last_data = bytes(last_data, 'utf-8')
+        last_data = bytes((inputs_per_rank % block_limit) << 20)
     else:
         last_data = data
 
@@ -298,4 +514,20 @@ def large_input_blob_upload(blob_name = 'test', inputs_per_rank = 1024 * 25):
         block_blob_service.put_block_list(config_azure['input_container_name'], blob_name, block_list)
 
 if __name__ == '__main__':
-    large_input_blob_upload()
+	parser = argparse.ArgumentParser(description='Azure environment setup & input provisioning')
+	parser.add_argument('command', nargs='?', default='large_input', choices=('large_input', 'provision', 'replicate'))
+	parser.add_argument('--target', default='blob', choices=('blob', 'file'))
+	parser.add_argument('--name', default='test', help='object name, or object base name with --count')
+	parser.add_argument('--size', type=int, default=1, help='size of each object in MiB')
+	parser.add_argument('--count', type=int, default=0, help='count of multiple objects')
+	parser.add_argument('--multiple-container', action='store_true', help='store each object in its own container')
+	args = parser.parse_args()
+
+	if args.command == 'provision':
+		input_provision(args.target, args.name, args.size << 20, args.multiple_container, args.count,
+			int(config_azure.get('provision_max_connections', '') or 4), int(config_azure.get('provision_threads', '') or 1), config_azure.get('provision_manifest', '') or None)
+	elif args.command == 'replicate':
+		input_replicate(args.target, args.name, args.size << 20, args.multiple_container, args.count,
+			int(config_azure.get('provision_max_connections', '') or 4), int(config_azure.get('replicate_threads', '') or 16))
+	else:
+		large_input_blob_upload()
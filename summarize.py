@@ -0,0 +1,24 @@
+#! /usr/bin/env python3
+'''
+Aggregate benchmarking results into markdown tables
+
+usage: python3 summarize.py [--metric max_time|avg_time|p50|p90|p99|p99.9] results.jsonl [results.csv ...]
+'''
+
+import argparse
+from common import results
+
+def summarize():
+	parser = argparse.ArgumentParser(description='Aggregate benchmarking results into markdown tables')
+	parser.add_argument('paths', nargs='+', help='JSON Lines or CSV result files written by bench.py')
+	parser.add_argument('--metric', default='max_time', help='time reported as latency, max_time by default')
+	args = parser.parse_args()
+
+	records = []
+	for path in args.paths:
+		records.extend(results.load_records(path))
+	print(results.summarize(records, args.metric))
+
+
+if __name__ == '__main__':
+	summarize()
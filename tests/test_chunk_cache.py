@@ -0,0 +1,57 @@
+import os
+import pytest
+from common import chunk_cache
+
+def test_miss_then_hit(tmp_path):
+	cache = chunk_cache.ChunkCache(str(tmp_path), 1 << 20)
+	fetched = []
+	def fetch_into(start, end, view):
+		fetched.append((start, end))
+		view[:] = bytes(range(start, end + 1))
+	view = memoryview(bytearray(4))
+	assert not cache.fetch_into(fetch_into, 'c/o/etag', 0, 3, view)
+	view[:] = b'\0\0\0\0'
+	assert cache.fetch_into(fetch_into, 'c/o/etag', 0, 3, view)
+	assert bytes(view) == bytes([0, 1, 2, 3])
+	assert fetched == [(0, 3)]
+	assert (cache.hits, cache.misses) == (1, 1)
+
+def test_least_recently_used_chunks_are_evicted(tmp_path):
+	cache = chunk_cache.ChunkCache(str(tmp_path), 8)
+	cache.write('o', 0, 3, memoryview(b'abcd'))
+	cache.write('o', 4, 7, memoryview(b'efgh'))
+	assert cache.read_into('o', 0, 3, memoryview(bytearray(4)))
+	cache.write('o', 8, 11, memoryview(b'ijkl'))
+	assert cache.size == 8
+	assert cache.read_into('o', 0, 3, memoryview(bytearray(4)))
+	assert not cache.read_into('o', 4, 7, memoryview(bytearray(4)))
+
+def test_chunks_larger_than_the_capacity_are_not_cached(tmp_path):
+	cache = chunk_cache.ChunkCache(str(tmp_path), 2)
+	cache.write('o', 0, 3, memoryview(b'abcd'))
+	assert cache.size == 0
+	assert not os.listdir(str(tmp_path))
+
+def test_chunks_survive_across_caches(tmp_path):
+	chunk_cache.ChunkCache(str(tmp_path), 16).write('o', 0, 3, memoryview(b'abcd'))
+	cache = chunk_cache.ChunkCache(str(tmp_path), 16)
+	view = memoryview(bytearray(4))
+	assert cache.size == 4
+	assert cache.read_into('o', 0, 3, view)
+	assert bytes(view) == b'abcd'
+	cache.remove('o', 0, 3)
+	assert cache.size == 0
+
+def test_capacity_must_be_positive(tmp_path):
+	with pytest.raises(ValueError):
+		chunk_cache.ChunkCache(str(tmp_path), 0)
+
+def test_clear_and_drop_page_cache(tmp_path):
+	cache = chunk_cache.ChunkCache(str(tmp_path), 16)
+	cache.write('o', 0, 3, memoryview(b'abcd'))
+	cache.write('o', 4, 7, memoryview(b'efgh'))
+	cache.drop_page_cache()
+	assert cache.read_into('o', 4, 7, memoryview(bytearray(4)))
+	cache.clear()
+	assert cache.size == 0
+	assert not os.listdir(str(tmp_path))
@@ -0,0 +1,67 @@
+import os, threading
+import pytest
+from mpi4py import MPI
+from common import collective, ranged_io
+
+class ThreadComm(object):
+	'''
+	Communicator of ranks run as threads, Allgatherv checks that counts and displacements fit in ROUND_LIMIT
+	'''
+
+	def __init__(self, rank, nprocs, exchange, barrier, rounds):
+		self.rank = rank
+		self.nprocs = nprocs
+		self.exchange = exchange
+		self.barrier = barrier
+		self.rounds = rounds
+
+	def Get_rank(self):
+		return self.rank
+
+	def Get_size(self):
+		return self.nprocs
+
+	def Allgatherv(self, sendbuf, recvbuf):
+		assert sendbuf is MPI.IN_PLACE
+		view, (counts, displacements), _ = recvbuf
+		assert all(displacement + count <= collective.ROUND_LIMIT for count, displacement in zip(counts, displacements))
+		self.exchange[self.rank] = bytes(view[displacements[self.rank]:displacements[self.rank] + counts[self.rank]])
+		self.barrier.wait()
+		for proc in range(0, self.nprocs):
+			view[displacements[proc]:displacements[proc] + counts[proc]] = self.exchange[proc]
+		self.rounds[self.rank] = self.rounds[self.rank] + 1
+		self.barrier.wait()
+
+def __allgather(size, nprocs, layout, stripe_size):
+	data = os.urandom(size)
+	exchange = [None] * nprocs
+	barrier = threading.Barrier(nprocs)
+	rounds = [0] * nprocs
+	views = [memoryview(bytearray(size)) for _ in range(0, nprocs)]
+	for rank, view in enumerate(views):
+		for start, end in ranged_io.partition_ranges(size, rank, nprocs, layout, stripe_size):
+			view[start:end + 1] = data[start:end + 1]
+
+	threads = [threading.Thread(target=collective.allgather_partitions, args=(ThreadComm(rank, nprocs, exchange, barrier, rounds), views[rank], size, layout, stripe_size)) for rank in range(0, nprocs)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+
+	assert all(view.tobytes() == data for view in views)
+	return rounds
+
+@pytest.mark.parametrize('size, nprocs, stripe_size', [(1000, 3, 7), (1000, 3, 50), (999, 4, 5)])
+def test_strided_allgather_in_rounds(monkeypatch, size, nprocs, stripe_size):
+	monkeypatch.setattr(collective, 'ROUND_LIMIT', 64)
+	lengths = [sum(end - start + 1 for start, end in ranged_io.partition_ranges(size, rank, nprocs, 'strided', stripe_size)) for rank in range(0, nprocs)]
+	round_size = 64 // nprocs
+	rounds = __allgather(size, nprocs, 'strided', stripe_size)
+	assert rounds == [(max(lengths) + round_size - 1) // round_size] * nprocs
+
+def test_strided_allgather_in_a_single_round():
+	assert __allgather(1000, 3, 'strided', 7) == [1, 1, 1]
+
+def test_contiguous_allgather_in_rounds(monkeypatch):
+	monkeypatch.setattr(collective, 'ROUND_LIMIT', 64)
+	assert __allgather(1000, 3, 'contiguous', None) == [16, 16, 16]
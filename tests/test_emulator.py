@@ -0,0 +1,153 @@
+'''
+I/O engines of the bench tools against the storage emulator, run on a single rank
+'''
+
+import pytest
+from mpi4py import MPI
+from common import common
+from tool.emulator import EmulatedBlockBlobService, EmulatedFileService
+from tool.bench_azure_blob import AzureBlobBench
+from tool.bench_azure_file import AzureFileBench
+
+SIZE_IN_BYTES = 1 << 20 # output_per_rank of 1 MiB
+CHUNK = 256 # in KiB
+
+@pytest.fixture
+def blob_service(tmp_path):
+	service = EmulatedBlockBlobService(str(tmp_path))
+	service.create_container('c')
+	return service
+
+@pytest.fixture
+def file_service(tmp_path):
+	service = EmulatedFileService(str(tmp_path))
+	service.create_share('s')
+	return service
+
+def __get_blob_bench(service, read_engine = 'sequential', chunk_cache_dir = None):
+	return AzureBlobBench(None, None, None, read_engine, 4, CHUNK, 4, CHUNK, storage_service=service, comm=MPI.COMM_SELF, chunk_cache_dir=chunk_cache_dir)
+
+def __get_file_bench(service, read_engine = 'sequential', chunk_cache_dir = None):
+	return AzureFileBench(None, None, None, read_engine, 4, CHUNK, 4, CHUNK, storage_service=service, comm=MPI.COMM_SELF, chunk_cache_dir=chunk_cache_dir)
+
+def test_emulator_rejects_payloads_which_are_not_bytes(blob_service, file_service):
+	payload = memoryview(b'abcd')
+	with pytest.raises(TypeError):
+		blob_service.put_block('c', 'b', payload, '00000')
+	with pytest.raises(TypeError):
+		blob_service.create_blob_from_bytes('c', 'b', payload)
+	file_service.create_file('s', None, 'f', 4)
+	with pytest.raises(TypeError):
+		file_service.update_range('s', None, 'f', payload, 0, 3)
+	with pytest.raises(TypeError):
+		file_service.create_file_from_bytes('s', None, 'f', payload)
+
+@pytest.mark.parametrize('read_engine', ['sequential', 'parallel'])
+def test_blob_single_file_multiple_writers_and_readers(blob_service, read_engine):
+	bench = __get_blob_bench(blob_service, read_engine)
+	bench.bench_outputs_with_single_file_multiple_writers('c', None, 'shared', 1)
+	assert blob_service.get_blob_to_bytes('c', 'shared').content == common.workload_generator(0, CHUNK << 10) * 4
+	assert len(bench.bench_inputs_with_single_file_multiple_readers('c', None, 'shared')) == 3
+	bench.close()
+
+def test_blob_multiple_files_multiple_writers(blob_service):
+	bench = __get_blob_bench(blob_service)
+	bench.bench_outputs_with_multiple_files_multiple_writers('c', None, 'out', 1)
+	assert blob_service.get_blob_to_bytes('c', 'out00000').content == common.workload_generator(0, SIZE_IN_BYTES)
+
+@pytest.mark.parametrize('layout, blob_name', [('single', 'agg'), ('multiple', 'agg00000')])
+def test_blob_aggregated_writers(blob_service, layout, blob_name):
+	bench = __get_blob_bench(blob_service)
+	result = bench.bench_outputs_with_aggregated_writers('c', None, 'agg', 1, None, 1, layout)
+	assert blob_service.get_blob_to_bytes('c', blob_name).content == common.workload_generator(0, SIZE_IN_BYTES)
+	assert result[-1] == 4 + 1
+
+def test_blob_write_behind(blob_service):
+	bench = __get_blob_bench(blob_service)
+	bench.bench_outputs_with_write_behind('c', None, 'behind', 1, None, 1, 2)
+	assert blob_service.get_blob_to_bytes('c', 'behind').content == common.workload_generator(0, SIZE_IN_BYTES)
+
+def test_blob_many_small_objects(blob_service):
+	bench = __get_blob_bench(blob_service)
+	result = bench.bench_metadata_operations('c', None, 'small', 20, 1)
+	assert len(result) == 8
+	assert result[6] > 0
+	assert blob_service.list_blobs('c', prefix='small') == []
+
+@pytest.mark.parametrize('read_engine', ['sequential', 'parallel'])
+def test_file_single_file_multiple_writers_and_readers(file_service, read_engine):
+	bench = __get_file_bench(file_service, read_engine)
+	bench.bench_outputs_with_single_file_multiple_writers('s', None, 'shared', 1)
+	assert file_service.get_file_to_bytes('s', None, 'shared').content == common.workload_generator(0, CHUNK << 10) * 4
+	assert len(bench.bench_inputs_with_single_file_multiple_readers('s', None, 'shared')) == 3
+	bench.close()
+
+def test_file_multiple_files_multiple_writers(file_service):
+	bench = __get_file_bench(file_service)
+	bench.bench_outputs_with_multiple_files_multiple_writers('s', None, 'out', 1)
+	assert file_service.get_file_to_bytes('s', None, 'out00000').content == common.workload_generator(0, SIZE_IN_BYTES)
+
+@pytest.mark.parametrize('layout, file_name', [('single', 'agg'), ('multiple', 'agg00000')])
+def test_file_aggregated_writers(file_service, layout, file_name):
+	bench = __get_file_bench(file_service)
+	bench.bench_outputs_with_aggregated_writers('s', None, 'agg', 1, None, 1, layout)
+	assert file_service.get_file_to_bytes('s', None, file_name).content == common.workload_generator(0, SIZE_IN_BYTES)
+
+def test_file_write_behind(file_service):
+	bench = __get_file_bench(file_service)
+	bench.bench_outputs_with_write_behind('s', None, 'behind', 1, None, 1, 2)
+	assert file_service.get_file_to_bytes('s', None, 'behind').content == common.workload_generator(0, SIZE_IN_BYTES)
+
+def test_file_many_small_objects(file_service):
+	bench = __get_file_bench(file_service)
+	result = bench.bench_metadata_operations('s', None, 'small', 20, 1)
+	assert len(result) == 8
+	assert result[6] > 0
+
+@pytest.fixture(params=['blob', 'file'])
+def input_bench(request, blob_service, file_service):
+	'''
+	Bench of each Azure target with a 1 MiB source named `in` in container `c` or share `s`
+	'''
+	payload = common.workload_generator(0, SIZE_IN_BYTES)
+	if request.param == 'blob':
+		blob_service.create_blob_from_bytes('c', 'in', payload)
+		return __get_blob_bench(blob_service, 'parallel'), 'c'
+	file_service.create_file_from_bytes('s', None, 'in', payload)
+	return __get_file_bench(file_service, 'parallel'), 's'
+
+@pytest.mark.parametrize('reader', ['root', 'node'])
+def test_single_reader_broadcast(input_bench, reader):
+	bench, container_name = input_bench
+	assert len(bench.bench_inputs_with_single_reader_broadcast(container_name, None, 'in', reader, 128)) == 3
+
+@pytest.mark.parametrize('layout', ['contiguous', 'strided'])
+def test_single_file_partitioned_readers(input_bench, layout):
+	bench, container_name = input_bench
+	assert len(bench.bench_inputs_with_single_file_partitioned_readers(container_name, None, 'in', layout, 64, True)) == 4
+
+def test_streaming_readers(input_bench):
+	bench, container_name = input_bench
+	assert len(bench.bench_inputs_with_streaming_readers(container_name, None, 'in', 128, 2)) == 7
+
+def test_node_cache(input_bench):
+	bench, container_name = input_bench
+	result = bench.bench_inputs_with_node_cache(container_name, None, 'in')
+	assert len(result) == 8
+	assert result[4] == result[5] == 1
+	assert result[7] == common.collect_bench_bandwidth(SIZE_IN_BYTES, result[6])
+
+@pytest.mark.parametrize('read_engine', ['sequential', 'parallel'])
+def test_reads_go_through_the_chunk_cache(blob_service, tmp_path, read_engine):
+	blob_service.create_blob_from_bytes('c', 'in', common.workload_generator(0, SIZE_IN_BYTES))
+	bench = __get_blob_bench(blob_service, read_engine, str(tmp_path / 'cache'))
+	bench.bench_inputs_with_single_file_multiple_readers('c', None, 'in')
+	assert bench.chunk_cache.hits == 0
+	bench.bench_inputs_with_single_file_partitioned_readers('c', None, 'in', 'contiguous')
+	assert bench.chunk_cache.hits == bench.chunk_cache.misses
+	assert bench.chunk_cache.size == SIZE_IN_BYTES
+
+def test_chunk_cache(input_bench, tmp_path):
+	bench, container_name = input_bench
+	result = bench.bench_inputs_with_chunk_cache(container_name, None, 'in', str(tmp_path / 'cache'), 1)
+	assert result[8:] == (1.0, 0.0)
@@ -0,0 +1,32 @@
+import pytest
+from common import histogram
+
+def test_small_latencies_are_exact():
+	for value in range(0, 2 * histogram.SUB_BUCKETS):
+		assert histogram.bucket_index(value) == value
+		assert histogram.bucket_value(value) == value
+
+def test_buckets_are_contiguous_and_monotonic():
+	indexes = [histogram.bucket_index(value) for value in range(0, 1 << 14)]
+	assert indexes[0] == 0
+	assert all(0 <= b - a <= 1 for a, b in zip(indexes, indexes[1:]))
+
+@pytest.mark.parametrize('value', [64, 65, 100, 1000, 4095, 4096, 123456, 10 ** 9])
+def test_bucket_value_keeps_relative_precision(value):
+	representative = histogram.bucket_value(histogram.bucket_index(value))
+	assert abs(representative - value) <= value / histogram.SUB_BUCKETS
+
+def test_largest_latencies_fall_in_the_last_bucket():
+	assert histogram.bucket_index(1 << 62) == histogram.BUCKETS - 1
+
+def test_percentiles_of_recorded_requests():
+	recorded = histogram.LatencyHistogram()
+	assert recorded.percentile(50) == 0
+	for latency in range(1, 101):
+		recorded.record(latency / 1e6, 10)
+	assert recorded.requests == 100
+	assert recorded.bytes == 1000
+	assert recorded.percentile(50) == 50 / 1e6
+	assert recorded.percentile(99) == 99 / 1e6
+	recorded.reset()
+	assert recorded.requests == 0
@@ -0,0 +1,30 @@
+import pytest
+from common import ranged_io
+
+def test_split_ranges_covers_length_with_a_short_last_range():
+	assert ranged_io.split_ranges(10, 25, 10) == [(10, 19), (20, 29), (30, 34)]
+
+def test_split_ranges_of_exact_multiple():
+	assert ranged_io.split_ranges(0, 8, 4) == [(0, 3), (4, 7)]
+
+def test_split_ranges_of_nothing():
+	assert ranged_io.split_ranges(5, 0, 4) == []
+
+@pytest.mark.parametrize('size, nprocs', [(10, 3), (3, 5), (1 << 20, 7)])
+def test_contiguous_partitions_are_balanced_and_cover_the_object(size, nprocs):
+	partitions = [ranged_io.partition_ranges(size, rank, nprocs, 'contiguous', None) for rank in range(0, nprocs)]
+	covered = [offset for ranges in partitions for start, end in ranges for offset in (start, end)]
+	lengths = [sum(end - start + 1 for start, end in ranges) for ranges in partitions]
+	assert sum(lengths) == size
+	assert max(lengths) - min(lengths) <= 1
+	assert covered == sorted(covered)
+	assert all(len(ranges) == (1 if length else 0) for ranges, length in zip(partitions, lengths))
+
+def test_strided_partitions_are_assigned_round_robin():
+	assert ranged_io.partition_ranges(10, 0, 2, 'strided', 3) == [(0, 2), (6, 8)]
+	assert ranged_io.partition_ranges(10, 1, 2, 'strided', 3) == [(3, 5), (9, 9)]
+	assert ranged_io.partition_ranges(2, 1, 2, 'strided', 3) == []
+
+def test_unknown_partition_layout():
+	with pytest.raises(ValueError):
+		ranged_io.partition_ranges(10, 0, 2, 'diagonal', 3)
@@ -0,0 +1,22 @@
+from common import results, histogram
+
+def __make_record(pattern, metrics):
+	return results.make_record('emulated_blob', 'output', pattern, 0, 2, 1, metrics, histogram.LatencyHistogram(), {}, logical_bytes=4 << 20)
+
+def test_bandwidth_is_derived_from_the_maximum_time():
+	record = __make_record('SFMW', (2.0, 1.0, 1.5, 1.0, 1.0))
+	assert record['size'] == 2
+	assert record['bandwidth'] == 2
+
+def test_write_behind_bandwidth_is_derived_from_the_time_to_durability():
+	record = __make_record('SFWB', (0.5, 0.1, 0.3, 4.0, 3.0, 3.5, 1.0, 0.0))
+	assert record['max_time'] == 0.5
+	assert record['bandwidth'] == 1
+
+def test_records_are_written_and_loaded(tmp_path):
+	for path in (str(tmp_path / 'results.jsonl'), str(tmp_path / 'results.csv')):
+		with results.ResultSink(path) as sink:
+			sink.write(__make_record('SFWB', (0.5, 0.1, 0.3, 4.0, 3.0, 3.5, 1.0, 0.0)))
+		loaded = results.load_records(path)
+		assert len(loaded) == 1
+		assert float(loaded[0]['bandwidth']) == 1
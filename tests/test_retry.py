@@ -0,0 +1,49 @@
+import pytest
+from mpi4py import MPI
+from common import retry
+from tool.emulator import EmulatorHttpError
+
+def test_token_bucket_allows_a_burst_then_paces():
+	bucket = retry.TokenBucket(10, 2)
+	assert bucket.reserve() == 0
+	assert bucket.reserve() == 0
+	assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+	assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
+
+def test_throttled_and_broken_requests_are_retried():
+	errors = [EmulatorHttpError(503, 'Server Busy'), ConnectionError('reset by peer')]
+	def request():
+		if errors:
+			raise errors.pop(0)
+		return 'done'
+	policy = retry.RetryPolicy(backoff=0, seed=0)
+	assert policy.call(request) == 'done'
+	counters = dict(policy.counters.reduce(MPI.COMM_SELF))
+	assert (counters['throttled'], counters['retried'], counters['failed']) == (1, 2, 0)
+
+def test_wrapped_connection_errors_are_transient():
+	try:
+		try:
+			raise ConnectionError('reset by peer')
+		except ConnectionError:
+			raise RuntimeError('wrapped by the SDK')
+	except RuntimeError as error:
+		assert retry.is_transient(error)
+	assert not retry.is_transient(ValueError())
+
+def test_client_errors_are_raised_at_once():
+	def request():
+		raise EmulatorHttpError(404, 'The specified resource does not exist')
+	policy = retry.RetryPolicy(backoff=0)
+	with pytest.raises(EmulatorHttpError):
+		policy.call(request)
+	assert dict(policy.counters.reduce(MPI.COMM_SELF))['retried'] == 0
+
+def test_retries_are_bounded():
+	def request():
+		raise EmulatorHttpError(503, 'Server Busy')
+	policy = retry.RetryPolicy(max_retries=2, backoff=0)
+	with pytest.raises(EmulatorHttpError):
+		policy.call(request)
+	counters = dict(policy.counters.reduce(MPI.COMM_SELF))
+	assert (counters['throttled'], counters['retried'], counters['failed']) == (3, 2, 1)
@@ -0,0 +1,29 @@
+import pytest
+from common import streaming
+
+def __fetch_into(data):
+	def fetch_into(start, end, view):
+		view[:] = data[start:end + 1]
+	return fetch_into
+
+def test_chunks_are_streamed_in_order():
+	data = bytes(range(0, 250))
+	chunks = [(start, bytes(view)) for start, view in streaming.StreamingReader(__fetch_into(data), len(data), 64, 3)]
+	assert [start for start, _ in chunks] == [0, 64, 128, 192]
+	assert b''.join(chunk for _, chunk in chunks) == data
+
+def test_fetch_errors_are_raised_to_the_consumer():
+	def fetch_into(start, end, view):
+		raise IOError('fetch failed')
+	with pytest.raises(IOError):
+		list(streaming.StreamingReader(fetch_into, 10, 4))
+
+def test_streaming_needs_two_buffers():
+	with pytest.raises(ValueError):
+		streaming.StreamingReader(__fetch_into(b''), 10, 4, 1)
+
+@pytest.mark.parametrize('kernel', streaming.KERNELS)
+def test_stream_and_compute(kernel):
+	data = bytes(1000)
+	io_time, compute_time, wait_time = streaming.stream_and_compute(__fetch_into(data), len(data), 100, 2, streaming.get_kernel(kernel))
+	assert min(io_time, compute_time, wait_time) >= 0
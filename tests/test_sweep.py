@@ -0,0 +1,33 @@
+import pytest
+from common import sweep
+
+def test_expand_varies_rank_counts_slowest():
+	points = sweep.expand(['emulated_blob'], ['SFMR', 'SFMW'], [1], [1, 4], [2, 1])
+	assert len(points) == 8
+	assert [point['ranks'] for point in points] == [2, 2, 2, 2, 1, 1, 1, 1]
+	assert [point['concurrency'] for point in points[0:4]] == [1, 1, 4, 4]
+	assert [point['item'] for point in points[0:2]] == ['input', 'output']
+	assert all(point['request_size'] is None for point in points)
+
+def test_expand_rejects_unknown_patterns():
+	with pytest.raises(ValueError):
+		sweep.expand(['emulated_blob'], ['SFXR'], [1], [1], [1])
+
+def test_point_key_names_request_size():
+	point = sweep.expand(['emulated_file'], ['MFMW'], [4], [8], [2], [256])[0]
+	assert sweep.point_key(point) == 'emulated_file/MFMW/4MiB/c8/n2/r256KiB'
+
+def test_checkpoint_resumes_completed_points(tmp_path):
+	path = str(tmp_path / 'checkpoint.json')
+	first, second = sweep.expand(['emulated_blob'], ['SFMR'], [1, 2], [1], [1])
+	checkpoint = sweep.Checkpoint(path)
+	checkpoint.complete(first)
+	resumed = sweep.Checkpoint(path)
+	assert resumed.is_completed(first)
+	assert not resumed.is_completed(second)
+
+def test_checkpoint_without_path_is_kept_in_memory():
+	point = sweep.expand(['emulated_blob'], ['SFMR'], [1], [1], [1])[0]
+	checkpoint = sweep.Checkpoint()
+	checkpoint.complete(point)
+	assert checkpoint.is_completed(point)
@@ -0,0 +1,38 @@
+import threading
+import pytest
+from common import write_behind
+
+def test_submitted_buffers_are_copied_and_uploaded():
+	uploaded = []
+	staging = write_behind.WriteBehind(1 << 20, 2)
+	buffer = bytearray(b'abcd')
+	staging.submit(memoryview(buffer), uploaded.append)
+	buffer[:] = b'wxyz'
+	staging.flush()
+	assert uploaded == [b'abcd']
+
+def test_staged_bytes_are_bounded_by_the_memory_cap():
+	release = threading.Event()
+	def upload(data):
+		release.wait()
+		return len(data)
+	staging = write_behind.WriteBehind(8, 4)
+	staging.submit(b'abcd', upload)
+	staging.submit(b'efgh', upload)
+	threading.Timer(0.1, release.set).start()
+	staging.submit(b'ijkl', upload)
+	assert staging.flush() == [4, 4, 4]
+	assert staging.peak == 8
+	assert staging.stall_time > 0
+
+def test_flush_raises_upload_errors():
+	def upload(data):
+		raise IOError('upload failed')
+	staging = write_behind.WriteBehind(8, 1)
+	staging.submit(b'abcd', upload)
+	with pytest.raises(IOError):
+		staging.flush()
+
+def test_memory_cap_must_be_positive():
+	with pytest.raises(ValueError):
+		write_behind.WriteBehind(0)
@@ -0,0 +1,170 @@
+import asyncio, base64, hashlib, hmac, time
+from email.utils import formatdate
+from urllib.parse import quote, urlencode
+import aiohttp
+import yarl
+
+class AsyncStorageError(Exception):
+	'''
+	Error responded by Azure Storage to an asyncio request
+
+	param:
+	 status_code: HTTP status code
+	 message: error message
+	'''
+	def __init__(self, status_code, message):
+		super(AsyncStorageError, self).__init__('{0}: {1}'.format(status_code, message))
+		self.status_code = status_code
+
+class AsyncStorageClient(object):
+	'''
+	Asyncio client for Azure Blob and Azure File.
+	Ranged gets, block puts and range updates are issued as coroutines over a pooled set of HTTP connections,
+	so that a single process is able to keep hundreds of requests in flight.
+	Requests are authorized with Shared Key.
+
+	param:
+	 account_name: Storage account name
+	 account_key: Storage account key
+	 service: `blob` or `file`
+	 connections: size of the HTTP connection pool
+	 histogram: optional LatencyHistogram recording every request
+	 retry_policy: optional RetryPolicy retrying throttled requests
+	'''
+	X_MS_VERSION = '2017-04-17'
+
+	__slots__ = ('__account_name', '__account_key', '__endpoint', '__connections', '__loop', '__session', '__histogram', '__retry_policy')
+
+	def __init__(self, account_name, account_key, service, connections, histogram = None, retry_policy = None):
+		if service not in ('blob', 'file'):
+			raise ValueError('Unknown storage service {}'.format(service))
+		self.__account_name = account_name
+		self.__account_key = base64.b64decode(account_key)
+		self.__endpoint = 'https://{0}.{1}.core.windows.net'.format(account_name, service)
+		self.__connections = connections
+		self.__loop = asyncio.new_event_loop()
+		self.__session = None
+		self.__histogram = histogram
+		self.__retry_policy = retry_policy
+
+	def run_concurrently(self, coroutine_func, items, concurrency):
+		'''
+		Await coroutine_func(*item) for every item with at most `concurrency` coroutines in flight
+
+		param:
+		 coroutine_func: coroutine function to be applied
+		 items: list of argument tuples
+		 concurrency: maximum number of in-flight requests
+
+		return:
+		 results: list of results in the order of items, the first exception raised is propagated
+		'''
+		return self.__loop.run_until_complete(self.__gather(coroutine_func, items, concurrency))
+
+	def close(self):
+		'''
+		Close pooled connections and the event loop
+		'''
+		if self.__session is not None:
+			self.__loop.run_until_complete(self.__session.close())
+			self.__session = None
+		self.__loop.close()
+
+	async def __gather(self, coroutine_func, items, concurrency):
+		if self.__session is None:
+			self.__session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.__connections))
+		semaphore = asyncio.Semaphore(concurrency)
+
+		async def bounded(item):
+			async with semaphore:
+				if self.__retry_policy is not None:
+					return await self.__retry_policy.call_async(self.__call, coroutine_func, *item)
+				return await self.__call(coroutine_func, *item)
+
+		return await asyncio.gather(*[bounded(item) for item in items])
+
+	async def __call(self, coroutine_func, *args):
+		'''
+		Await coroutine_func, broken connections of aiohttp are raised as ConnectionError so that a RetryPolicy retries them
+		'''
+		try:
+			return await coroutine_func(*args)
+		except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError) as error:
+			raise ConnectionError(str(error)) from error
+
+	async def get_range_into(self, container_name, path, start_range, end_range, view):
+		'''
+		Get range [start_range, end_range] of a blob or a file into a preallocated memoryview
+
+		param:
+		 container_name: container or share
+		 path: blob name, or file path relative to the share
+		 start_range: start offset in bytes
+		 end_range: inclusive end offset in bytes
+		 view: writable memoryview receiving the data
+		'''
+		start = time.perf_counter()
+		headers = {'x-ms-range': 'bytes={0}-{1}'.format(start_range, end_range)}
+		async with self.__request('GET', container_name, path, {}, headers) as response:
+			await self.__raise_for_status(response)
+			offset = 0
+			async for chunk in response.content.iter_any():
+				view[offset:offset + len(chunk)] = chunk
+				offset = offset + len(chunk)
+		self.__record(start, end_range - start_range + 1)
+
+	async def put_block(self, container_name, blob_name, block, block_id):
+		'''
+		Stage a block of a block blob, block ids are encoded the same way as BlockBlobService.put_block
+		'''
+		start = time.perf_counter()
+		query = {'comp': 'block', 'blockid': base64.b64encode(block_id.encode('utf-8')).decode('utf-8')}
+		async with self.__request('PUT', container_name, blob_name, query, {}, block) as response:
+			await self.__raise_for_status(response)
+		self.__record(start, len(block))
+
+	async def update_range(self, share_name, directory_name, file_name, data, start_range, end_range):
+		'''
+		Write range [start_range, end_range] of a file, same as FileService.update_range
+		'''
+		start = time.perf_counter()
+		path = file_name if directory_name is None else directory_name + '/' + file_name
+		headers = {'x-ms-range': 'bytes={0}-{1}'.format(start_range, end_range), 'x-ms-write': 'update'}
+		async with self.__request('PUT', share_name, path, {'comp': 'range'}, headers, data) as response:
+			await self.__raise_for_status(response)
+		self.__record(start, len(data))
+
+	def __record(self, start, size):
+		if self.__histogram is not None:
+			self.__histogram.record(time.perf_counter() - start, size)
+
+	def __request(self, method, container_name, path, query, headers, data = None):
+		path = quote('/{0}/{1}'.format(container_name, path), safe='/~')
+		headers['x-ms-date'] = formatdate(usegmt=True)
+		headers['x-ms-version'] = self.X_MS_VERSION
+		headers['Content-Length'] = str(len(data)) if data is not None else '0'
+		if data is not None:
+			headers['Content-Type'] = 'application/octet-stream'
+		headers['Authorization'] = self.__sign(method, path, query, headers)
+		url = self.__endpoint + path
+		if query:
+			url = url + '?' + urlencode(sorted(query.items()))
+		return self.__session.request(method, yarl.URL(url, encoded=True), headers=headers, data=data)
+
+	def __sign(self, method, path, query, headers):
+		'''
+		Shared Key signature, see https://docs.microsoft.com/en-us/rest/api/storageservices/authorize-with-shared-key
+		'''
+		content_length = headers['Content-Length'] if headers['Content-Length'] != '0' else ''
+		string_to_sign = method + '\n\n\n' + content_length + '\n\n' + headers.get('Content-Type', '') + '\n\n\n\n\n\n\n'
+		for name in sorted(name for name in headers if name.startswith('x-ms-')):
+			string_to_sign = string_to_sign + name + ':' + headers[name] + '\n'
+		string_to_sign = string_to_sign + '/' + self.__account_name + path
+		for name in sorted(query):
+			string_to_sign = string_to_sign + '\n' + name + ':' + query[name]
+		signature = hmac.new(self.__account_key, string_to_sign.encode('utf-8'), hashlib.sha256).digest()
+		return 'SharedKey {0}:{1}'.format(self.__account_name, base64.b64encode(signature).decode('utf-8'))
+
+	async def __raise_for_status(self, response):
+		if response.status >= 300:
+			raise AsyncStorageError(response.status, await response.text())
@@ -1,28 +1,117 @@
+import os, functools
 from mpi4py import MPI
+from common import common, ranged_io, collective, streaming, node_cache, chunk_cache
 
 class BaseBench(object):
 	'''
 	Base class for benchmarking tools for HPC purpose.
 	MPI is used for process management.
 
+	Patterns built on ranged reads are implemented once here on top of the _get_size, _get_etag and _fetch_into hooks of each target.
+	Targets calling set_comm of their own bind BaseBench as well.
+
 	param:
 	 access_name: Storage target access name
 	 access_key: Storage target access key
 	 access_container_list: Containers to be accessed
+	 comm: communicator of processes taking part in the benches, MPI.COMM_WORLD by default
+	 chunk_cache_dir: optional directory on local disk of a chunk cache shared by the processes of a node,
+	  every ranged read of the targets supporting it goes through the cache, None to read storage directly
+	 chunk_cache_size: capacity of the chunk cache in GiB
 	'''
-	__slots__ = ('__bench_target', '__mpi_rank', '__mpi_size', '__storage_service')
+	BROADCAST_CHUNK_DEFAULT = 16384 # in KiB
+	PARTITION_STRIPE_DEFAULT = 4096 # in KiB
+	STREAM_CHUNK_DEFAULT = 16384 # in KiB
+	WRITE_BEHIND_CAP_DEFAULT = 256 # in MiB
+	CHUNK_CACHE_DIR_DEFAULT = '/mnt/resource/azure-hpc-io-cache' # temporary storage of Azure VMs
+	CHUNK_CACHE_SIZE_DEFAULT = 16 # in GiB
+	SMALL_OBJECT_COUNT_DEFAULT = 1000 # objects per rank
+	SMALL_OBJECT_SIZE_DEFAULT = 4 # in KiB
+
+	__slots__ = ('__bench_target', '__comm', '__mpi_rank', '__mpi_size', '__storage_service', '__chunk_cache')
 	
-	def __init__(self, access_name, access_key, access_container_list):
+	def __init__(self, access_name, access_key, access_container_list, comm = MPI.COMM_WORLD, chunk_cache_dir = None, chunk_cache_size = CHUNK_CACHE_SIZE_DEFAULT):
 		self.__bench_target = 'Base'
-		self.__mpi_rank = MPI.COMM_WORLD.Get_rank()
-		self.__mpi_size = MPI.COMM_WORLD.Get_size()
+		self.set_comm(comm)
 		self.__storage_service = None
+		self.__chunk_cache = None
+		if chunk_cache_dir is not None:
+			self.__chunk_cache = chunk_cache.ChunkCache(chunk_cache_dir, chunk_cache_size << 30)
+
+	def set_comm(self, comm):
+		'''
+		Bind the tool to the communicator of processes taking part in the following benches,
+		so that a tool and its storage service can be reused for different rank counts
+		'''
+		self.__comm = comm
+		self.__mpi_rank = comm.Get_rank()
+		self.__mpi_size = comm.Get_size()
+
+	def close(self):
+		'''
+		Release resources held by the tool across benches, e.g. pooled connections, the tool is not used afterwards
+		'''
+		pass
 
 	def __str__(self):
 		return '[{0}]: on rank {1} out of {2}'.format(self.__bench_target, self.__mpi_rank, self.__mpi_size)
 
 	__repr__ = __str__
 
+	def _get_size(self, container_name, directory_name, file_name):
+		'''
+		Size of a source in bytes
+		'''
+		raise NotImplementedError()
+
+	def _get_etag(self, container_name, directory_name, file_name):
+		'''
+		Etag of a source, which changes whenever the source is modified
+		'''
+		raise NotImplementedError()
+
+	def _fetch_into(self, container_name, directory_name, file_name, start_range, end_range, view, chunk_cache = None, cache_name = None):
+		'''
+		Read range [start_range, end_range] of a source into a preallocated memoryview with the configured read engine.
+		With a chunk_cache every ranged request of the engine is a chunk of the cache, keyed by cache_name and its range.
+		'''
+		raise NotImplementedError()
+
+	@property
+	def chunk_cache(self):
+		'''
+		Chunk cache shared by the processes of a node, None when reads go to storage directly
+		'''
+		return self.__chunk_cache
+
+	def __get_cache_name(self, container_name, directory_name, file_name):
+		return '/'.join([name for name in (container_name, directory_name, file_name) if name] + [self._get_etag(container_name, directory_name, file_name)])
+
+	def _get_reader(self, container_name, directory_name, file_name):
+		'''
+		Get a callable(start_range, end_range, view) reading ranges of a source with _fetch_into, through the chunk cache if any.
+		The etag of the source is got once here, outside of timed reads.
+		'''
+		if self.__chunk_cache is None:
+			return functools.partial(self._fetch_into, container_name, directory_name, file_name)
+		return functools.partial(self._fetch_into, container_name, directory_name, file_name,
+			chunk_cache=self.__chunk_cache, cache_name=self.__get_cache_name(container_name, directory_name, file_name))
+
+	def get_input_size(self, container_name, directory_name, file_name, layout = 'single'):
+		'''
+		Size of the source read by current rank, named the same way as by the input patterns
+
+		param:
+		 container_name: source container
+		 directory_name: source directory
+		 file_name: source file, or source file base for the multiple-file layouts
+		 layout: `single` for a source shared by all ranks, `multiple` for the sources of MFMR, `multiple_containers` for the sources of MFMRMC
+
+		return:
+		 size: size of the source in bytes
+		'''
+		raise NotImplementedError()
+
 	def bench_inputs_with_single_file_multiple_readers(self, container_name, directory_name, file_name):
 		'''
 		Benchmarking inputs with pattern `Single File Multiple Readers`
@@ -39,6 +128,167 @@ class BaseBench(object):
 		'''
 		raise NotImplementedError()
 
+	def bench_inputs_with_streaming_readers(self, container_name, directory_name, file_name, chunk_size = STREAM_CHUNK_DEFAULT, buffers = 2, kernel = None):
+		'''
+		Benchmarking inputs with pattern `Single File Streaming Readers`
+
+		Every processes streams the entire source and applies a compute kernel on each chunk,
+		while the following chunks are prefetched into a bounded set of buffers.
+
+		param:
+		 container_name: source container
+		 directory_name: source directory
+		 file_name: source file
+		 chunk_size: size of each streamed chunk in KiB
+		 buffers: number of chunk buffers, 2 for double buffering
+		 kernel: callable(view) applied on every chunk, see streaming.get_kernel
+
+		return:
+		 max_time: maximum elapsed time
+		 min_time: minimum elapsed time
+		 avg_time: average elapsed time
+		 avg_io_time: average I/O time
+		 avg_compute_time: average compute time
+		 avg_wait_time: average time compute waited for I/O
+		 hidden_io: fraction of I/O time hidden behind compute
+		'''
+		size = self._get_size(container_name, directory_name, file_name) # in bytes
+		fetch_into = self._get_reader(container_name, directory_name, file_name)
+		kernel = kernel or streaming.get_kernel('none')
+
+		self.__comm.Barrier()
+		start = MPI.Wtime()
+		io_time, compute_time, wait_time = streaming.stream_and_compute(fetch_into, size, chunk_size << 10, buffers, kernel)
+		end = MPI.Wtime()
+		self.__comm.Barrier()
+
+		return common.collect_overlap_metrics(end - start, io_time, compute_time, wait_time, comm=self.__comm)
+
+	def bench_inputs_with_node_cache(self, container_name, directory_name, file_name):
+		'''
+		Benchmarking inputs with pattern `Single File Multiple Readers` through a node-level cache
+
+		The file is fetched once per node into an MPI shared-memory window, each processes on the node fetches one contiguous share
+		with the configured read engine, then every processes accesses the entire file in place, see node_cache.NodeCache.
+		Compared with `Single File Multiple Readers`, the egress drops from the file size per processes to the file size per node.
+		In the same repetition, every processes first reads the entire file on its own without any cache, between the same barriers,
+		so that both bandwidths are measured under the same conditions.
+
+		param:
+		 container_name: source container
+		 directory_name: source directory
+		 file_name: source file
+
+		return:
+		 max_read: maximum read time
+		 min_read: minimum read time
+		 avg_read: average read time
+		 bandwidth: per-rank bandwidth in MiB/s, file size divided by maximum read time
+		 egress: bytes fetched from storage by all nodes in MiB
+		 egress_without_cache: bytes fetched from storage by all processes reading without the cache in MiB
+		 max_read_without_cache: maximum read time without the cache
+		 bandwidth_without_cache: per-rank bandwidth in MiB/s without the cache, file size divided by maximum read time without the cache
+		'''
+		size = self._get_size(container_name, directory_name, file_name) # in bytes
+		fetch_into = self._get_reader(container_name, directory_name, file_name)
+		direct_fetch_into = functools.partial(self._fetch_into, container_name, directory_name, file_name)
+		buffer = ranged_io.get_read_buffer(size)
+
+		# Reads without the cache
+		self.__comm.Barrier()
+		start = MPI.Wtime()
+		direct_fetch_into(0, size - 1, buffer)
+		end = MPI.Wtime()
+		self.__comm.Barrier()
+		direct_time = end - start
+
+		# Reads through the cache
+		cache = node_cache.NodeCache(size, self.__comm)
+		try:
+			self.__comm.Barrier()
+			start = MPI.Wtime()
+			fetched_bytes = cache.fill(fetch_into)
+			end = MPI.Wtime()
+			self.__comm.Barrier()
+		finally:
+			cache.close()
+
+		egress = self.__comm.allreduce(fetched_bytes, op=MPI.SUM)
+		egress_without_cache = self.__comm.allreduce(len(buffer), op=MPI.SUM)
+		max_read, min_read, avg_read = common.collect_bench_metrics(end - start, comm=self.__comm)
+		max_direct, _, _ = common.collect_bench_metrics(direct_time, comm=self.__comm)
+		return (max_read, min_read, avg_read, common.collect_bench_bandwidth(size, max_read), round(egress / (1 << 20), 3), round(egress_without_cache / (1 << 20), 3),
+			max_direct, common.collect_bench_bandwidth(size, max_direct))
+
+	def bench_inputs_with_chunk_cache(self, container_name, directory_name, file_name, cache_dir = CHUNK_CACHE_DIR_DEFAULT, cache_size = CHUNK_CACHE_SIZE_DEFAULT):
+		'''
+		Benchmarking inputs with pattern `Single File Multiple Readers` through an on-disk chunk cache
+
+		Every processes reads the entire file twice with the configured read engine through a chunk_cache.ChunkCache on local disk,
+		each ranged request of the engine being a chunk. Chunks are keyed by the etag of the file, so that a modified file is fetched again.
+		The first read is cold, the cache is cleared beforehand, the second read is warm. Cached chunks are dropped from the page cache
+		in between, so that warm reads hit the local disk rather than memory.
+		Each processes keeps its own cache in a subdirectory of cache_dir, so that chunks fetched by other processes of the node
+		during the cold read are not hit.
+
+		param:
+		 container_name: source container
+		 directory_name: source directory
+		 file_name: source file
+		 cache_dir: cache directory on local disk, each processes caches in cache_dir/'{:0>5}'.format(__mpi_rank)
+		 cache_size: capacity of the cache of each processes in GiB
+
+		return:
+		 max_cold_read: maximum cold read time
+		 min_cold_read: minimum cold read time
+		 avg_cold_read: average cold read time
+		 cold_bandwidth: per-rank bandwidth in MiB/s of cold reads, file size divided by maximum cold read time
+		 max_warm_read: maximum warm read time
+		 min_warm_read: minimum warm read time
+		 avg_warm_read: average warm read time
+		 warm_bandwidth: per-rank bandwidth in MiB/s of warm reads
+		 warm_hit_ratio: fraction of chunks served by the cache during warm reads
+		 cold_hit_ratio: fraction of chunks served by the cache during cold reads, 0 unless chunks are cached concurrently
+		'''
+		size = self._get_size(container_name, directory_name, file_name) # in bytes
+		cache = chunk_cache.ChunkCache(os.path.join(cache_dir, '{:0>5}'.format(self.__mpi_rank)), cache_size << 30)
+		fetch_into = functools.partial(self._fetch_into, container_name, directory_name, file_name,
+			chunk_cache=cache, cache_name=self.__get_cache_name(container_name, directory_name, file_name))
+		view = ranged_io.get_read_buffer(size)
+		cache.clear()
+
+		# Cold reads
+		self.__comm.Barrier()
+		start = MPI.Wtime()
+		fetch_into(0, size - 1, view)
+		end = MPI.Wtime()
+		self.__comm.Barrier()
+		cold_time = end - start
+		cold_hit_ratio = self.__collect_hit_ratio(cache)
+
+		# Warm reads
+		cache.drop_page_cache()
+		cache.reset_counters()
+		self.__comm.Barrier()
+		start = MPI.Wtime()
+		fetch_into(0, size - 1, view)
+		end = MPI.Wtime()
+		self.__comm.Barrier()
+		warm_time = end - start
+
+		warm_hit_ratio = self.__collect_hit_ratio(cache)
+		max_cold, min_cold, avg_cold = common.collect_bench_metrics(cold_time, comm=self.__comm)
+		max_warm, min_warm, avg_warm = common.collect_bench_metrics(warm_time, comm=self.__comm)
+		return max_cold, min_cold, avg_cold, common.collect_bench_bandwidth(size, max_cold), max_warm, min_warm, avg_warm, common.collect_bench_bandwidth(size, max_warm), warm_hit_ratio, cold_hit_ratio
+
+	def __collect_hit_ratio(self, cache):
+		'''
+		Fraction of chunk lookups of all processes served by the cache since its counters were reset
+		'''
+		hits = self.__comm.allreduce(cache.hits, op=MPI.SUM)
+		lookups = self.__comm.allreduce(cache.hits + cache.misses, op=MPI.SUM)
+		return round(hits / lookups, 3) if lookups else 0
+
 	def bench_inputs_with_multiple_files_multiple_readers(self, container_name, directory_name, file_name):
 		'''
 		Benchmarking inputs with pattern `Multiple Files Multiple Readers`
@@ -75,6 +325,76 @@ class BaseBench(object):
 		'''
 		raise NotImplementedError()
 
+	def bench_inputs_with_single_reader_broadcast(self, container_name, directory_name, file_name, reader = 'root', chunk_size = BROADCAST_CHUNK_DEFAULT):
+		'''
+		Benchmarking inputs with pattern `Single Reader & Broadcast`
+
+		A single reader fetches the source and distributes it to other processes with MPI broadcast.
+		The source is pipelined in chunks so that fetching the next chunk overlaps with broadcasting the previous one.
+
+		param:
+		 container_name: source container
+		 directory_name: source directory
+		 file_name: source file
+		 reader: `root` for a single reader on rank 0, `node` for one reader per node
+		 chunk_size: size of each broadcast chunk in KiB
+
+		return:
+		 max_read: maximum read time
+		 min_read: minimum read time
+		 avg_read: average read time
+		'''
+		comm = collective.get_broadcast_comm(reader, self.__comm)
+		size = None
+		if 0 == comm.Get_rank():
+			size = self._get_size(container_name, directory_name, file_name) # in bytes
+		size = comm.bcast(size, root=0)
+		fetch_into = self._get_reader(container_name, directory_name, file_name)
+
+		self.__comm.Barrier()
+		start = MPI.Wtime()
+		collective.pipelined_broadcast(comm, fetch_into, size, chunk_size << 10)
+		end = MPI.Wtime()
+		self.__comm.Barrier()
+
+		if comm != self.__comm:
+			comm.Free()
+
+		return common.collect_bench_metrics(end - start, comm=self.__comm)
+
+	def bench_inputs_with_single_file_partitioned_readers(self, container_name, directory_name, file_name, layout = 'contiguous', stripe_size = PARTITION_STRIPE_DEFAULT, allgather = False):
+		'''
+		Benchmarking inputs with pattern `Single File Partitioned Readers`
+
+		Each processes reads only its share of a shared file, either one contiguous section or stripes assigned round-robin.
+		Optionally, shares are exchanged with MPI_Allgatherv afterwards so that every processes holds the entire file.
+
+		param:
+		 container_name: source container
+		 directory_name: source directory
+		 file_name: source file
+		 layout: `contiguous` or `strided`
+		 stripe_size: size of each stripe in KiB for the `strided` layout
+		 allgather: indicate whether to gather the entire file on every processes
+
+		return:
+		 max_read: maximum read time
+		 min_read: minimum read time
+		 avg_read: average read time
+		 bandwidth: collective bandwidth in MiB/s, file size divided by maximum read time
+		'''
+		size = self._get_size(container_name, directory_name, file_name) # in bytes
+		fetch_into = self._get_reader(container_name, directory_name, file_name)
+
+		self.__comm.Barrier()
+		start = MPI.Wtime()
+		collective.partitioned_read(self.__comm, fetch_into, size, layout, stripe_size << 10, allgather)
+		end = MPI.Wtime()
+		self.__comm.Barrier()
+
+		max_read, min_read, avg_read = common.collect_bench_metrics(end - start, comm=self.__comm)
+		return max_read, min_read, avg_read, common.collect_bench_bandwidth(size, max_read)
+
 	def bench_outputs_with_single_file_multiple_writers(self, container_name, directory_name, file_name, output_per_rank, data):
 		'''
 		Benchmarking outputs with pattern `Single File Multiple Writers`
@@ -95,6 +415,86 @@ class BaseBench(object):
 		'''
 		raise NotImplementedError()
 	
+	def bench_outputs_with_write_behind(self, container_name, directory_name, file_name, output_per_rank, data = None, memory_cap = WRITE_BEHIND_CAP_DEFAULT, threads = None):
+		'''
+		Benchmarking outputs with pattern `Single File Write-Behind`
+
+		Each processes hands its section of a single shared file to a write-behind staging area and continues at once,
+		background threads write the staged sections, bounded by memory_cap.
+
+		param:
+		 container_name: target container
+		 directory_name: target directory
+		 file_name: target file
+		 output_per_rank: size of outputs per rank in MiB
+		 data: optional cached data for outputs
+		 memory_cap: maximum staged outputs per rank in MiB
+		 threads: number of background upload threads
+
+		return:
+		 max_visible_time: maximum time the application was blocked
+		 min_visible_time: minimum time the application was blocked
+		 avg_visible_time: average time the application was blocked
+		 max_durable_time: maximum time to durability
+		 min_durable_time: minimum time to durability
+		 avg_durable_time: average time to durability
+		 bandwidth: collective bandwidth in MiB/s, total outputs divided by maximum time to durability
+		 max_stall_time: maximum time blocked by the memory cap
+		'''
+		raise NotImplementedError()
+
+	def bench_outputs_with_aggregated_writers(self, container_name, directory_name, file_name, output_per_rank, data, aggregators, layout):
+		'''
+		Benchmarking outputs with patterns `Single File Aggregated Writers` and `Multiple Files Aggregated Writers`
+
+		Ranks on each node gather their outputs on one of `aggregators` aggregators per node, only aggregators write.
+
+		param:
+		 container_name: target container
+		 directory_name: target directory
+		 file_name: target file, or target file base for the `multiple` layout
+		 output_per_rank: size of outputs per rank in MiB
+		 data: optional cached data for outputs
+		 aggregators: number of aggregators per node
+		 layout: `single` for a shared file, `multiple` for one file per aggregator
+
+		return:
+		 max_write_time: maximum writing time
+		 min_write_time: minimum writing time
+		 avg_write_time: average writing time
+		 bandwidth: collective bandwidth in MiB/s
+		 max_gather_time: maximum time of gathering outputs on aggregators
+		 write_requests: number of write requests of all aggregators
+		'''
+		raise NotImplementedError()
+
+	def bench_metadata_operations(self, container_name, directory_name, file_name, object_count, object_size, concurrency = None):
+		'''
+		Benchmarking many small objects with pattern `Many Small Objects`
+
+		Each processes creates object_count objects of object_size KiB, then stats, reads, lists and deletes them,
+		with concurrency requests in flight per rank. Phases are separated by barriers.
+
+		param:
+		 container_name: target container
+		 directory_name: target directory
+		 file_name: object base
+		 object_count: number of objects per rank
+		 object_size: size of each object in KiB
+		 concurrency: requests in flight per rank
+
+		return:
+		 max_time: maximum time of all phases
+		 min_time: minimum time of all phases
+		 avg_time: average time of all phases
+		 create_rate: objects created per second of all processes
+		 stat_rate: objects stated per second of all processes
+		 read_rate: objects read per second of all processes
+		 list_rate: listed objects per second of all processes
+		 delete_rate: objects deleted per second of all processes
+		'''
+		raise NotImplementedError()
+
 	def bench_outputs_with_multiple_files_multiple_writers(self, container_name, directory_name, file_name, output_per_rank, data):
 		'''
 		Benchmarking outputs with pattern `Multiple Files Multiple Writers`
@@ -1,7 +1,8 @@
+import functools
 from mpi4py import MPI
 from azure.storage import blob
 from tool.base_bench import BaseBench
-from common import common
+from common import common, ranged_io, collective, histogram, retry, write_behind
 
 class AzureBlobBench(BaseBench):
 	'''
@@ -12,20 +13,111 @@ class AzureBlobBench(BaseBench):
 	 access_name: Storage target access name
 	 access_key: Storage target access key
 	 access_container_list: Containers to be accessed
+	 read_engine: engine for ranged reads, `sequential` gets SECTION_LIMIT sections one by one, `parallel` keeps read_concurrency ranged gets in flight
+	 read_concurrency: number of in-flight ranged gets per rank for the `parallel` engine
+	 read_chunk_size: size of each ranged get for the `parallel` engine in KiB
+	 write_concurrency: number of in-flight put_block calls per rank
+	 block_size: size of each staged block in KiB, no more than BLOCK_LIMIT
+	 io_engine: engine for concurrent requests, `threads` issues BlockBlobService calls on a thread pool,
+	  `asyncio` issues requests as coroutines over a pooled set of HTTP connections
+	 request_histogram: optional LatencyHistogram recording latency and size of every storage request
+	 retry_policy: optional RetryPolicy retrying and counting throttled requests, instead of the retries of the SDK
+	 storage_service: optional storage service used instead of a BlockBlobService of the access account, e.g. a service of tool.emulator
+	 comm: communicator of processes taking part in the benches, MPI.COMM_WORLD by default
+	 chunk_cache_dir: optional directory of a chunk cache shared by the processes of a node, every ranged read goes through it,
+	  the asyncio engine then reads on threads
+	 chunk_cache_size: capacity of the chunk cache in GiB
 	'''
 	# Azure Blob limits
 	BLOCK_LIMIT = 100 # in MiB
 	SECTION_LIMIT = 1024 # in MiB
 	BLOCK_LIMIT_IN_BYTES = BLOCK_LIMIT << 20 # in bytes
 	SECTION_LIMIT_IN_BYTES = SECTION_LIMIT << 20 # in bytes
+	BLOCK_COUNT_LIMIT = 50000 # blocks per blob
+	READ_CHUNK_DEFAULT = 4096 # in KiB
 
-	__slots__ = ('__bench_target', '__mpi_rank', '__mpi_size', '__storage_service')
+	__slots__ = ('__bench_target', '__comm', '__mpi_rank', '__mpi_size', '__storage_service', '__read_engine', '__read_concurrency', '__read_chunk_size_in_bytes', '__write_concurrency', '__block_size_in_bytes', '__async_client')
 
-	def __init__(self, access_name, access_key, access_container_list):
-		self.__mpi_rank = MPI.COMM_WORLD.Get_rank()
-		self.__mpi_size = MPI.COMM_WORLD.Get_size()
+	def __init__(self, access_name, access_key, access_container_list, read_engine = 'sequential', read_concurrency = 1, read_chunk_size = READ_CHUNK_DEFAULT, write_concurrency = 1, block_size = BLOCK_LIMIT << 10, io_engine = 'threads', storage_service = None, request_histogram = None, retry_policy = None, comm = MPI.COMM_WORLD, chunk_cache_dir = None, chunk_cache_size = BaseBench.CHUNK_CACHE_SIZE_DEFAULT):
+		super(AzureBlobBench, self).__init__(access_name, access_key, access_container_list, comm, chunk_cache_dir, chunk_cache_size)
 		self.__bench_target = 'Azure Blob'
-		self.__storage_service = blob.BlockBlobService(account_name=access_name, account_key=access_key)
+		if storage_service is not None and io_engine != 'threads':
+			raise ValueError('I/O engine {} is not available for a custom storage service'.format(io_engine))
+		self.__storage_service = storage_service
+		if storage_service is None:
+			self.__storage_service = blob.BlockBlobService(account_name=access_name, account_key=access_key)
+			if retry_policy is not None:
+				self.__storage_service.retry = retry.no_retry
+		if request_histogram is not None:
+			self.__storage_service = histogram.InstrumentedService(self.__storage_service, request_histogram)
+		if retry_policy is not None:
+			self.__storage_service = retry.RetryingService(self.__storage_service, retry_policy)
+		if read_engine not in ('sequential', 'parallel'):
+			raise ValueError('Unknown read engine {}'.format(read_engine))
+		self.__read_engine = read_engine
+		self.__read_concurrency = read_concurrency
+		self.__read_chunk_size_in_bytes = read_chunk_size << 10
+		if block_size > self.BLOCK_LIMIT << 10:
+			raise ValueError('Block size of {} KiB exceeds the limit of {} MiB'.format(block_size, self.BLOCK_LIMIT))
+		self.__write_concurrency = write_concurrency
+		self.__block_size_in_bytes = block_size << 10
+		if storage_service is None:
+			ranged_io.size_connection_pool(self.__storage_service.request_session, max(read_concurrency, write_concurrency))
+		self.__async_client = None
+		if io_engine == 'asyncio':
+			from tool.async_storage import AsyncStorageClient
+			self.__async_client = AsyncStorageClient(access_name, access_key, 'blob', max(read_concurrency, write_concurrency), request_histogram, retry_policy)
+		elif io_engine != 'threads':
+			raise ValueError('Unknown I/O engine {}'.format(io_engine))
+
+	def set_comm(self, comm):
+		'''
+		Bind the tool to the communicator of processes taking part in the following benches,
+		so that a tool and its storage service can be reused for different rank counts
+		'''
+		super(AzureBlobBench, self).set_comm(comm)
+		self.__comm = comm
+		self.__mpi_rank = comm.Get_rank()
+		self.__mpi_size = comm.Get_size()
+
+	def close(self):
+		'''
+		Close the pooled connections and the event loop of the asyncio engine
+		'''
+		if self.__async_client is not None:
+			self.__async_client.close()
+			self.__async_client = None
+
+	def get_input_size(self, container_name, directory_name, file_name, layout = 'single'):
+		'''
+		Size of the source read by current rank, named the same way as by the input patterns
+
+		param:
+		 container_name: source container
+		 directory_name: source directory
+		 file_name: source file, or source file base for the multiple-file layouts
+		 layout: `single` for a source shared by all ranks, `multiple` for the sources of MFMR, `multiple_containers` for the sources of MFMRMC
+
+		return:
+		 size: size of the source in bytes
+		'''
+		if layout != 'single':
+			file_name = file_name + '{:0>5}'.format(self.__mpi_rank)
+		if layout == 'multiple_containers':
+			container_name = container_name + '{:0>5}'.format(self.__mpi_rank)
+		return self._get_size(container_name, directory_name, file_name)
+
+	def _get_size(self, container_name, directory_name, file_name):
+		'''
+		Size of a blob in bytes, directory_name is ignored
+		'''
+		return self.__storage_service.get_blob_properties(container_name, file_name).properties.content_length
+
+	def _get_etag(self, container_name, directory_name, file_name):
+		'''
+		Etag of a blob, directory_name is ignored
+		'''
+		return self.__storage_service.get_blob_properties(container_name, file_name).properties.etag
 
 	def bench_inputs_with_single_file_multiple_readers(self, container_name, directory_name, file_name):
 		'''
@@ -34,6 +126,9 @@ class AzureBlobBench(BaseBench):
 		For benchmarking on large sources, the entier data will be divided into serveral sections with size of SECTION_LIMIT, 
 		the read operations will be performed sequentially on each sections. Every processes will read the entire data individually.
 
+		With the `parallel` read engine, the blob is split into ranges of read_chunk_size and read_concurrency ranged gets are kept
+		in flight, each of them writing into its own slice of one preallocated buffer.
+
 		param:
 		 container_name: source container
 		 directory_name: source directory
@@ -45,14 +140,26 @@ class AzureBlobBench(BaseBench):
 		 avg_read: average read time
 		'''
 		# Sections to be get
-		blob_size = self.__storage_service.get_blob_properties(container_name, file_name).properties.content_length  # in bytes
+		blob_size = self._get_size(container_name, directory_name, file_name)  # in bytes
 		blob_size_in_mib = blob_size >> 20  # in MiB
 		# Get operations to be performed
 		section_count = blob_size_in_mib // self.SECTION_LIMIT
 		if blob_size_in_mib % self.SECTION_LIMIT:
 			section_count = section_count + 1
 
-		MPI.COMM_WORLD.Barrier()
+		if self.__read_engine == 'parallel' or self.chunk_cache is not None:
+			buffer = ranged_io.get_read_buffer(blob_size)
+			fetch_into = self._get_reader(container_name, directory_name, file_name)
+
+			self.__comm.Barrier()
+			start = MPI.Wtime()
+			fetch_into(0, blob_size - 1, buffer)
+			end = MPI.Wtime()
+			self.__comm.Barrier()
+
+			return common.collect_bench_metrics(end - start, comm=self.__comm)
+
+		self.__comm.Barrier()
 		start = MPI.Wtime()
 		for section in range(0, section_count):
 			range_start = section * self.SECTION_LIMIT_IN_BYTES
@@ -64,9 +171,32 @@ class AzureBlobBench(BaseBench):
 			self.__storage_service.get_blob_to_bytes(container_name, file_name, start_range=range_start, end_range=range_end)
 			
 		end = MPI.Wtime()
-		MPI.COMM_WORLD.Barrier()
+		self.__comm.Barrier()
 
-		return common.collect_bench_metrics(end - start)
+		return common.collect_bench_metrics(end - start, comm=self.__comm)
+
+	def __get_blob_range_into(self, container_name, blob_name, start_range, end_range, view):
+		'''
+		Get range [start_range, end_range] of a blob into a preallocated memoryview
+		'''
+		self.__storage_service.get_blob_to_stream(container_name, blob_name, ranged_io.MemoryviewWriter(view), start_range=start_range, end_range=end_range, max_connections=1)
+
+	def _fetch_into(self, container_name, directory_name, blob_name, start_range, end_range, view, chunk_cache = None, cache_name = None):
+		'''
+		Read range [start_range, end_range] of a blob into a preallocated memoryview with the configured read engine, directory_name is ignored.
+		With a chunk_cache every ranged get is a chunk of the cache.
+		'''
+		fetch_into = functools.partial(self.__get_blob_range_into, container_name, blob_name)
+		if chunk_cache is not None:
+			fetch_into = functools.partial(chunk_cache.fetch_into, fetch_into, cache_name)
+		if self.__read_engine == 'parallel' and self.__async_client is not None and chunk_cache is None:
+			ranges = ranged_io.split_ranges(start_range, end_range - start_range + 1, self.__read_chunk_size_in_bytes)
+			items = [(container_name, blob_name, start, end, view[start - start_range:end - start_range + 1]) for start, end in ranges]
+			self.__async_client.run_concurrently(self.__async_client.get_range_into, items, self.__read_concurrency)
+		elif self.__read_engine == 'parallel':
+			ranged_io.parallel_ranged_read(fetch_into, start_range, end_range - start_range + 1, view, self.__read_chunk_size_in_bytes, self.__read_concurrency)
+		else:
+			fetch_into(start_range, end_range, view)
 
 	def bench_inputs_with_multiple_files_multiple_readers(self, container_name, directory_name, file_name):
 		'''
@@ -109,20 +239,70 @@ class AzureBlobBench(BaseBench):
 		
 		return self.bench_inputs_with_single_file_multiple_readers(proc_container_name, directory_name, proc_blob_name)
 
+	def __get_blocks(self, container_name, file_name, output_per_rank, data):
+		'''
+		Blocks of current rank in a shared blob, the last block holds the remainder of output_per_rank
+
+		return:
+		 block_ids: ids of blocks, '{:0>5}-{:0>5}'.format(rank, index)
+		 blocks: list of (container_name, file_name, block, block_id) as arguments of put_block
+		'''
+		block_size_in_bytes = self.__block_size_in_bytes
+		output_per_rank_in_bytes = output_per_rank << 20 # in bytes
+		if data == None or len(data) < block_size_in_bytes:
+			data = common.workload_generator(self.__mpi_rank, block_size_in_bytes)
+		else:
+			data = data[0:block_size_in_bytes]
+		last_block_data = data
+		block_count = output_per_rank_in_bytes // block_size_in_bytes
+		# Last block doesn't full
+		if output_per_rank_in_bytes % block_size_in_bytes:
+			block_count = block_count + 1
+			last_block_data = common.workload_generator(self.__mpi_rank, output_per_rank_in_bytes % block_size_in_bytes)
+		if block_count * self.__mpi_size > self.BLOCK_COUNT_LIMIT:
+			raise ValueError('{} blocks exceed the limit of {} blocks per blob'.format(block_count * self.__mpi_size, self.BLOCK_COUNT_LIMIT))
+		block_ids = ['{:0>5}-{:0>5}'.format(self.__mpi_rank, i) for i in range(0, block_count)]
+		blocks = [(container_name, file_name, last_block_data if i == block_count - 1 else data, block_id) for i, block_id in enumerate(block_ids)]
+		return block_ids, blocks
+
+	def __commit_blocks(self, container_name, file_name, block_ids):
+		'''
+		Gather block ids of all ranks on rank 0, ordered by rank, and commit them on rank 0
+		'''
+		rank_block_ids = self.__comm.gather(block_ids, root=0)
+		if 0 == self.__mpi_rank:
+			block_list = [blob.BlobBlock(id=block_id) for ids in rank_block_ids for block_id in ids]
+			self.__storage_service.put_block_list(container_name, file_name, block_list)
+
+	def __put_blocks(self, blocks):
+		'''
+		Stage blocks with write_concurrency put_block calls in flight, blocks are (container_name, blob_name, block, block_id)
+		'''
+		if self.__async_client is not None:
+			self.__async_client.run_concurrently(self.__async_client.put_block, blocks, self.__write_concurrency)
+		else:
+			ranged_io.run_concurrently(self.__put_block, blocks, self.__write_concurrency)
+
+	def __put_block(self, container_name, blob_name, block, block_id):
+		'''
+		BlockBlobService.put_block only accepts bytes, slices of a buffer are copied, bytes are passed as they are
+		'''
+		return self.__storage_service.put_block(container_name, blob_name, bytes(block), block_id)
+
 	def bench_outputs_with_single_file_multiple_writers(self, container_name, directory_name, file_name, output_per_rank, data = None):
 		'''
 		Benchmarking outputs with pattern `Single File Multiple Writers`
 		
 		Each processes will access a single shared file in different sections exclusively.
 
-		Data from different rank is stored in different blocks
+		Data from different rank is stored in different blocks of block_size, write_concurrency put_block calls are kept in flight per rank
 
 		Pattern of global block ids: 00002-00005, first section represents for the rank while the second section represents block id written by the rank
 
 		The process is:
 		1. Each rank write blocks to Azure
 		2. MPI_Barrier() to wait for all ranks
-		3. Get uncommited block list, rearrange for the order of data
+		3. Gather block ids of all ranks on rank 0, ordered by rank
 		4. Commit changes
 
 		param:
@@ -130,54 +310,210 @@ class AzureBlobBench(BaseBench):
 		 directory_name: target directory
 		 file_name: target file
 		 output_per_rank: size of outputs per rank in MiB
-		 data: optional cached data for outputs, in this case stands for data of a full block(100 MiB data)
+		 data: optional cached data for outputs, in this case stands for data of a full block
 		
 		return:
 		 max_write_time: maximum writing time
 		 min_write_time: minimum writing time
 		 avg_write_time: average writing time
+		 bandwidth_without_commit: collective bandwidth in MiB/s of staging blocks
+		 bandwidth_with_commit: collective bandwidth in MiB/s of staging and committing blocks
 		'''
-		# Data prepare
-		if data == None:
-			data = common.workload_generator(self.__mpi_rank, self.BLOCK_LIMIT_IN_BYTES)
-		else:
-			data = data[0:self.BLOCK_LIMIT_IN_BYTES - 1]
-		last_block_data = data
-		block_count = output_per_rank // self.BLOCK_LIMIT
-		# Last block doesn't full
-		if output_per_rank % self.BLOCK_LIMIT:
-			block_count = block_count + 1
-			last_block_data = common.workload_generator(self.__mpi_rank, (output_per_rank % self.BLOCK_LIMIT) << 20)
+		output_per_rank_in_bytes = output_per_rank << 20 # in bytes
+		block_ids, blocks = self.__get_blocks(container_name, file_name, output_per_rank, data)
 		
 		# Step.1 put blocks
-		MPI.COMM_WORLD.Barrier()
+		self.__comm.Barrier()
 		start = MPI.Wtime()
-		for i in range(0, block_count):
-			block_id = '{:0>5}-{:0>5}'.format(self.__mpi_rank, i)
-			if i != (block_count - 1):
-				self.__storage_service.put_block(container_name, file_name, data, block_id)
-			elif i == (block_count - 1):
-				self.__storage_service.put_block(container_name, file_name, last_block_data, block_id)
+		self.__put_blocks(blocks)
 		end = MPI.Wtime()
-		MPI.COMM_WORLD.Barrier()
-		max_write, min_write, avg_write = common.collect_bench_metrics(end - start)
+		self.__comm.Barrier()
+		max_write, min_write, avg_write = common.collect_bench_metrics(end - start, comm=self.__comm)
 
-		if 0 == self.__mpi_rank:
-			start_postprocessing = MPI.Wtime()
-			# Step.3 get block list and sort according to block id
-			block_list = self.__storage_service.get_block_list(container_name, file_name, block_list_type=blob.BlockListType.All).uncommitted_blocks
-			block_list.sort(key = lambda block: block.id)
+		# Step.3 gather block ids, no listing and sorting of uncommitted blocks is required, Step.4 commit
+		start_postprocessing = MPI.Wtime()
+		self.__commit_blocks(container_name, file_name, block_ids)
 
-			# Step.4 commit
-			self.__storage_service.put_block_list(container_name, file_name, block_list)
+		total_bytes = output_per_rank_in_bytes * self.__mpi_size
+		bandwidth_without_commit = common.collect_bench_bandwidth(total_bytes, max_write)
+		bandwidth_with_commit = bandwidth_without_commit
+		if 0 == self.__mpi_rank:
 			end_postprocessing = MPI.Wtime()
 
 			postprocessing_time = end_postprocessing - start_postprocessing
 			max_write = round(max_write + postprocessing_time, 3)
 			min_write = round(min_write + postprocessing_time, 3)
 			avg_write = round(avg_write + postprocessing_time, 3)
+			bandwidth_with_commit = common.collect_bench_bandwidth(total_bytes, max_write)
 		
-		return max_write, min_write, avg_write
+		return max_write, min_write, avg_write, bandwidth_without_commit, bandwidth_with_commit
+
+	def bench_outputs_with_write_behind(self, container_name, directory_name, file_name, output_per_rank, data = None, memory_cap = BaseBench.WRITE_BEHIND_CAP_DEFAULT, threads = None):
+		'''
+		Benchmarking outputs with pattern `Single File Write-Behind`
+
+		Blocks of a shared blob are handed to a write-behind staging area and staged with put_block on background threads,
+		so that the application continues as soon as buffers are copied, unless memory_cap is reached.
+		The flush waits for every block, then commits the block list of all ranks on rank 0.
+
+		param:
+		 container_name: target container
+		 directory_name: target directory
+		 file_name: target file
+		 output_per_rank: size of outputs per rank in MiB
+		 data: optional cached data for outputs
+		 memory_cap: maximum staged outputs per rank in MiB
+		 threads: number of background upload threads, write_concurrency by default
+
+		return:
+		 max_visible_time: maximum time the application was blocked
+		 min_visible_time: minimum time the application was blocked
+		 avg_visible_time: average time the application was blocked
+		 max_durable_time: maximum time to durability
+		 min_durable_time: minimum time to durability
+		 avg_durable_time: average time to durability
+		 bandwidth: collective bandwidth in MiB/s, total outputs divided by maximum time to durability
+		 max_stall_time: maximum time blocked by the memory cap
+		'''
+		output_per_rank_in_bytes = output_per_rank << 20 # in bytes
+		block_ids, blocks = self.__get_blocks(container_name, file_name, output_per_rank, data)
+		staging = write_behind.WriteBehind(memory_cap << 20, threads or self.__write_concurrency)
+
+		self.__comm.Barrier()
+		start = MPI.Wtime()
+		for _, _, block, block_id in blocks:
+			staging.submit(block, functools.partial(self.__storage_service.put_block, container_name, file_name, block_id=block_id))
+		visible_end = MPI.Wtime()
+		# Flush
+		staging.flush()
+		self.__commit_blocks(container_name, file_name, block_ids)
+		self.__comm.Barrier()
+		durable_end = MPI.Wtime()
+
+		return common.collect_write_behind_metrics(visible_end - start, durable_end - start, staging.stall_time, output_per_rank_in_bytes * self.__mpi_size, comm=self.__comm)
+
+	def bench_outputs_with_aggregated_writers(self, container_name, directory_name, file_name, output_per_rank, data = None, aggregators = 1, layout = 'single'):
+		'''
+		Benchmarking outputs with patterns `Single File Aggregated Writers` and `Multiple Files Aggregated Writers`
+
+		Ranks on each node are divided into groups, see collective.get_aggregation_comms, and gather their outputs on the aggregator
+		of their group with MPI_Gatherv. Only aggregators write, in blocks of block_size with write_concurrency put_block calls in flight,
+		so that fewer and larger requests are issued. Aggregators hold the outputs of their whole group in memory.
+
+		With the `single` layout block ids of all aggregators are gathered and committed in a shared blob on rank 0,
+		sections are ordered by aggregator. With the `multiple` layout each aggregator commits its own blob,
+		named file_name + '{:0>5}'.format(aggregator).
+
+		param:
+		 container_name: target container
+		 directory_name: target directory
+		 file_name: target file, or target file base for the `multiple` layout
+		 output_per_rank: size of outputs per rank in MiB
+		 data: optional cached data for outputs
+		 aggregators: number of aggregators per node
+		 layout: `single` or `multiple`
+
+		return:
+		 max_write_time: maximum writing time, including gathering and committing
+		 min_write_time: minimum writing time
+		 avg_write_time: average writing time
+		 bandwidth: collective bandwidth in MiB/s, total outputs divided by maximum writing time
+		 max_gather_time: maximum time of gathering outputs on aggregators
+		 write_requests: number of put_block and put_block_list calls of all aggregators
+		'''
+		if layout not in ('single', 'multiple'):
+			raise ValueError('Unknown aggregation layout {}'.format(layout))
+		# Data prepare
+		output_per_rank_in_bytes = output_per_rank << 20 # in bytes
+		if data == None or len(data) < output_per_rank_in_bytes:
+			data = common.workload_generator(self.__mpi_rank, output_per_rank_in_bytes)
+		view = memoryview(data)[0:output_per_rank_in_bytes]
+		group_comm, aggregator_comm = collective.get_aggregation_comms(aggregators, self.__comm)
+		try:
+			is_aggregator = 0 == group_comm.Get_rank()
+			block_count = 0
+			if is_aggregator:
+				block_count = len(ranged_io.split_ranges(0, group_comm.Get_size() * output_per_rank_in_bytes, self.__block_size_in_bytes))
+			if layout == 'single':
+				max_block_count = self.__comm.allreduce(block_count, op=MPI.SUM)
+			else:
+				max_block_count = self.__comm.allreduce(block_count, op=MPI.MAX)
+			if max_block_count > self.BLOCK_COUNT_LIMIT:
+				raise ValueError('{} blocks exceed the limit of {} blocks per blob'.format(max_block_count, self.BLOCK_COUNT_LIMIT))
+
+			self.__comm.Barrier()
+			start = MPI.Wtime()
+			aggregated = collective.gather_to_aggregator(group_comm, view)
+			gather_end = MPI.Wtime()
+			block_ids = []
+			if is_aggregator:
+				aggregator = aggregator_comm.Get_rank()
+				output_blob_name = file_name if layout == 'single' else file_name + '{:0>5}'.format(aggregator)
+				ranges = ranged_io.split_ranges(0, len(aggregated), self.__block_size_in_bytes)
+				block_ids = ['{:0>5}-{:0>5}'.format(aggregator, i) for i in range(0, len(ranges))]
+				blocks = [(container_name, output_blob_name, aggregated[block_start:block_end + 1], block_id) for (block_start, block_end), block_id in zip(ranges, block_ids)]
+				self.__put_blocks(blocks)
+				if layout == 'multiple':
+					self.__storage_service.put_block_list(container_name, output_blob_name, [blob.BlobBlock(id=block_id) for block_id in block_ids])
+			if layout == 'single':
+				self.__commit_blocks(container_name, file_name, block_ids)
+			end = MPI.Wtime()
+			self.__comm.Barrier()
+
+			write_requests = self.__comm.allreduce(block_count + (1 if is_aggregator and layout == 'multiple' else 0), op=MPI.SUM) + (1 if layout == 'single' else 0)
+		finally:
+			group_comm.Free()
+			if aggregator_comm != MPI.COMM_NULL:
+				aggregator_comm.Free()
+
+		max_write, min_write, avg_write = common.collect_bench_metrics(end - start, comm=self.__comm)
+		max_gather, _, _ = common.collect_bench_metrics(gather_end - start, comm=self.__comm)
+		return max_write, min_write, avg_write, common.collect_bench_bandwidth(output_per_rank_in_bytes * self.__mpi_size, max_write), max_gather, write_requests
+
+	def bench_metadata_operations(self, container_name, directory_name, file_name, object_count, object_size, concurrency = None):
+		'''
+		Benchmarking many small objects with pattern `Many Small Objects`
+
+		Each processes creates object_count blobs of object_size KiB named file_name + '{:0>5}-{:0>7}'.format(__mpi_rank, index)
+		with create_blob_from_bytes, then gets their properties, reads them with get_blob_to_bytes, lists them by prefix with list_blobs
+		and deletes them. Phases are separated by barriers and keep concurrency requests in flight per rank.
+
+		param:
+		 container_name: target container
+		 directory_name: ignored
+		 file_name: target blob base
+		 object_count: number of blobs per rank
+		 object_size: size of each blob in KiB
+		 concurrency: requests in flight per rank, write_concurrency by default
+
+		return:
+		 max_time: maximum time of all phases
+		 min_time: minimum time of all phases
+		 avg_time: average time of all phases
+		 create_rate: blobs created per second of all processes
+		 stat_rate: get_blob_properties calls per second of all processes
+		 read_rate: blobs read per second of all processes
+		 list_rate: listed blobs per second of all processes
+		 delete_rate: blobs deleted per second of all processes
+		'''
+		concurrency = concurrency or self.__write_concurrency
+		payload = common.workload_generator(self.__mpi_rank, object_size << 10)
+		prefix = file_name + '{:0>5}-'.format(self.__mpi_rank)
+		names = [(prefix + '{:0>7}'.format(i),) for i in range(0, object_count)]
+		listed = []
+
+		phase_times = [
+			common.time_phase(lambda name: self.__storage_service.create_blob_from_bytes(container_name, name, payload), names, concurrency, self.__comm),
+			common.time_phase(lambda name: self.__storage_service.get_blob_properties(container_name, name), names, concurrency, self.__comm),
+			common.time_phase(lambda name: self.__storage_service.get_blob_to_bytes(container_name, name), names, concurrency, self.__comm),
+			common.time_phase(lambda: listed.extend(self.__storage_service.list_blobs(container_name, prefix=prefix)), [()], 1, self.__comm),
+			common.time_phase(lambda name: self.__storage_service.delete_blob(container_name, name), names, concurrency, self.__comm)
+		]
+		phase_counts = [object_count, object_count, object_count, len(listed), object_count]
+
+		max_time, min_time, avg_time = common.collect_bench_metrics(sum(phase_times), comm=self.__comm)
+		rates = common.collect_bench_rates(phase_times, phase_counts, comm=self.__comm)
+		return (max_time, min_time, avg_time) + tuple(rates)
 
 	def bench_outputs_with_multiple_files_multiple_writers(self, container_name, directory_name, file_name, output_per_rank, data = None):
 		'''
@@ -187,34 +523,43 @@ class AzureBlobBench(BaseBench):
 
 		Pattern of output blobs is: blob_name + 00001 where the second parts represents for the rank of the process 
 
+		Outputs of any size are staged in blocks of block_size with write_concurrency put_block calls in flight, then committed by each rank.
+
 		param:
 		 container_name: target container base, target container name is composed of container_name + '{:0>5}'.format(__mpi_rank)
 		 directory_name: target container directory
 		 file_name: target file base, target file name is composed of file_name + '{:0>5}'.format(__mpi_rank)
 		 output_per_rank: size of outputs per rank in MiB
-		 data: optional cached data for outputs, currently only data less than SECTION_LIMIT is allowed
+		 data: optional cached data for outputs
 
 		return:
 		 max_write_time: maximum writing time
 		 min_write_time: minimum writing time
 		 avg_write_time: average writing time
+		 bandwidth: collective bandwidth in MiB/s, total outputs divided by maximum writing time
 		'''
 		# Data prepare
-		if output_per_rank > self.SECTION_LIMIT:
-			raise ValueError('Not support for {} MiB output per rank now'.format(output_per_rank))
-		if data == None:
-			output_per_rank_in_bytes = output_per_rank << 20
+		output_per_rank_in_bytes = output_per_rank << 20 # in bytes
+		if data == None or len(data) < output_per_rank_in_bytes:
 			data = common.workload_generator(self.__mpi_rank, output_per_rank_in_bytes)
+		view = memoryview(data)
 		
 		output_blob_name = file_name + '{:0>5}'.format(self.__mpi_rank)
+		ranges = ranged_io.split_ranges(0, output_per_rank_in_bytes, self.__block_size_in_bytes)
+		if len(ranges) > self.BLOCK_COUNT_LIMIT:
+			raise ValueError('{} blocks exceed the limit of {} blocks per blob'.format(len(ranges), self.BLOCK_COUNT_LIMIT))
+		block_ids = ['{:0>5}'.format(i) for i in range(0, len(ranges))]
+		blocks = [(container_name, output_blob_name, view[block_start:block_end + 1], block_id) for (block_start, block_end), block_id in zip(ranges, block_ids)]
 
-		MPI.COMM_WORLD.Barrier()
+		self.__comm.Barrier()
 		start = MPI.Wtime()
-		self.__storage_service.create_blob_from_bytes(container_name, output_blob_name, data)
+		self.__put_blocks(blocks)
+		self.__storage_service.put_block_list(container_name, output_blob_name, [blob.BlobBlock(id=block_id) for block_id in block_ids])
 		end = MPI.Wtime()
-		MPI.COMM_WORLD.Barrier()
+		self.__comm.Barrier()
 
-		return common.collect_bench_metrics(end - start)
+		max_write, min_write, avg_write = common.collect_bench_metrics(end - start, comm=self.__comm)
+		return max_write, min_write, avg_write, common.collect_bench_bandwidth(output_per_rank_in_bytes * self.__mpi_size, max_write)
 
 	def bench_outputs_with_multiple_files_multiple_writers_multiple_containers(self, container_name, directory_name, file_name, output_per_rank, data = None):
 		'''
@@ -231,12 +576,13 @@ class AzureBlobBench(BaseBench):
 		 directory_name: target container directory
 		 file_name: target file base, target file name is composed of file_name + '{:0>5}'.format(__mpi_rank)
 		 output_per_rank: size of outputs per rank in MiB
-		 data: optional cached data for outputs, currently only data less than SECTION_LIMIT is allowed
+		 data: optional cached data for outputs
 
 		return:
 		 max_write_time: maximum writing time
 		 min_write_time: minimum writing time
 		 avg_write_time: average writing time
+		 bandwidth: collective bandwidth in MiB/s, total outputs divided by maximum writing time
 		'''
 		output_container_name = container_name + '{:0>5}'.format(self.__mpi_rank)
 
@@ -1,7 +1,8 @@
+import functools
 from mpi4py import MPI
 from azure.storage import file
 from tool.base_bench import BaseBench
-from common import common
+from common import common, ranged_io, collective, histogram, retry, write_behind
 
 class AzureFileBench(BaseBench):
 	''' 
@@ -12,20 +13,114 @@ class AzureFileBench(BaseBench):
 	 access_name: Storage target access name
 	 access_key: Storage target access key
 	 access_container_list: Containers to be accessed
+	 read_engine: engine for ranged reads, `sequential` gets SECTION_LIMIT sections one by one, `parallel` keeps read_concurrency ranged gets in flight
+	 read_concurrency: number of in-flight ranged gets per rank for the `parallel` engine
+	 read_chunk_size: size of each ranged get for the `parallel` engine in KiB
+	 write_concurrency: number of in-flight update_range calls per rank
+	 write_chunk_size: size of each range update in KiB, no more than FILE_CHUNK_LIMIT
+	 write_layout: layout of ranges on a shared file, `contiguous` or `interleaved`
+	 io_engine: engine for concurrent requests, `threads` issues FileService calls on a thread pool,
+	  `asyncio` issues requests as coroutines over a pooled set of HTTP connections
+	 request_histogram: optional LatencyHistogram recording latency and size of every storage request
+	 retry_policy: optional RetryPolicy retrying and counting throttled requests, instead of the retries of the SDK
+	 storage_service: optional storage service used instead of a FileService of the access account, e.g. a service of tool.emulator
+	 comm: communicator of processes taking part in the benches, MPI.COMM_WORLD by default
+	 chunk_cache_dir: optional directory of a chunk cache shared by the processes of a node, every ranged read goes through it,
+	  the asyncio engine then reads on threads
+	 chunk_cache_size: capacity of the chunk cache in GiB
 	'''
 	# Azure File Limits
 	SECTION_LIMIT = 1024 # in MiB
 	FILE_CHUNK_LIMIT = 4 # in MIB
 	SECTION_LIMIT_IN_BYTES = SECTION_LIMIT << 20 # in bytes
 	FILE_CHUNK_LIMIT_IN_BYTES = FILE_CHUNK_LIMIT << 20 # in bytes
+	READ_CHUNK_DEFAULT = 4096 # in KiB
 
-	__slots__ = ('__bench_target', '__mpi_rank', '__mpi_size', '__storage_service')
+	__slots__ = ('__bench_target', '__comm', '__mpi_rank', '__mpi_size', '__storage_service', '__read_engine', '__read_concurrency', '__read_chunk_size_in_bytes', '__write_concurrency', '__write_chunk_size_in_bytes', '__write_layout', '__async_client')
 
-	def __init__(self, access_name, access_key, access_container_list):
-		self.__mpi_rank = MPI.COMM_WORLD.Get_rank()
-		self.__mpi_size = MPI.COMM_WORLD.Get_size()
+	def __init__(self, access_name, access_key, access_container_list, read_engine = 'sequential', read_concurrency = 1, read_chunk_size = READ_CHUNK_DEFAULT, write_concurrency = 1, write_chunk_size = FILE_CHUNK_LIMIT << 10, write_layout = 'contiguous', io_engine = 'threads', storage_service = None, request_histogram = None, retry_policy = None, comm = MPI.COMM_WORLD, chunk_cache_dir = None, chunk_cache_size = BaseBench.CHUNK_CACHE_SIZE_DEFAULT):
+		super(AzureFileBench, self).__init__(access_name, access_key, access_container_list, comm, chunk_cache_dir, chunk_cache_size)
 		self.__bench_target = 'Azure File'
-		self.__storage_service = file.FileService(access_name, access_key)
+		if storage_service is not None and io_engine != 'threads':
+			raise ValueError('I/O engine {} is not available for a custom storage service'.format(io_engine))
+		self.__storage_service = storage_service
+		if storage_service is None:
+			self.__storage_service = file.FileService(access_name, access_key)
+			if retry_policy is not None:
+				self.__storage_service.retry = retry.no_retry
+		if request_histogram is not None:
+			self.__storage_service = histogram.InstrumentedService(self.__storage_service, request_histogram)
+		if retry_policy is not None:
+			self.__storage_service = retry.RetryingService(self.__storage_service, retry_policy)
+		if read_engine not in ('sequential', 'parallel'):
+			raise ValueError('Unknown read engine {}'.format(read_engine))
+		self.__read_engine = read_engine
+		self.__read_concurrency = read_concurrency
+		self.__read_chunk_size_in_bytes = read_chunk_size << 10
+		if write_chunk_size > self.FILE_CHUNK_LIMIT << 10:
+			raise ValueError('Chunk size of {} KiB exceeds the limit of {} MiB'.format(write_chunk_size, self.FILE_CHUNK_LIMIT))
+		if write_layout not in ('contiguous', 'interleaved'):
+			raise ValueError('Unknown write layout {}'.format(write_layout))
+		self.__write_concurrency = write_concurrency
+		self.__write_chunk_size_in_bytes = write_chunk_size << 10
+		self.__write_layout = write_layout
+		if storage_service is None:
+			ranged_io.size_connection_pool(self.__storage_service.request_session, max(read_concurrency, write_concurrency))
+		self.__async_client = None
+		if io_engine == 'asyncio':
+			from tool.async_storage import AsyncStorageClient
+			self.__async_client = AsyncStorageClient(access_name, access_key, 'file', max(read_concurrency, write_concurrency), request_histogram, retry_policy)
+		elif io_engine != 'threads':
+			raise ValueError('Unknown I/O engine {}'.format(io_engine))
+
+	def set_comm(self, comm):
+		'''
+		Bind the tool to the communicator of processes taking part in the following benches,
+		so that a tool and its storage service can be reused for different rank counts
+		'''
+		super(AzureFileBench, self).set_comm(comm)
+		self.__comm = comm
+		self.__mpi_rank = comm.Get_rank()
+		self.__mpi_size = comm.Get_size()
+
+	def close(self):
+		'''
+		Close the pooled connections and the event loop of the asyncio engine
+		'''
+		if self.__async_client is not None:
+			self.__async_client.close()
+			self.__async_client = None
+
+	def get_input_size(self, container_name, directory_name, file_name, layout = 'single'):
+		'''
+		Size of the source read by current rank, named the same way as by the input patterns
+
+		param:
+		 container_name: source container
+		 directory_name: source directory
+		 file_name: source file, or source file base for the multiple-file layouts
+		 layout: `single` for a source shared by all ranks, `multiple` for the sources of MFMR, `multiple_containers` for the sources of MFMRMC
+
+		return:
+		 size: size of the source in bytes
+		'''
+		if layout != 'single':
+			file_name = file_name + '{:0>5}'.format(self.__mpi_rank)
+		if layout == 'multiple_containers':
+			container_name = container_name + '{:0>5}'.format(self.__mpi_rank)
+		return self._get_size(container_name, directory_name, file_name)
+
+	def _get_size(self, container_name, directory_name, file_name):
+		'''
+		Size of a file in bytes
+		'''
+		return self.__storage_service.get_file_properties(container_name, directory_name, file_name).properties.content_length
+
+	def _get_etag(self, container_name, directory_name, file_name):
+		'''
+		Etag of a file
+		'''
+		return self.__storage_service.get_file_properties(container_name, directory_name, file_name).properties.etag
 
 	def bench_inputs_with_single_file_multiple_readers(self, container_name, directory_name, file_name):
 		'''
@@ -34,6 +129,9 @@ class AzureFileBench(BaseBench):
 		For benchmarking on large sources, the entier data will be divided into serveral sections with size of SECTION_LIMIT, 
 		the read operations will be performed sequentially on each sections. Every processes will read the entire data individually.
 
+		With the `parallel` read engine, the file is split into ranges of read_chunk_size and read_concurrency ranged gets are kept
+		in flight, each of them writing into its own slice of one preallocated buffer.
+
 		param:
 		 container_name: source container
 		 directory_name: source directory
@@ -45,13 +143,25 @@ class AzureFileBench(BaseBench):
 		 avg_read: average read time
 		'''
 		# sections to be get
-		file_size = self.__storage_service.get_file_properties(container_name, directory_name, file_name).properties.content_length
+		file_size = self._get_size(container_name, directory_name, file_name)
 		file_size_in_mib = file_size >> 20 # in MiB
 		section_count = file_size_in_mib // self.SECTION_LIMIT
 		if file_size_in_mib % self.SECTION_LIMIT:
 			section_count = section_count + 1
+
+		if self.__read_engine == 'parallel' or self.chunk_cache is not None:
+			buffer = ranged_io.get_read_buffer(file_size)
+			fetch_into = self._get_reader(container_name, directory_name, file_name)
+
+			self.__comm.Barrier()
+			start = MPI.Wtime()
+			fetch_into(0, file_size - 1, buffer)
+			end = MPI.Wtime()
+			self.__comm.Barrier()
+
+			return common.collect_bench_metrics(end - start, comm=self.__comm)
 		
-		MPI.COMM_WORLD.Barrier()
+		self.__comm.Barrier()
 		start = MPI.Wtime()
 		for section in range(0, section_count):
 			range_start = section * self.SECTION_LIMIT_IN_BYTES
@@ -62,9 +172,33 @@ class AzureFileBench(BaseBench):
 				range_end = file_size - 1
 			self.__storage_service.get_file_to_bytes(container_name, directory_name, file_name, start_range=range_start, end_range=range_end)
 		end = MPI.Wtime()
-		MPI.COMM_WORLD.Barrier()
+		self.__comm.Barrier()
 
-		return common.collect_bench_metrics(end - start)
+		return common.collect_bench_metrics(end - start, comm=self.__comm)
+
+	def __get_file_range_into(self, share_name, directory_name, file_name, start_range, end_range, view):
+		'''
+		Get range [start_range, end_range] of a file into a preallocated memoryview
+		'''
+		self.__storage_service.get_file_to_stream(share_name, directory_name, file_name, ranged_io.MemoryviewWriter(view), start_range=start_range, end_range=end_range, max_connections=1)
+
+	def _fetch_into(self, share_name, directory_name, file_name, start_range, end_range, view, chunk_cache = None, cache_name = None):
+		'''
+		Read range [start_range, end_range] of a file into a preallocated memoryview with the configured read engine.
+		With a chunk_cache every ranged get is a chunk of the cache.
+		'''
+		fetch_into = functools.partial(self.__get_file_range_into, share_name, directory_name, file_name)
+		if chunk_cache is not None:
+			fetch_into = functools.partial(chunk_cache.fetch_into, fetch_into, cache_name)
+		if self.__read_engine == 'parallel' and self.__async_client is not None and chunk_cache is None:
+			path = file_name if directory_name is None else directory_name + '/' + file_name
+			ranges = ranged_io.split_ranges(start_range, end_range - start_range + 1, self.__read_chunk_size_in_bytes)
+			items = [(share_name, path, start, end, view[start - start_range:end - start_range + 1]) for start, end in ranges]
+			self.__async_client.run_concurrently(self.__async_client.get_range_into, items, self.__read_concurrency)
+		elif self.__read_engine == 'parallel':
+			ranged_io.parallel_ranged_read(fetch_into, start_range, end_range - start_range + 1, view, self.__read_chunk_size_in_bytes, self.__read_concurrency)
+		else:
+			fetch_into(start_range, end_range, view)
 
 	def bench_inputs_with_multiple_files_multiple_readers(self, container_name, directory_name, file_name):
 		'''
@@ -109,6 +243,54 @@ class AzureFileBench(BaseBench):
 		
 		return self.bench_inputs_with_single_file_multiple_readers(proc_container_name, directory_name, proc_file_name)
 
+	def __get_write_ranges(self, container_name, directory_name, file_name, output_per_rank, data):
+		'''
+		Ranges of current rank in a shared file according to the write layout, the last chunk holds the remainder of output_per_rank
+
+		return:
+		 ranges: list of (container_name, directory_name, file_name, data, start_range, end_range) as arguments of update_range
+		'''
+		chunk_size_in_bytes = self.__write_chunk_size_in_bytes
+		output_per_rank_in_bytes = output_per_rank << 20 # in bytes
+		if data == None or len(data) < chunk_size_in_bytes:
+			data = common.workload_generator(self.__mpi_rank, chunk_size_in_bytes)
+		else:
+			data = data[0:chunk_size_in_bytes]
+		full_chunk_count, last_chunk_size = divmod(output_per_rank_in_bytes, chunk_size_in_bytes)
+
+		# Ranges of each chunk, the last chunk doesn't full
+		ranges = []
+		for i in range(0, full_chunk_count):
+			if self.__write_layout == 'interleaved':
+				start_range = (i * self.__mpi_size + self.__mpi_rank) * chunk_size_in_bytes
+			else:
+				start_range = self.__mpi_rank * output_per_rank_in_bytes + i * chunk_size_in_bytes
+			ranges.append((container_name, directory_name, file_name, data, start_range, start_range + chunk_size_in_bytes - 1))
+		if last_chunk_size:
+			data_last_chunk = common.workload_generator(self.__mpi_rank, last_chunk_size)
+			if self.__write_layout == 'interleaved':
+				start_range = full_chunk_count * self.__mpi_size * chunk_size_in_bytes + self.__mpi_rank * last_chunk_size
+			else:
+				start_range = self.__mpi_rank * output_per_rank_in_bytes + full_chunk_count * chunk_size_in_bytes
+			ranges.append((container_name, directory_name, file_name, data_last_chunk, start_range, start_range + last_chunk_size - 1))
+
+		return ranges
+
+	def __update_ranges(self, ranges):
+		'''
+		Write ranges with write_concurrency update_range calls in flight, ranges are arguments of update_range
+		'''
+		if self.__async_client is not None:
+			self.__async_client.run_concurrently(self.__async_client.update_range, ranges, self.__write_concurrency)
+		else:
+			ranged_io.run_concurrently(self.__update_range, ranges, self.__write_concurrency)
+
+	def __update_range(self, share_name, directory_name, file_name, data, start_range, end_range):
+		'''
+		FileService.update_range only accepts bytes, slices of a buffer are copied, bytes are passed as they are
+		'''
+		return self.__storage_service.update_range(share_name, directory_name, file_name, bytes(data), start_range, end_range)
+
 	def bench_outputs_with_single_file_multiple_writers(self, container_name, directory_name, file_name, output_per_rank, data = None):
 		'''
 		Benchmarking outputs with pattern `Single File Multiple Writers`
@@ -117,6 +299,9 @@ class AzureFileBench(BaseBench):
 
 		Data fro mdifferent rank is stored in different ranges
 
+		With the `contiguous` layout each rank owns one contiguous section of the file, with the `interleaved` layout
+		chunks of all ranks are striped round-robin. write_concurrency update_range calls are kept in flight per rank.
+
 		The processes is:
 		 1. Create the file with specified size
 		 2. Each process update their range of File
@@ -132,19 +317,10 @@ class AzureFileBench(BaseBench):
 		 max_write_time: maximum writing time
 		 min_write_time: minimum writing time
 		 avg_write_time: average writing time
+		 bandwidth: collective bandwidth in MiB/s
 		'''
-		# Data prepare
 		output_per_rank_in_bytes = output_per_rank << 20 # in bytes
-		if data == None:
-			data = common.workload_generator(self.__mpi_rank, self.FILE_CHUNK_LIMIT_IN_BYTES)
-		else:
-			data = data[0:self.FILE_CHUNK_LIMIT_IN_BYTES - 1]
-		data_last_chunk = data
-		chunk_count = output_per_rank // self.FILE_CHUNK_LIMIT
-		# Last chunk doesn't full
-		if output_per_rank % self.FILE_CHUNK_LIMIT:
-			chunk_count = chunk_count + 1
-			data_last_chunk = common.workload_generator(self.__mpi_rank, (output_per_rank % self.FILE_CHUNK_LIMIT) << 20)
+		ranges = self.__get_write_ranges(container_name, directory_name, file_name, output_per_rank, data)
 
 		# Step .1 File create
 		create_start = 0
@@ -155,26 +331,192 @@ class AzureFileBench(BaseBench):
 			create_end = MPI.Wtime()
 		create_time = create_end - create_start
 
-		MPI.COMM_WORLD.Barrier()
+		# Step .2 Range update
+		self.__comm.Barrier()
 		start = MPI.Wtime()
-		for i in range(0, chunk_count):
-			if i != (chunk_count - 1):
-				start_range = self.__mpi_rank * output_per_rank_in_bytes + i * self.FILE_CHUNK_LIMIT_IN_BYTES
-				end_range = start_range + len(data) - 1
-				self.__storage_service.update_range(container_name, directory_name, file_name, data, start_range, end_range)
-			elif i == (chunk_count - 1):
-				start_range = self.__mpi_rank * output_per_rank_in_bytes + i * self.FILE_CHUNK_LIMIT_IN_BYTES
-				end_range = start_range + len(data_last_chunk) - 1
-				self.__storage_service.update_range(container_name, directory_name, file_name, data_last_chunk, start_range, end_range)
+		self.__update_ranges(ranges)
 		end = MPI.Wtime()
-		MPI.COMM_WORLD.Barrier()
+		self.__comm.Barrier()
 
-		max_write, min_write, avg_write = common.collect_bench_metrics(end - start)
+		max_write, min_write, avg_write = common.collect_bench_metrics(end - start, comm=self.__comm)
 		max_write = round(max_write + create_time,3)	
 		min_write = round(min_write + create_time,3)
 		avg_write = round(avg_write + create_time,3)
 
-		return max_write, min_write, avg_write
+		return max_write, min_write, avg_write, common.collect_bench_bandwidth(output_per_rank_in_bytes * self.__mpi_size, max_write)
+
+	def bench_outputs_with_write_behind(self, container_name, directory_name, file_name, output_per_rank, data = None, memory_cap = BaseBench.WRITE_BEHIND_CAP_DEFAULT, threads = None):
+		'''
+		Benchmarking outputs with pattern `Single File Write-Behind`
+
+		Ranges of a shared file, laid out as for `Single File Multiple Writers`, are handed to a write-behind staging area
+		and written with update_range on background threads, so that the application continues as soon as buffers are copied,
+		unless memory_cap is reached. The file is created beforehand, the flush waits for the ranges of all ranks.
+
+		param:
+		 container_name: target container
+		 directory_name: target directory
+		 file_name: target file
+		 output_per_rank: size of outputs per rank in MiB
+		 data: optional cached data for outputs
+		 memory_cap: maximum staged outputs per rank in MiB
+		 threads: number of background upload threads, write_concurrency by default
+
+		return:
+		 max_visible_time: maximum time the application was blocked
+		 min_visible_time: minimum time the application was blocked
+		 avg_visible_time: average time the application was blocked
+		 max_durable_time: maximum time to durability
+		 min_durable_time: minimum time to durability
+		 avg_durable_time: average time to durability
+		 bandwidth: collective bandwidth in MiB/s, total outputs divided by maximum time to durability
+		 max_stall_time: maximum time blocked by the memory cap
+		'''
+		output_per_rank_in_bytes = output_per_rank << 20 # in bytes
+		ranges = self.__get_write_ranges(container_name, directory_name, file_name, output_per_rank, data)
+		staging = write_behind.WriteBehind(memory_cap << 20, threads or self.__write_concurrency)
+		if 0 == self.__mpi_rank:
+			self.__storage_service.create_file(container_name, directory_name, file_name, output_per_rank_in_bytes * self.__mpi_size)
+
+		self.__comm.Barrier()
+		start = MPI.Wtime()
+		for _, _, _, chunk, start_range, end_range in ranges:
+			staging.submit(chunk, functools.partial(self.__storage_service.update_range, container_name, directory_name, file_name, start_range=start_range, end_range=end_range))
+		visible_end = MPI.Wtime()
+		# Flush
+		staging.flush()
+		self.__comm.Barrier()
+		durable_end = MPI.Wtime()
+
+		return common.collect_write_behind_metrics(visible_end - start, durable_end - start, staging.stall_time, output_per_rank_in_bytes * self.__mpi_size, comm=self.__comm)
+
+	def bench_outputs_with_aggregated_writers(self, container_name, directory_name, file_name, output_per_rank, data = None, aggregators = 1, layout = 'single'):
+		'''
+		Benchmarking outputs with patterns `Single File Aggregated Writers` and `Multiple Files Aggregated Writers`
+
+		Ranks on each node are divided into groups, see collective.get_aggregation_comms, and gather their outputs on the aggregator
+		of their group with MPI_Gatherv. Only aggregators write, in ranges of write_chunk_size with write_concurrency update_range calls in flight,
+		so that fewer requests are issued. Aggregators hold the outputs of their whole group in memory.
+
+		With the `single` layout the shared file is created by rank 0 and each aggregator owns one contiguous section, ordered by aggregator.
+		With the `multiple` layout each aggregator creates its own file, named file_name + '{:0>5}'.format(aggregator).
+
+		param:
+		 container_name: target container
+		 directory_name: target directory
+		 file_name: target file, or target file base for the `multiple` layout
+		 output_per_rank: size of outputs per rank in MiB
+		 data: optional cached data for outputs
+		 aggregators: number of aggregators per node
+		 layout: `single` or `multiple`
+
+		return:
+		 max_write_time: maximum writing time, including gathering and creating files
+		 min_write_time: minimum writing time
+		 avg_write_time: average writing time
+		 bandwidth: collective bandwidth in MiB/s, total outputs divided by maximum writing time
+		 max_gather_time: maximum time of gathering outputs on aggregators
+		 write_requests: number of create_file and update_range calls of all aggregators
+		'''
+		if layout not in ('single', 'multiple'):
+			raise ValueError('Unknown aggregation layout {}'.format(layout))
+		# Data prepare
+		output_per_rank_in_bytes = output_per_rank << 20 # in bytes
+		if data == None or len(data) < output_per_rank_in_bytes:
+			data = common.workload_generator(self.__mpi_rank, output_per_rank_in_bytes)
+		view = memoryview(data)[0:output_per_rank_in_bytes]
+		group_comm, aggregator_comm = collective.get_aggregation_comms(aggregators, self.__comm)
+		try:
+			is_aggregator = 0 == group_comm.Get_rank()
+			group_bytes = group_comm.Get_size() * output_per_rank_in_bytes
+			# Section of each aggregator in the shared file
+			offset = 0
+			if is_aggregator and layout == 'single':
+				offset = aggregator_comm.exscan(group_bytes) or 0
+
+			self.__comm.Barrier()
+			start = MPI.Wtime()
+			aggregated = collective.gather_to_aggregator(group_comm, view)
+			gather_end = MPI.Wtime()
+			range_count = 0
+			if layout == 'single' and 0 == self.__mpi_rank:
+				self.__storage_service.create_file(container_name, directory_name, file_name, output_per_rank_in_bytes * self.__mpi_size)
+			if is_aggregator:
+				output_file_name = file_name
+				if layout == 'multiple':
+					output_file_name = file_name + '{:0>5}'.format(aggregator_comm.Get_rank())
+					self.__storage_service.create_file(container_name, directory_name, output_file_name, group_bytes)
+			# The shared file exists before any aggregator updates its section
+			if layout == 'single':
+				self.__comm.Barrier()
+			if is_aggregator:
+				ranges = [(container_name, directory_name, output_file_name, aggregated[range_start:range_end + 1], offset + range_start, offset + range_end)
+					for range_start, range_end in ranged_io.split_ranges(0, group_bytes, self.__write_chunk_size_in_bytes)]
+				range_count = len(ranges)
+				self.__update_ranges(ranges)
+			end = MPI.Wtime()
+			self.__comm.Barrier()
+
+			write_requests = self.__comm.allreduce(range_count + (1 if is_aggregator and layout == 'multiple' else 0), op=MPI.SUM) + (1 if layout == 'single' else 0)
+		finally:
+			group_comm.Free()
+			if aggregator_comm != MPI.COMM_NULL:
+				aggregator_comm.Free()
+
+		max_write, min_write, avg_write = common.collect_bench_metrics(end - start, comm=self.__comm)
+		max_gather, _, _ = common.collect_bench_metrics(gather_end - start, comm=self.__comm)
+		return max_write, min_write, avg_write, common.collect_bench_bandwidth(output_per_rank_in_bytes * self.__mpi_size, max_write), max_gather, write_requests
+
+	def bench_metadata_operations(self, container_name, directory_name, file_name, object_count, object_size, concurrency = None):
+		'''
+		Benchmarking many small objects with pattern `Many Small Objects`
+
+		Each processes creates object_count files of object_size KiB named '{:0>7}'.format(index) in its own directory
+		directory_name/file_name + '{:0>5}'.format(__mpi_rank) with create_file_from_bytes, then gets their properties,
+		reads them with get_file_to_bytes, lists the directory with list_directories_and_files and deletes them.
+		Phases are separated by barriers and keep concurrency requests in flight per rank.
+		Directories are created beforehand and deleted afterwards.
+
+		param:
+		 container_name: target share
+		 directory_name: target directory, None for the root of the share
+		 file_name: directory base of each processes
+		 object_count: number of files per rank
+		 object_size: size of each file in KiB
+		 concurrency: requests in flight per rank, write_concurrency by default
+
+		return:
+		 max_time: maximum time of all phases
+		 min_time: minimum time of all phases
+		 avg_time: average time of all phases
+		 create_rate: files created per second of all processes
+		 stat_rate: get_file_properties calls per second of all processes
+		 read_rate: files read per second of all processes
+		 list_rate: listed files per second of all processes
+		 delete_rate: files deleted per second of all processes
+		'''
+		concurrency = concurrency or self.__write_concurrency
+		payload = common.workload_generator(self.__mpi_rank, object_size << 10)
+		rank_directory_name = file_name + '{:0>5}'.format(self.__mpi_rank)
+		if directory_name:
+			rank_directory_name = directory_name + '/' + rank_directory_name
+		names = [('{:0>7}'.format(i),) for i in range(0, object_count)]
+		listed = []
+		self.__storage_service.create_directory(container_name, rank_directory_name, fail_on_exist=False)
+
+		phase_times = [
+			common.time_phase(lambda name: self.__storage_service.create_file_from_bytes(container_name, rank_directory_name, name, payload), names, concurrency, self.__comm),
+			common.time_phase(lambda name: self.__storage_service.get_file_properties(container_name, rank_directory_name, name), names, concurrency, self.__comm),
+			common.time_phase(lambda name: self.__storage_service.get_file_to_bytes(container_name, rank_directory_name, name), names, concurrency, self.__comm),
+			common.time_phase(lambda: listed.extend(self.__storage_service.list_directories_and_files(container_name, rank_directory_name)), [()], 1, self.__comm),
+			common.time_phase(lambda name: self.__storage_service.delete_file(container_name, rank_directory_name, name), names, concurrency, self.__comm)
+		]
+		self.__storage_service.delete_directory(container_name, rank_directory_name, fail_not_exist=False)
+		phase_counts = [object_count, object_count, object_count, len(listed), object_count]
+
+		max_time, min_time, avg_time = common.collect_bench_metrics(sum(phase_times), comm=self.__comm)
+		rates = common.collect_bench_rates(phase_times, phase_counts, comm=self.__comm)
+		return (max_time, min_time, avg_time) + tuple(rates)
 
 	def bench_outputs_with_multiple_files_multiple_writers(self, container_name, directory_name, file_name, output_per_rank, data = None):
 		'''
@@ -184,6 +526,9 @@ class AzureFileBench(BaseBench):
 
 		Pattern of output blobs is: file_name + 00001 where the second parts represents for the rank of the process 
 
+		Each rank creates its file with the full size, then outputs of any size are written in ranges of write_chunk_size
+		with write_concurrency update_range calls in flight.
+
 		param:
 		 container_name: target container base
 		 directory_name: target directory
@@ -195,23 +540,27 @@ class AzureFileBench(BaseBench):
 		 max_write_time: maximum writing time
 		 min_write_time: minimum writing time
 		 avg_write_time: average writing time
+		 bandwidth: collective bandwidth in MiB/s, total outputs divided by maximum writing time
 		'''
 		# Data prepare
-		if output_per_rank > self.SECTION_LIMIT:
-			raise ValueError('Not support for {} MiB output per rank now'.format(output_per_rank))
-		if data == None:
-			output_per_rank_in_bytes = output_per_rank << 20
+		output_per_rank_in_bytes = output_per_rank << 20 # in bytes
+		if data == None or len(data) < output_per_rank_in_bytes:
 			data = common.workload_generator(self.__mpi_rank, output_per_rank_in_bytes)
+		view = memoryview(data)
 		
 		output_file_name = file_name + '{:0>5}'.format(self.__mpi_rank)
+		ranges = [(container_name, directory_name, output_file_name, view[range_start:range_end + 1], range_start, range_end)
+			for range_start, range_end in ranged_io.split_ranges(0, output_per_rank_in_bytes, self.__write_chunk_size_in_bytes)]
 
-		MPI.COMM_WORLD.Barrier()
+		self.__comm.Barrier()
 		start = MPI.Wtime()
-		self.__storage_service.create_file_from_bytes(container_name, directory_name, output_file_name, data)
+		self.__storage_service.create_file(container_name, directory_name, output_file_name, output_per_rank_in_bytes)
+		self.__update_ranges(ranges)
 		end = MPI.Wtime()
-		MPI.COMM_WORLD.Barrier()
+		self.__comm.Barrier()
 
-		return common.collect_bench_metrics(end - start)
+		max_write, min_write, avg_write = common.collect_bench_metrics(end - start, comm=self.__comm)
+		return max_write, min_write, avg_write, common.collect_bench_bandwidth(output_per_rank_in_bytes * self.__mpi_size, max_write)
 
 	def bench_outputs_with_multiple_files_multiple_writers_multiple_containers(self, container_name, directory_name, file_name, output_per_rank, data):
 		'''
@@ -230,6 +579,7 @@ class AzureFileBench(BaseBench):
 		 max_write_time: maximum writing time
 		 min_write_time: minimum writing time
 		 avg_write_time: average writing time
+		 bandwidth: collective bandwidth in MiB/s, total outputs divided by maximum writing time
 		'''
 		output_container_name = container_name + '{:0>5}'.format(self.__mpi_rank)
 
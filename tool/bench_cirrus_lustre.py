@@ -1,23 +1,89 @@
-import os
+import os, mmap, functools, subprocess
 from mpi4py import MPI
 from tool.base_bench import BaseBench
-from common import common
+from common import common, ranged_io, collective, streaming, write_behind
 
 class CirrusLustreBench(BaseBench):
 	''' 
 	Tools for benchmarking Cirrus Lustre\'s performance for HPC purpose.
 	MPI is used for process management.
 
+	param:
+	 read_engine: engine for reading a file, `text` reads SECTION_LMIT sections in text mode,
+	  `readinto` reads chunks into one reused buffer, `mmap` copies chunks out of a read-only mapping with madvise hints,
+	  `direct` reads chunks with O_DIRECT into a page aligned buffer, bypassing the page cache
+	 read_chunk_size: size of each read of the binary engines in KiB, READ_CHUNK_DEFAULTS of the engine by default
+	 madvise: access hint of the `mmap` engine, `sequential`, `willneed`, `random` or `normal`
+	 fsync: indicate whether to fsync outputs before closing them, fsync and close are timed apart from writing
+	 stripe_counts: optional Lustre stripe counts of outputs, rank r uses stripe_counts[r % len(stripe_counts)], -1 for all OSTs
+	 stripe_sizes: optional Lustre stripe sizes of outputs in KiB, rank r uses stripe_sizes[r % len(stripe_sizes)]
+	 write_chunk_size: size of each chunk staged by the write-behind pattern in KiB
+	 request_histogram: optional LatencyHistogram recording latency and size of every read or write call
+	 comm: communicator of processes taking part in the benches, MPI.COMM_WORLD by default
 	'''
 	# File Limits
 	SECTION_LMIT = 1024 # in MiB
 	SECTION_LIMIT_IN_BYTES = SECTION_LMIT << 20 # in bytes
+	WRITE_BEHIND_CHUNK_DEFAULT = 16384 # in KiB
+	READ_CHUNK_DEFAULTS = {'readinto': 16384, 'mmap': 65536, 'direct': 4096} # in KiB
+	MADVISE_HINTS = ('sequential', 'willneed', 'random', 'normal')
 
-	__slots__=('__mpi_rank', '__mpi_size')
+	__slots__=('__comm', '__mpi_rank', '__mpi_size', '__request_histogram', '__read_engine', '__read_chunk_size_in_bytes', '__madvise', '__fsync', '__stripe_counts', '__stripe_sizes', '__write_chunk_size_in_bytes')
 
-	def __init__(self):
-		self.__mpi_rank = MPI.COMM_WORLD.Get_rank()
-		self.__mpi_size = MPI.COMM_WORLD.Get_size()
+	def __init__(self, read_engine = 'text', read_chunk_size = None, madvise = 'sequential', fsync = False, stripe_counts = None, stripe_sizes = None, write_chunk_size = WRITE_BEHIND_CHUNK_DEFAULT, request_histogram = None, comm = MPI.COMM_WORLD):
+		super(CirrusLustreBench, self).__init__(None, None, [], comm)
+		self.__request_histogram = request_histogram
+		if read_engine != 'text' and read_engine not in self.READ_CHUNK_DEFAULTS:
+			raise ValueError('Unknown read engine {}'.format(read_engine))
+		if read_engine == 'direct' and not hasattr(os, 'O_DIRECT'):
+			raise ValueError('O_DIRECT is not available on this platform')
+		if madvise not in self.MADVISE_HINTS:
+			raise ValueError('Unknown madvise hint {}'.format(madvise))
+		self.__read_engine = read_engine
+		self.__read_chunk_size_in_bytes = (read_chunk_size or self.READ_CHUNK_DEFAULTS.get(read_engine, 0)) << 10
+		if read_engine == 'direct' and self.__read_chunk_size_in_bytes % ranged_io.DIRECT_IO_ALIGNMENT:
+			raise ValueError('Chunk size of {0} KiB is not a multiple of {1} bytes required by O_DIRECT'.format(read_chunk_size, ranged_io.DIRECT_IO_ALIGNMENT))
+		self.__madvise = madvise
+		self.__fsync = fsync
+		self.__stripe_counts = list(stripe_counts or [])
+		self.__stripe_sizes = list(stripe_sizes or [])
+		self.__write_chunk_size_in_bytes = write_chunk_size << 10
+
+	def set_comm(self, comm):
+		'''
+		Bind the tool to the communicator of processes taking part in the following benches,
+		so that a tool and its storage service can be reused for different rank counts
+		'''
+		super(CirrusLustreBench, self).set_comm(comm)
+		self.__comm = comm
+		self.__mpi_rank = comm.Get_rank()
+		self.__mpi_size = comm.Get_size()
+
+	def __record(self, start, size):
+		'''
+		Record a read or write call started at `start` into the request histogram
+		'''
+		if self.__request_histogram is not None:
+			self.__request_histogram.record(MPI.Wtime() - start, size)
+
+	def get_input_size(self, container_name, directory_name, file_name, layout = 'single'):
+		'''
+		Size of the source read by current rank, named the same way as by the input patterns
+
+		param:
+		 container_name: source container, source directory base for `multiple_containers`, otherwise ignored
+		 directory_name: source directory, ignored
+		 file_name: source file, or source file base for the multiple-file layouts
+		 layout: `single` for a source shared by all ranks, `multiple` for the sources of MFMR, `multiple_containers` for the sources of MFMRMC
+
+		return:
+		 size: size of the source in bytes
+		'''
+		if layout == 'multiple':
+			file_name = file_name + '{:0>5}'.format(self.__mpi_rank)
+		elif layout == 'multiple_containers':
+			file_name = self.__get_rank_path(container_name, file_name, self.__mpi_rank)
+		return os.path.getsize(file_name)
 
 	def bench_inputs_with_single_file_multiple_readers(self, container_name, directory_name, file_name):
 		'''
@@ -40,19 +106,199 @@ class CirrusLustreBench(BaseBench):
 		if file_size_in_mib % self.SECTION_LMIT:
 			section_count = section_count + 1
 		
-		MPI.COMM_WORLD.Barrier()
+		self.__comm.Barrier()
 		start = MPI.Wtime()
-		if section_count == 1:
+		if self.__read_engine == 'readinto':
+			self.__read_file_with_readinto(file_name)
+		elif self.__read_engine == 'mmap':
+			self.__read_file_with_mmap(file_name, file_size)
+		elif self.__read_engine == 'direct':
+			self.__read_file_with_direct_io(file_name)
+		elif section_count == 1:
 			with open(file_name, 'r') as f:
-				f.read()
+				request_start = MPI.Wtime()
+				content = f.read()
+				self.__record(request_start, len(content))
 		else:
 			with open(file_name, 'r') as f:
 				for _ in range(0, section_count):
-					f.read(self.SECTION_LIMIT_IN_BYTES)
+					request_start = MPI.Wtime()
+					content = f.read(self.SECTION_LIMIT_IN_BYTES)
+					self.__record(request_start, len(content))
 		end = MPI.Wtime()
-		MPI.COMM_WORLD.Barrier()
+		self.__comm.Barrier()
+
+		return common.collect_bench_metrics(end - start, 5, self.__comm)
+
+	def __read_file_with_readinto(self, file_name):
+		'''
+		Read a file chunk by chunk into a single reused buffer, without decoding or allocating per chunk
+		'''
+		view = ranged_io.get_read_buffer(self.__read_chunk_size_in_bytes)
+		with open(file_name, 'rb', buffering=0) as f:
+			while True:
+				request_start = MPI.Wtime()
+				count = f.readinto(view)
+				if not count:
+					break
+				self.__record(request_start, count)
+
+	def __read_file_with_mmap(self, file_name, file_size):
+		'''
+		Map a file read-only and copy it chunk by chunk into a single reused buffer, page faults are served according to the madvise hint
+		'''
+		if file_size == 0:
+			return
+		view = ranged_io.get_read_buffer(self.__read_chunk_size_in_bytes)
+		with open(file_name, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+			if hasattr(mapping, 'madvise'):
+				mapping.madvise(getattr(mmap, 'MADV_' + self.__madvise.upper()))
+			with memoryview(mapping) as source:
+				for offset in range(0, file_size, self.__read_chunk_size_in_bytes):
+					request_start = MPI.Wtime()
+					count = min(self.__read_chunk_size_in_bytes, file_size - offset)
+					view[0:count] = source[offset:offset + count]
+					self.__record(request_start, count)
+
+	def __read_file_with_direct_io(self, file_name):
+		'''
+		Read a file chunk by chunk with O_DIRECT into a page aligned buffer, so that the page cache is bypassed
+		'''
+		view = ranged_io.get_aligned_buffer(self.__read_chunk_size_in_bytes)
+		fd = os.open(file_name, os.O_RDONLY | os.O_DIRECT)
+		try:
+			offset = 0
+			while True:
+				request_start = MPI.Wtime()
+				count = os.preadv(fd, [view], offset)
+				self.__record(request_start, count)
+				if count < len(view):
+					break
+				offset = offset + count
+		finally:
+			os.close(fd)
 
-		return common.collect_bench_metrics(end - start, 5)
+	def bench_inputs_with_single_reader_broadcast(self, container_name, directory_name, file_name, reader = 'root', chunk_size = BaseBench.BROADCAST_CHUNK_DEFAULT):
+		'''
+		Benchmarking inputs with pattern `Single Reader & Broadcast`
+
+		A single reader fetches the source and distributes it to other processes with MPI broadcast.
+		The source is pipelined in chunks so that fetching the next chunk overlaps with broadcasting the previous one.
+
+		param:
+		 container_name: source container
+		 directory_name: source directory
+		 file_name: source file
+		 reader: `root` for a single reader on rank 0, `node` for one reader per node
+		 chunk_size: size of each broadcast chunk in KiB
+
+		return:
+		 max_read: maximum read time
+		 min_read: minimum read time
+		 avg_read: average read time
+		'''
+		comm = collective.get_broadcast_comm(reader, self.__comm)
+		source = None
+		file_size = None
+		if 0 == comm.Get_rank():
+			source = open(file_name, 'rb', buffering=0)
+			file_size = os.path.getsize(file_name)
+		file_size = comm.bcast(file_size, root=0)
+
+		def fetch_into(start_range, end_range, view):
+			request_start = MPI.Wtime()
+			ranged_io.read_file_range_into(source, start_range, view)
+			self.__record(request_start, len(view))
+
+		self.__comm.Barrier()
+		start = MPI.Wtime()
+		collective.pipelined_broadcast(comm, fetch_into, file_size, chunk_size << 10)
+		end = MPI.Wtime()
+		self.__comm.Barrier()
+
+		if source is not None:
+			source.close()
+		if comm != self.__comm:
+			comm.Free()
+
+		return common.collect_bench_metrics(end - start, 5, self.__comm)
+
+	def bench_inputs_with_single_file_partitioned_readers(self, container_name, directory_name, file_name, layout = 'contiguous', stripe_size = BaseBench.PARTITION_STRIPE_DEFAULT, allgather = False):
+		'''
+		Benchmarking inputs with pattern `Single File Partitioned Readers`
+
+		Each processes reads only its share of a shared file, either one contiguous section or stripes assigned round-robin.
+		Optionally, shares are exchanged with MPI_Allgatherv afterwards so that every processes holds the entire file.
+
+		param:
+		 container_name: source container
+		 directory_name: source directory
+		 file_name: source file
+		 layout: `contiguous` or `strided`
+		 stripe_size: size of each stripe in KiB for the `strided` layout
+		 allgather: indicate whether to gather the entire file on every processes
+
+		return:
+		 max_read: maximum read time
+		 min_read: minimum read time
+		 avg_read: average read time
+		 bandwidth: collective bandwidth in MiB/s, file size divided by maximum read time
+		'''
+		file_size = os.path.getsize(file_name)
+
+		self.__comm.Barrier()
+		start = MPI.Wtime()
+		with open(file_name, 'rb', buffering=0) as source:
+			def fetch_into(start_range, end_range, view):
+				request_start = MPI.Wtime()
+				ranged_io.read_file_range_into(source, start_range, view)
+				self.__record(request_start, len(view))
+			collective.partitioned_read(self.__comm, fetch_into, file_size, layout, stripe_size << 10, allgather)
+		end = MPI.Wtime()
+		self.__comm.Barrier()
+
+		max_read, min_read, avg_read = common.collect_bench_metrics(end - start, 5, self.__comm)
+		return max_read, min_read, avg_read, common.collect_bench_bandwidth(file_size, max_read)
+
+	def bench_inputs_with_streaming_readers(self, container_name, directory_name, file_name, chunk_size = BaseBench.STREAM_CHUNK_DEFAULT, buffers = 2, kernel = None):
+		'''
+		Benchmarking inputs with pattern `Single File Streaming Readers`
+
+		Every processes streams the entire source and applies a compute kernel on each chunk,
+		while the following chunks are prefetched into a bounded set of buffers.
+
+		param:
+		 container_name: source container
+		 directory_name: source directory
+		 file_name: source file
+		 chunk_size: size of each streamed chunk in KiB
+		 buffers: number of chunk buffers, 2 for double buffering
+		 kernel: callable(view) applied on every chunk, see streaming.get_kernel
+
+		return:
+		 max_time: maximum elapsed time
+		 min_time: minimum elapsed time
+		 avg_time: average elapsed time
+		 avg_io_time: average I/O time
+		 avg_compute_time: average compute time
+		 avg_wait_time: average time compute waited for I/O
+		 hidden_io: fraction of I/O time hidden behind compute
+		'''
+		file_size = os.path.getsize(file_name)
+		kernel = kernel or streaming.get_kernel('none')
+
+		self.__comm.Barrier()
+		start = MPI.Wtime()
+		with open(file_name, 'rb', buffering=0) as source:
+			def fetch_into(start_range, end_range, view):
+				request_start = MPI.Wtime()
+				ranged_io.read_file_range_into(source, start_range, view)
+				self.__record(request_start, len(view))
+			io_time, compute_time, wait_time = streaming.stream_and_compute(fetch_into, file_size, chunk_size << 10, buffers, kernel)
+		end = MPI.Wtime()
+		self.__comm.Barrier()
+
+		return common.collect_overlap_metrics(end - start, io_time, compute_time, wait_time, 5, self.__comm)
 
 	def bench_inputs_with_multiple_files_multiple_readers(self, container_name, directory_name, file_name):
 		'''
@@ -75,6 +321,251 @@ class CirrusLustreBench(BaseBench):
 		return self.bench_inputs_with_single_file_multiple_readers(container_name, directory_name, proc_file_name)
 	
 
+	def __get_rank_path(self, container_name, file_name, rank):
+		'''
+		Path of the file of a rank in its own directory, the directory is composed of container_name + '{:0>5}'.format(rank)
+		'''
+		return os.path.join(container_name + '{:0>5}'.format(rank), os.path.basename(file_name) + '{:0>5}'.format(rank))
+
+	def __set_stripe(self, path, rank):
+		'''
+		Set the Lustre layout of a new file or of the files created in a directory with `lfs setstripe`, if stripe settings are given
+		'''
+		if not self.__stripe_counts and not self.__stripe_sizes:
+			return
+		command = ['lfs', 'setstripe']
+		if self.__stripe_counts:
+			command = command + ['-c', str(self.__stripe_counts[rank % len(self.__stripe_counts)])]
+		if self.__stripe_sizes:
+			command = command + ['-S', '{}k'.format(self.__stripe_sizes[rank % len(self.__stripe_sizes)])]
+		subprocess.check_call(command + [path])
+
+	def __write_file(self, fd, data, offset = 0):
+		'''
+		Write data at offset with pwrite, then fsync and close the file
+
+		return:
+		 write_time: time of writing data
+		 sync_time: time of fsync, 0 if fsync is disabled
+		 close_time: time of closing the file
+		'''
+		start = MPI.Wtime()
+		self.__pwrite(fd, data, offset)
+		write_end = MPI.Wtime()
+		if self.__fsync:
+			os.fsync(fd)
+		sync_end = MPI.Wtime()
+		os.close(fd)
+		close_end = MPI.Wtime()
+		return write_end - start, sync_end - write_end, close_end - sync_end
+
+	def __pwrite(self, fd, data, offset):
+		'''
+		Write data at offset with pwrite, in sections of at most SECTION_LIMIT and retrying short writes
+		'''
+		view = memoryview(data)
+		written = 0
+		while written < len(view):
+			request_start = MPI.Wtime()
+			count = os.pwrite(fd, view[written:written + self.SECTION_LIMIT_IN_BYTES], offset + written)
+			self.__record(request_start, count)
+			written = written + count
+
+	def __create_shared_file(self, file_name, size):
+		'''
+		Create and preallocate a shared file on rank 0, falling back to ftruncate where posix_fallocate is not supported
+		'''
+		if 0 == self.__mpi_rank:
+			if os.path.exists(file_name):
+				os.remove(file_name)
+			self.__set_stripe(file_name, 0)
+			fd = os.open(file_name, os.O_WRONLY | os.O_CREAT, 0o644)
+			try:
+				os.posix_fallocate(fd, 0, size)
+			except OSError:
+				os.ftruncate(fd, size)
+			os.close(fd)
+
+	def __collect_write_metrics(self, write_time, sync_time, close_time, total_bytes):
+		'''
+		Collect metrics of outputs, fsync and close are reported by their maximum time
+		'''
+		max_write, min_write, avg_write = common.collect_bench_metrics(write_time, 5, self.__comm)
+		max_sync, _, _ = common.collect_bench_metrics(sync_time, 5, self.__comm)
+		max_close, _, _ = common.collect_bench_metrics(close_time, 5, self.__comm)
+		return max_write, min_write, avg_write, common.collect_bench_bandwidth(total_bytes, max_write), max_sync, max_close
+
+	def bench_inputs_with_multiple_files_multiple_readers_multiple_containers(self, container_name, directory_name, file_name):
+		'''
+		Benchmarking inputs with pattern `Multiple Files Multiple Readers`
+
+		Each processes will access a single file in its own directory exclusively.
+
+		param:
+		 container_name: source directory base, source directory for each processes is composed of container_name + '{:0>5}'.format(__mpi_rank)
+		 directory_name: ignored
+		 file_name: source file base, source file name for each processes is composed of file_name + '{:0>5}'.format(__mpi_rank)
+
+		return:
+		 max_read: maximum read time
+		 min_read: minimum read time
+		 avg_read: average read time
+		'''
+		proc_file_name = self.__get_rank_path(container_name, file_name, self.__mpi_rank)
+
+		return self.bench_inputs_with_single_file_multiple_readers(container_name, directory_name, proc_file_name)
+
+	def bench_outputs_with_single_file_multiple_writers(self, container_name, directory_name, file_name, output_per_rank, data = None):
+		'''
+		Benchmarking outputs with pattern `Single File Multiple Writers`
+
+		Each processes writes its section of a single shared file at offset rank * output_per_rank with pwrite.
+		The file is created and preallocated by rank 0 beforehand.
+
+		param:
+		 container_name: ignored
+		 directory_name: ignored
+		 file_name: target file
+		 output_per_rank: size of outputs per rank in MiB
+		 data: optional cached data for outputs
+
+		return:
+		 max_write_time: maximum writing time
+		 min_write_time: minimum writing time
+		 avg_write_time: average writing time
+		 bandwidth: collective bandwidth in MiB/s, total outputs divided by maximum writing time
+		 max_sync_time: maximum fsync time
+		 max_close_time: maximum close time
+		'''
+		# Data prepare
+		output_per_rank_in_bytes = output_per_rank << 20 # in bytes
+		if data == None:
+			data = common.workload_generator(self.__mpi_rank, output_per_rank_in_bytes)
+
+		self.__create_shared_file(file_name, output_per_rank_in_bytes * self.__mpi_size)
+
+		self.__comm.Barrier()
+		start = MPI.Wtime()
+		fd = os.open(file_name, os.O_WRONLY)
+		_, sync_time, close_time = self.__write_file(fd, data, self.__mpi_rank * output_per_rank_in_bytes)
+		write_time = MPI.Wtime() - start - sync_time - close_time
+		self.__comm.Barrier()
+
+		return self.__collect_write_metrics(write_time, sync_time, close_time, output_per_rank_in_bytes * self.__mpi_size)
+
+	def bench_outputs_with_write_behind(self, container_name, directory_name, file_name, output_per_rank, data = None, memory_cap = BaseBench.WRITE_BEHIND_CAP_DEFAULT, threads = None):
+		'''
+		Benchmarking outputs with pattern `Single File Write-Behind`
+
+		The section of each processes in a single shared file is handed to a write-behind staging area in chunks of write_chunk_size
+		and written with pwrite on background threads, so that the application continues as soon as buffers are copied,
+		unless memory_cap is reached. The file is created and preallocated by rank 0 beforehand.
+		The flush waits for every chunk, then fsync if enabled and close the file.
+
+		param:
+		 container_name: ignored
+		 directory_name: ignored
+		 file_name: target file
+		 output_per_rank: size of outputs per rank in MiB
+		 data: optional cached data for outputs
+		 memory_cap: maximum staged outputs per rank in MiB
+		 threads: number of background write threads, 1 by default
+
+		return:
+		 max_visible_time: maximum time the application was blocked
+		 min_visible_time: minimum time the application was blocked
+		 avg_visible_time: average time the application was blocked
+		 max_durable_time: maximum time to durability
+		 min_durable_time: minimum time to durability
+		 avg_durable_time: average time to durability
+		 bandwidth: collective bandwidth in MiB/s, total outputs divided by maximum time to durability
+		 max_stall_time: maximum time blocked by the memory cap
+		'''
+		# Data prepare
+		output_per_rank_in_bytes = output_per_rank << 20 # in bytes
+		if data == None:
+			data = common.workload_generator(self.__mpi_rank, output_per_rank_in_bytes)
+		view = memoryview(data)
+		base = self.__mpi_rank * output_per_rank_in_bytes
+		self.__create_shared_file(file_name, output_per_rank_in_bytes * self.__mpi_size)
+		staging = write_behind.WriteBehind(memory_cap << 20, threads or 1)
+
+		self.__comm.Barrier()
+		start = MPI.Wtime()
+		fd = os.open(file_name, os.O_WRONLY)
+		for chunk_start, chunk_end in ranged_io.split_ranges(0, output_per_rank_in_bytes, self.__write_chunk_size_in_bytes):
+			staging.submit(view[chunk_start:chunk_end + 1], functools.partial(self.__pwrite, fd, offset=base + chunk_start))
+		visible_end = MPI.Wtime()
+		# Flush
+		try:
+			staging.flush()
+			if self.__fsync:
+				os.fsync(fd)
+		finally:
+			os.close(fd)
+		# Outputs are durable once every rank has closed its file, as for the block list committed after the flush of all ranks on Azure Blob
+		self.__comm.Barrier()
+		durable_end = MPI.Wtime()
+
+		return common.collect_write_behind_metrics(visible_end - start, durable_end - start, staging.stall_time, output_per_rank_in_bytes * self.__mpi_size, 5, self.__comm)
+
+	def bench_metadata_operations(self, container_name, directory_name, file_name, object_count, object_size, concurrency = None):
+		'''
+		Benchmarking many small objects with pattern `Many Small Objects`
+
+		Each processes creates object_count files of object_size KiB named '{:0>7}'.format(index) in its own directory
+		file_name + '{:0>5}'.format(__mpi_rank), then stats them with os.stat, reads them, lists the directory with os.listdir
+		and removes them. Phases are separated by barriers and keep concurrency calls in flight per rank.
+		Directories are created beforehand, with the stripe settings of the rank if given, and removed afterwards.
+
+		param:
+		 container_name: ignored
+		 directory_name: ignored
+		 file_name: directory base of each processes
+		 object_count: number of files per rank
+		 object_size: size of each file in KiB
+		 concurrency: calls in flight per rank, 1 by default
+
+		return:
+		 max_time: maximum time of all phases
+		 min_time: minimum time of all phases
+		 avg_time: average time of all phases
+		 create_rate: files created per second of all processes
+		 stat_rate: os.stat calls per second of all processes
+		 read_rate: files read per second of all processes
+		 list_rate: listed files per second of all processes
+		 delete_rate: files removed per second of all processes
+		'''
+		concurrency = concurrency or 1
+		payload = common.workload_generator(self.__mpi_rank, object_size << 10)
+		rank_directory_name = file_name + '{:0>5}'.format(self.__mpi_rank)
+		paths = [(os.path.join(rank_directory_name, '{:0>7}'.format(i)),) for i in range(0, object_count)]
+		listed = []
+		if not os.path.isdir(rank_directory_name):
+			os.makedirs(rank_directory_name)
+			self.__set_stripe(rank_directory_name, self.__mpi_rank)
+
+		phase_times = [
+			common.time_phase(lambda path: self.__write_file(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644), payload), paths, concurrency, self.__comm),
+			common.time_phase(os.stat, paths, concurrency, self.__comm),
+			common.time_phase(self.__read_small_file, paths, concurrency, self.__comm),
+			common.time_phase(lambda: listed.extend(os.listdir(rank_directory_name)), [()], 1, self.__comm),
+			common.time_phase(os.remove, paths, concurrency, self.__comm)
+		]
+		os.rmdir(rank_directory_name)
+		phase_counts = [object_count, object_count, object_count, len(listed), object_count]
+
+		max_time, min_time, avg_time = common.collect_bench_metrics(sum(phase_times), comm=self.__comm)
+		rates = common.collect_bench_rates(phase_times, phase_counts, comm=self.__comm)
+		return (max_time, min_time, avg_time) + tuple(rates)
+
+	def __read_small_file(self, path):
+		'''
+		Read a small file entirely in one call
+		'''
+		with open(path, 'rb', buffering=0) as f:
+			return f.readall()
+
 	def bench_outputs_with_multiple_files_multiple_writers(self, container_name, directory_name, file_name, output_per_rank, data = None):
 		'''
 		Benchmarking outputs with pattern `Multiple Files Multiple Writers`
@@ -92,19 +583,56 @@ class CirrusLustreBench(BaseBench):
 		 max_write_time: maximum writing time
 		 min_write_time: minimum writing time
 		 avg_write_time: average writing time
+		 bandwidth: collective bandwidth in MiB/s, total outputs divided by maximum writing time
+		 max_sync_time: maximum fsync time
+		 max_close_time: maximum close time
+		'''
+		return self.__write_rank_file(file_name + '{:0>5}'.format(self.__mpi_rank), output_per_rank, data)
+
+	def bench_outputs_with_multiple_files_multiple_writers_multiple_containers(self, container_name, directory_name, file_name, output_per_rank, data = None):
+		'''
+		Benchmarking outputs with pattern `Multiple Files Multiple Writers`
+
+		Each processes will access a single file in its own directory exclusively.
+		Directories are created beforehand, with the stripe settings of the rank if given.
+
+		param:
+		 container_name: target directory base, target directory is composed of container_name + '{:0>5}'.format(__mpi_rank)
+		 directory_name: ignored
+		 file_name: target file base, target file name is composed of file_name + '{:0>5}'.format(__mpi_rank)
+		 output_per_rank: size of outputs per rank in MiB
+		 data: optional cached data for outputs
+
+		return:
+		 max_write_time: maximum writing time
+		 min_write_time: minimum writing time
+		 avg_write_time: average writing time
+		 bandwidth: collective bandwidth in MiB/s, total outputs divided by maximum writing time
+		 max_sync_time: maximum fsync time
+		 max_close_time: maximum close time
+		'''
+		output_file_name = self.__get_rank_path(container_name, file_name, self.__mpi_rank)
+		output_directory_name = os.path.dirname(output_file_name)
+		if not os.path.isdir(output_directory_name):
+			os.makedirs(output_directory_name)
+			self.__set_stripe(output_directory_name, self.__mpi_rank)
+
+		return self.__write_rank_file(output_file_name, output_per_rank, data)
+
+	def __write_rank_file(self, output_file_name, output_per_rank, data):
+		'''
+		Write the exclusive file of current rank, opening the file is included in the writing time
 		'''
 		# Data prepare
 		output_per_rank_in_bytes = output_per_rank << 20 # in bytes
 		if data == None:
 			data = common.workload_generator(self.__mpi_rank, output_per_rank_in_bytes)
 
-		output_file_name = file_name + '{:0>5}'.format(self.__mpi_rank)
-
-		MPI.COMM_WORLD.Barrier()
+		self.__comm.Barrier()
 		start = MPI.Wtime()
-		with open(output_file_name, 'wb') as f:
-			f.write(data)
-		end = MPI.Wtime()
-		MPI.COMM_WORLD.Barrier()
+		fd = os.open(output_file_name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+		_, sync_time, close_time = self.__write_file(fd, data)
+		write_time = MPI.Wtime() - start - sync_time - close_time
+		self.__comm.Barrier()
 
-		return common.collect_bench_metrics(end - start, 5)
\ No newline at end of file
+		return self.__collect_write_metrics(write_time, sync_time, close_time, output_per_rank_in_bytes * self.__mpi_size)
@@ -0,0 +1,361 @@
+import os
+from mpi4py import MPI
+from tool.base_bench import BaseBench
+from common import common, ranged_io, collective
+
+class MPIIOBench(BaseBench):
+	'''
+	Tools for benchmarking MPI-IO performance on any POSIX file system for HPC purpose.
+	MPI is used for process management and for I/O.
+
+	Shared files are accessed with MPI.File either independently (Read_at/Write_at)
+	or collectively (Read_at_all/Write_at_all), so that the two-phase I/O of the MPI library is exercised.
+	Containers and directories are ignored, file names are paths.
+
+	param:
+	 access: `independent` or `collective`
+	 hints: optional dict of MPI-IO hints, e.g. striping_factor, striping_unit, romio_cb_read, romio_cb_write, cb_nodes, cb_buffer_size
+	 chunk_size: size of each read or write call in KiB, calls are split so that counts fit in an MPI int
+	 request_histogram: optional LatencyHistogram recording latency and size of every read or write call
+	 comm: communicator of processes taking part in the benches, MPI.COMM_WORLD by default
+	'''
+	CHUNK_DEFAULT = 1048576 # in KiB
+	CHUNK_LIMIT = (1 << 31) - 1 # in bytes, maximum count of an MPI call
+
+	__slots__ = ('__comm', '__mpi_rank', '__mpi_size', '__collective', '__hints', '__chunk_size_in_bytes', '__request_histogram')
+
+	def __init__(self, access = 'independent', hints = None, chunk_size = CHUNK_DEFAULT, request_histogram = None, comm = MPI.COMM_WORLD):
+		super(MPIIOBench, self).__init__(None, None, [], comm)
+		if access not in ('independent', 'collective'):
+			raise ValueError('Unknown MPI-IO access {}'.format(access))
+		self.__collective = access == 'collective'
+		self.__hints = dict(hints or {})
+		self.__chunk_size_in_bytes = min(chunk_size << 10, self.CHUNK_LIMIT)
+		self.__request_histogram = request_histogram
+
+	def set_comm(self, comm):
+		'''
+		Bind the tool to the communicator of processes taking part in the following benches
+		'''
+		super(MPIIOBench, self).set_comm(comm)
+		self.__comm = comm
+		self.__mpi_rank = comm.Get_rank()
+		self.__mpi_size = comm.Get_size()
+
+	def __open(self, comm, file_name, amode):
+		'''
+		Open a file collectively over comm with the configured hints
+		'''
+		info = MPI.Info.Create()
+		for key, value in self.__hints.items():
+			info.Set(key, str(value))
+		try:
+			return MPI.File.Open(comm, file_name, amode, info)
+		finally:
+			info.Free()
+
+	def __transfer(self, fh, offset, view, write, rounds = None):
+		'''
+		Read or write `view` at `offset` of the current file view in calls of at most chunk_size bytes.
+
+		Collective calls must be issued by every rank of the file the same number of times,
+		ranks with fewer chunks join the remaining rounds with empty buffers.
+
+		param:
+		 fh: MPI.File
+		 offset: offset in bytes of the file view
+		 view: buffer to be read into or written from
+		 write: indicate whether to write
+		 rounds: number of calls, the number of chunks of view by default
+		'''
+		length = len(view)
+		chunk_size = self.__chunk_size_in_bytes
+		if rounds is None:
+			rounds = -(-length // chunk_size)
+		if write:
+			transfer = fh.Write_at_all if self.__collective else fh.Write_at
+		else:
+			transfer = fh.Read_at_all if self.__collective else fh.Read_at
+		for index in range(0, rounds):
+			start = min(index * chunk_size, length)
+			end = min(start + chunk_size, length)
+			request_start = MPI.Wtime()
+			transfer(offset + start, [view[start:end], MPI.BYTE])
+			if self.__request_histogram is not None and end > start:
+				self.__request_histogram.record(MPI.Wtime() - request_start, end - start)
+
+	def __get_rounds(self, comm, length):
+		'''
+		Number of calls needed by the rank with the longest transfer, so that collective calls are matched
+		'''
+		rounds = -(-length // self.__chunk_size_in_bytes)
+		if self.__collective:
+			rounds = comm.allreduce(rounds, op=MPI.MAX)
+		return rounds
+
+	def __read_file(self, comm, file_name):
+		'''
+		Read an entire file on every rank of comm, chunk by chunk into a single reused buffer
+		'''
+		fh = self.__open(comm, file_name, MPI.MODE_RDONLY)
+		file_size = fh.Get_size()
+		view = ranged_io.get_read_buffer(min(self.__chunk_size_in_bytes, file_size))
+		for offset in range(0, file_size, self.__chunk_size_in_bytes):
+			self.__transfer(fh, offset, view[0:min(self.__chunk_size_in_bytes, file_size - offset)], False, 1)
+		fh.Close()
+
+	def get_input_size(self, container_name, directory_name, file_name, layout = 'single'):
+		'''
+		Size of the source read by current rank, named the same way as by the input patterns
+
+		param:
+		 container_name: source container, ignored
+		 directory_name: source directory, ignored
+		 file_name: source file, or source file base for the multiple-file layouts
+		 layout: `single` for a source shared by all ranks, `multiple` for the sources of MFMR, `multiple_containers` for the sources of MFMRMC
+
+		return:
+		 size: size of the source in bytes
+		'''
+		if layout == 'multiple_containers':
+			raise NotImplementedError()
+		if layout == 'multiple':
+			file_name = file_name + '{:0>5}'.format(self.__mpi_rank)
+		return os.path.getsize(file_name)
+
+	def bench_inputs_with_single_file_multiple_readers(self, container_name, directory_name, file_name):
+		'''
+		Benchmarking inputs with pattern `Single File Multiple Readers`
+
+		Every processes reads the entire shared file.
+
+		param:
+		 container_name: ignored
+		 directory_name: ignored
+		 file_name: source file
+
+		return:
+		 max_read: maximum read time
+		 min_read: minimum read time
+		 avg_read: average read time
+		'''
+		self.__comm.Barrier()
+		start = MPI.Wtime()
+		self.__read_file(self.__comm, file_name)
+		end = MPI.Wtime()
+		self.__comm.Barrier()
+
+		return common.collect_bench_metrics(end - start, 5, self.__comm)
+
+	def bench_inputs_with_multiple_files_multiple_readers(self, container_name, directory_name, file_name):
+		'''
+		Benchmarking inputs with pattern `Multiple Files Multiple Readers`
+
+		Each processes reads a single file exclusively, opened over MPI.COMM_SELF.
+
+		param:
+		 container_name: ignored
+		 directory_name: ignored
+		 file_name: source file base, source file name for each processes is composed of file_name + '{:0>5}'.format(__mpi_rank)
+
+		return:
+		 max_read: maximum read time
+		 min_read: minimum read time
+		 avg_read: average read time
+		'''
+		proc_file_name = file_name + '{:0>5}'.format(self.__mpi_rank)
+
+		self.__comm.Barrier()
+		start = MPI.Wtime()
+		self.__read_file(MPI.COMM_SELF, proc_file_name)
+		end = MPI.Wtime()
+		self.__comm.Barrier()
+
+		return common.collect_bench_metrics(end - start, 5, self.__comm)
+
+	def bench_inputs_with_single_reader_broadcast(self, container_name, directory_name, file_name, reader = 'root', chunk_size = BaseBench.BROADCAST_CHUNK_DEFAULT):
+		'''
+		Benchmarking inputs with pattern `Single Reader & Broadcast`
+
+		A single reader reads the source with MPI-IO and distributes it to other processes with MPI broadcast,
+		reading the next chunk overlaps with broadcasting the previous one.
+
+		param:
+		 container_name: ignored
+		 directory_name: ignored
+		 file_name: source file
+		 reader: `root` for a single reader on rank 0, `node` for one reader per node
+		 chunk_size: size of each broadcast chunk in KiB
+
+		return:
+		 max_read: maximum read time
+		 min_read: minimum read time
+		 avg_read: average read time
+		'''
+		comm = collective.get_broadcast_comm(reader, self.__comm)
+		fh = None
+		file_size = None
+		if 0 == comm.Get_rank():
+			fh = self.__open(MPI.COMM_SELF, file_name, MPI.MODE_RDONLY)
+			file_size = fh.Get_size()
+		file_size = comm.bcast(file_size, root=0)
+
+		def fetch_into(start_range, end_range, view):
+			self.__transfer(fh, start_range, view, False)
+
+		self.__comm.Barrier()
+		start = MPI.Wtime()
+		collective.pipelined_broadcast(comm, fetch_into, file_size, chunk_size << 10)
+		end = MPI.Wtime()
+		self.__comm.Barrier()
+
+		if fh is not None:
+			fh.Close()
+		if comm != self.__comm:
+			comm.Free()
+
+		return common.collect_bench_metrics(end - start, 5, self.__comm)
+
+	def bench_inputs_with_single_file_partitioned_readers(self, container_name, directory_name, file_name, layout = 'contiguous', stripe_size = BaseBench.PARTITION_STRIPE_DEFAULT, allgather = False):
+		'''
+		Benchmarking inputs with pattern `Single File Partitioned Readers`
+
+		Each processes reads only its share of a shared file, either one contiguous section or stripes assigned round-robin.
+		Stripes are described by a file view, so that each processes reads all its stripes with the same calls.
+		Optionally, shares are exchanged with MPI_Allgatherv afterwards so that every processes holds the entire file.
+
+		param:
+		 container_name: ignored
+		 directory_name: ignored
+		 file_name: source file
+		 layout: `contiguous` or `strided`
+		 stripe_size: size of each stripe in KiB for the `strided` layout
+		 allgather: indicate whether to gather the entire file on every processes
+
+		return:
+		 max_read: maximum read time
+		 min_read: minimum read time
+		 avg_read: average read time
+		 bandwidth: collective bandwidth in MiB/s, file size divided by maximum read time
+		'''
+		stripe_size_in_bytes = stripe_size << 10
+		fh = self.__open(self.__comm, file_name, MPI.MODE_RDONLY)
+		file_size = fh.Get_size()
+		ranges = ranged_io.partition_ranges(file_size, self.__mpi_rank, self.__mpi_size, layout, stripe_size_in_bytes)
+		read_bytes = sum(end - start + 1 for start, end in ranges)
+		rounds = self.__get_rounds(self.__comm, read_bytes)
+
+		filetype = None
+		offset = ranges[0][0] if ranges else 0
+		if layout == 'strided':
+			# Stripe i of this rank is the i-th stripe of the view
+			stripe = MPI.BYTE.Create_contiguous(stripe_size_in_bytes)
+			filetype = stripe.Create_resized(0, self.__mpi_size * stripe_size_in_bytes)
+			filetype.Commit()
+			stripe.Free()
+			fh.Set_view(self.__mpi_rank * stripe_size_in_bytes, MPI.BYTE, filetype)
+			offset = 0
+
+		if not allgather:
+			share = ranged_io.get_read_buffer(read_bytes)
+		else:
+			# Stripes read through the file view are packed, they are placed at their offsets before being exchanged
+			share = memoryview(bytearray(read_bytes)) if layout == 'strided' else None
+			view = ranged_io.get_read_buffer(file_size)
+
+		self.__comm.Barrier()
+		start = MPI.Wtime()
+		if not allgather:
+			self.__transfer(fh, offset, share, False, rounds)
+		elif layout == 'contiguous':
+			self.__transfer(fh, offset, view[offset:offset + read_bytes], False, rounds)
+			collective.allgather_partitions(self.__comm, view, file_size, layout, stripe_size_in_bytes)
+		else:
+			self.__transfer(fh, offset, share, False, rounds)
+			position = 0
+			for range_start, range_end in ranges:
+				view[range_start:range_end + 1] = share[position:position + range_end - range_start + 1]
+				position = position + range_end - range_start + 1
+			collective.allgather_partitions(self.__comm, view, file_size, layout, stripe_size_in_bytes)
+		end = MPI.Wtime()
+		self.__comm.Barrier()
+
+		fh.Close()
+		if filetype is not None:
+			filetype.Free()
+
+		max_read, min_read, avg_read = common.collect_bench_metrics(end - start, 5, self.__comm)
+		return max_read, min_read, avg_read, common.collect_bench_bandwidth(file_size, max_read)
+
+	def bench_outputs_with_single_file_multiple_writers(self, container_name, directory_name, file_name, output_per_rank, data = None):
+		'''
+		Benchmarking outputs with pattern `Single File Multiple Writers`
+
+		Each processes writes its section of a shared file at offset rank * output_per_rank.
+		Closing the file, which flushes data to the file system, is included in the writing time.
+
+		param:
+		 container_name: ignored
+		 directory_name: ignored
+		 file_name: target file
+		 output_per_rank: size of outputs per rank in MiB
+		 data: optional cached data for outputs
+
+		return:
+		 max_write_time: maximum writing time
+		 min_write_time: minimum writing time
+		 avg_write_time: average writing time
+		 bandwidth: collective bandwidth in MiB/s, total outputs divided by maximum writing time
+		'''
+		output_per_rank_in_bytes = output_per_rank << 20 # in bytes
+		if data == None:
+			data = common.workload_generator(self.__mpi_rank, output_per_rank_in_bytes)
+
+		fh = self.__open(self.__comm, file_name, MPI.MODE_CREATE | MPI.MODE_WRONLY)
+		fh.Set_size(output_per_rank_in_bytes * self.__mpi_size)
+		view = memoryview(data)
+
+		self.__comm.Barrier()
+		start = MPI.Wtime()
+		self.__transfer(fh, self.__mpi_rank * output_per_rank_in_bytes, view, True)
+		fh.Close()
+		end = MPI.Wtime()
+		self.__comm.Barrier()
+
+		max_write, min_write, avg_write = common.collect_bench_metrics(end - start, 5, self.__comm)
+		return max_write, min_write, avg_write, common.collect_bench_bandwidth(output_per_rank_in_bytes * self.__mpi_size, max_write)
+
+	def bench_outputs_with_multiple_files_multiple_writers(self, container_name, directory_name, file_name, output_per_rank, data = None):
+		'''
+		Benchmarking outputs with pattern `Multiple Files Multiple Writers`
+
+		Each processes writes a single file exclusively, opened over MPI.COMM_SELF.
+
+		param:
+		 container_name: ignored
+		 directory_name: ignored
+		 file_name: target file base, target file name is composed of file_name + '{:0>5}'.format(__mpi_rank)
+		 output_per_rank: size of outputs per rank in MiB
+		 data: optional cached data for outputs
+
+		return:
+		 max_write_time: maximum writing time
+		 min_write_time: minimum writing time
+		 avg_write_time: average writing time
+		'''
+		output_per_rank_in_bytes = output_per_rank << 20 # in bytes
+		if data == None:
+			data = common.workload_generator(self.__mpi_rank, output_per_rank_in_bytes)
+
+		output_file_name = file_name + '{:0>5}'.format(self.__mpi_rank)
+
+		self.__comm.Barrier()
+		start = MPI.Wtime()
+		fh = self.__open(MPI.COMM_SELF, output_file_name, MPI.MODE_CREATE | MPI.MODE_WRONLY)
+		fh.Set_size(0)
+		self.__transfer(fh, 0, memoryview(data), True)
+		fh.Close()
+		end = MPI.Wtime()
+		self.__comm.Barrier()
+
+		return common.collect_bench_metrics(end - start, 5, self.__comm)
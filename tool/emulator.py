@@ -0,0 +1,326 @@
+import os, shutil, threading, time, random, base64
+
+LIST_PAGE_SIZE = 5000 # results per listing request of Azure Storage
+
+def _validate_type_bytes(param_name, param):
+	'''
+	Reject request bodies that are not bytes with the TypeError of Azure Storage SDK, which does not accept memoryview or bytearray
+	'''
+	if not isinstance(param, bytes):
+		raise TypeError('{0} should be of type bytes.'.format(param_name))
+
+class EmulatorHttpError(Exception):
+	'''
+	Error responded by the storage emulator, mirrors the status code of Azure Storage errors
+
+	param:
+	 status_code: HTTP status code
+	 message: error message
+	'''
+	def __init__(self, status_code, message):
+		super(EmulatorHttpError, self).__init__('{0}: {1}'.format(status_code, message))
+		self.status_code = status_code
+
+class _Model(object):
+	'''
+	Plain attribute holder mirroring the models returned by Azure Storage SDK
+	'''
+	def __init__(self, **kwargs):
+		self.__dict__.update(kwargs)
+
+class EmulatedLink(object):
+	'''
+	Emulated network link between a process and the storage service.
+
+	Every request waits for `latency`, payloads are serialized on a link capped at `bandwidth`,
+	and requests beyond `request_rate` per second are rejected with 503 Server Busy like Azure Storage does.
+
+	param:
+	 latency: latency of each request in ms
+	 bandwidth: bandwidth of the link in MiB/s, 0 for unlimited
+	 request_rate: accepted requests per second, 0 for unlimited
+	 throttle_probability: probability of rejecting any request with 503, drawn from a seeded generator
+	 seed: seed of the throttle generator
+	'''
+	__slots__ = ('__latency', '__bandwidth', '__request_rate', '__throttle_probability', '__random', '__lock', '__busy_until', '__tokens', '__refilled_at')
+
+	def __init__(self, latency = 0, bandwidth = 0, request_rate = 0, throttle_probability = 0, seed = 0):
+		self.__latency = latency / 1000.0
+		self.__bandwidth = bandwidth * float(1 << 20)
+		self.__request_rate = request_rate
+		self.__throttle_probability = throttle_probability
+		self.__random = random.Random(seed)
+		self.__lock = threading.Lock()
+		self.__busy_until = 0
+		self.__tokens = request_rate
+		self.__refilled_at = time.time()
+
+	def transfer(self, size):
+		'''
+		Account for a request moving `size` bytes, raises EmulatorHttpError if the request is throttled
+		'''
+		with self.__lock:
+			now = time.time()
+			if self.__request_rate:
+				self.__tokens = min(self.__request_rate, self.__tokens + (now - self.__refilled_at) * self.__request_rate)
+				self.__refilled_at = now
+				if self.__tokens < 1:
+					raise EmulatorHttpError(503, 'Server Busy')
+				self.__tokens = self.__tokens - 1
+			if self.__throttle_probability and self.__random.random() < self.__throttle_probability:
+				raise EmulatorHttpError(503, 'Server Busy')
+			done = now
+			if self.__bandwidth:
+				done = max(now, self.__busy_until) + size / self.__bandwidth
+				self.__busy_until = done
+		delay = done + self.__latency - time.time()
+		if delay > 0:
+			time.sleep(delay)
+
+class _EmulatedService(object):
+	'''
+	Objects are stored as files under `root`, so that processes on the same host or on a shared file system see the same objects
+	'''
+	__slots__ = ('__root', '__link')
+
+	def __init__(self, root, link):
+		self.__root = root
+		self.__link = link
+
+	def _path(self, *names):
+		return os.path.join(self.__root, *[name for name in names if name])
+
+	def _transfer(self, size):
+		self.__link.transfer(size)
+
+	def _properties(self, path):
+		if not os.path.exists(path):
+			raise EmulatorHttpError(404, 'The specified resource does not exist')
+		stat = os.stat(path)
+		etag = '"0x{0:X}{1:X}"'.format(stat.st_mtime_ns, stat.st_size)
+		return _Model(properties=_Model(content_length=stat.st_size, etag=etag, last_modified=stat.st_mtime))
+
+	def _read_range(self, path, start_range, end_range):
+		properties = self._properties(path)
+		size = properties.properties.content_length
+		start_range = 0 if start_range is None else start_range
+		end_range = size - 1 if end_range is None else min(end_range, size - 1)
+		self._transfer(end_range - start_range + 1)
+		with open(path, 'rb') as f:
+			f.seek(start_range)
+			content = f.read(end_range - start_range + 1)
+		properties.content = content
+		return properties
+
+	def _write(self, path, data, index = 0, count = None):
+		data = memoryview(data)[index:None if count is None else index + count]
+		self._transfer(len(data))
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		temp_path = '{0}.{1}.{2}.tmp'.format(path, os.getpid(), threading.get_ident())
+		with open(temp_path, 'wb') as f:
+			f.write(data)
+		os.replace(temp_path, path)
+		return self._properties(path).properties
+
+class EmulatedBlockBlobService(_EmulatedService):
+	'''
+	In-process stand-in for azure.storage.blob.BlockBlobService covering the operations used by the bench tools
+
+	param:
+	 root: directory holding containers and blobs
+	 link: EmulatedLink shaping every request
+	'''
+	__slots__ = ()
+
+	def __init__(self, root, link = None):
+		super(EmulatedBlockBlobService, self).__init__(os.path.join(root, 'blob'), link or EmulatedLink())
+
+	def __block_path(self, container_name, blob_name, block_id = None):
+		encoded_id = base64.urlsafe_b64encode(block_id.encode('utf-8')).decode('utf-8') if block_id else None
+		return self._path(container_name, '.blocks', blob_name, encoded_id)
+
+	def create_container(self, container_name, fail_on_exist = False, **kwargs):
+		self._transfer(0)
+		path = self._path(container_name)
+		if os.path.exists(path):
+			if fail_on_exist:
+				raise EmulatorHttpError(409, 'The specified container already exists')
+			return False
+		os.makedirs(path)
+		return True
+
+	def get_blob_properties(self, container_name, blob_name, **kwargs):
+		self._transfer(0)
+		return self._properties(self._path(container_name, blob_name))
+
+	def get_blob_to_bytes(self, container_name, blob_name, start_range = None, end_range = None, **kwargs):
+		return self._read_range(self._path(container_name, blob_name), start_range, end_range)
+
+	def get_blob_to_stream(self, container_name, blob_name, stream, start_range = None, end_range = None, **kwargs):
+		blob = self._read_range(self._path(container_name, blob_name), start_range, end_range)
+		stream.write(blob.content)
+		return blob
+
+	def create_blob_from_bytes(self, container_name, blob_name, blob, index = 0, count = None, **kwargs):
+		_validate_type_bytes('blob', blob)
+		return self._write(self._path(container_name, blob_name), blob, index, count)
+
+	def delete_blob(self, container_name, blob_name, **kwargs):
+		self._transfer(0)
+		path = self._path(container_name, blob_name)
+		if not os.path.exists(path):
+			raise EmulatorHttpError(404, 'The specified blob does not exist')
+		os.remove(path)
+
+	def list_blobs(self, container_name, prefix = None, **kwargs):
+		'''
+		Blobs of a container in name order, one request is accounted per LIST_PAGE_SIZE results like the paged listing of Azure Storage
+		'''
+		root = self._path(container_name)
+		if not os.path.isdir(root):
+			raise EmulatorHttpError(404, 'The specified container does not exist')
+		names = []
+		for folder, directories, files in os.walk(root):
+			directories[:] = [directory for directory in directories if directory != '.blocks']
+			for name in files:
+				if not name.endswith('.tmp'):
+					names.append(os.path.relpath(os.path.join(folder, name), root).replace(os.sep, '/'))
+		names = sorted(name for name in names if prefix is None or name.startswith(prefix))
+		for _ in range(0, max(1, -(-len(names) // LIST_PAGE_SIZE))):
+			self._transfer(0)
+		return [_Model(name=name) for name in names]
+
+	def put_block(self, container_name, blob_name, block, block_id, **kwargs):
+		if hasattr(block, 'read'):
+			block = block.read()
+		elif not isinstance(block, bytes):
+			raise TypeError('block should be of type bytes or a readable file-like/io.IOBase stream object.')
+		self._write(self.__block_path(container_name, blob_name, block_id), block)
+
+	def get_block_list(self, container_name, blob_name, block_list_type = None, **kwargs):
+		self._transfer(0)
+		block_dir = self.__block_path(container_name, blob_name)
+		blocks = []
+		if os.path.isdir(block_dir):
+			for encoded_id in os.listdir(block_dir):
+				if encoded_id.endswith('.tmp'):
+					continue
+				block_id = base64.urlsafe_b64decode(encoded_id.encode('utf-8')).decode('utf-8')
+				blocks.append(_Model(id=block_id, size=os.path.getsize(os.path.join(block_dir, encoded_id))))
+		return _Model(committed_blocks=[], uncommitted_blocks=blocks)
+
+	def put_block_list(self, container_name, blob_name, block_list, **kwargs):
+		self._transfer(0)
+		path = self._path(container_name, blob_name)
+		temp_path = '{0}.{1}.commit.tmp'.format(path, os.getpid())
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		with open(temp_path, 'wb') as f:
+			for block in block_list:
+				block_path = self.__block_path(container_name, blob_name, block.id)
+				if not os.path.exists(block_path):
+					raise EmulatorHttpError(400, 'The specified block list is invalid')
+				with open(block_path, 'rb') as block_file:
+					shutil.copyfileobj(block_file, f)
+		os.replace(temp_path, path)
+		for block in block_list:
+			os.remove(self.__block_path(container_name, blob_name, block.id))
+		return self._properties(path).properties
+
+class EmulatedFileService(_EmulatedService):
+	'''
+	In-process stand-in for azure.storage.file.FileService covering the operations used by the bench tools
+
+	param:
+	 root: directory holding shares, directories and files
+	 link: EmulatedLink shaping every request
+	'''
+	__slots__ = ()
+
+	def __init__(self, root, link = None):
+		super(EmulatedFileService, self).__init__(os.path.join(root, 'file'), link or EmulatedLink())
+
+	def create_share(self, share_name, fail_on_exist = False, **kwargs):
+		self._transfer(0)
+		path = self._path(share_name)
+		if os.path.exists(path):
+			if fail_on_exist:
+				raise EmulatorHttpError(409, 'The specified share already exists')
+			return False
+		os.makedirs(path)
+		return True
+
+	def get_file_properties(self, share_name, directory_name, file_name, **kwargs):
+		self._transfer(0)
+		return self._properties(self._path(share_name, directory_name, file_name))
+
+	def get_file_to_bytes(self, share_name, directory_name, file_name, start_range = None, end_range = None, **kwargs):
+		return self._read_range(self._path(share_name, directory_name, file_name), start_range, end_range)
+
+	def get_file_to_stream(self, share_name, directory_name, file_name, stream, start_range = None, end_range = None, **kwargs):
+		file = self._read_range(self._path(share_name, directory_name, file_name), start_range, end_range)
+		stream.write(file.content)
+		return file
+
+	def create_file(self, share_name, directory_name, file_name, content_length, **kwargs):
+		self._transfer(0)
+		path = self._path(share_name, directory_name, file_name)
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		with open(path, 'wb') as f:
+			f.truncate(content_length)
+
+	def create_file_from_bytes(self, share_name, directory_name, file_name, file, index = 0, count = None, **kwargs):
+		_validate_type_bytes('file', file)
+		return self._write(self._path(share_name, directory_name, file_name), file, index, count)
+
+	def create_directory(self, share_name, directory_name, fail_on_exist = False, **kwargs):
+		self._transfer(0)
+		path = self._path(share_name, directory_name)
+		if os.path.exists(path):
+			if fail_on_exist:
+				raise EmulatorHttpError(409, 'The specified resource already exists')
+			return False
+		os.makedirs(path)
+		return True
+
+	def delete_directory(self, share_name, directory_name, fail_not_exist = False, **kwargs):
+		self._transfer(0)
+		path = self._path(share_name, directory_name)
+		if not os.path.isdir(path):
+			if fail_not_exist:
+				raise EmulatorHttpError(404, 'The specified resource does not exist')
+			return False
+		if os.listdir(path):
+			raise EmulatorHttpError(409, 'The specified directory is not empty')
+		os.rmdir(path)
+		return True
+
+	def delete_file(self, share_name, directory_name, file_name, **kwargs):
+		self._transfer(0)
+		path = self._path(share_name, directory_name, file_name)
+		if not os.path.isfile(path):
+			raise EmulatorHttpError(404, 'The specified resource does not exist')
+		os.remove(path)
+
+	def list_directories_and_files(self, share_name, directory_name = None, **kwargs):
+		'''
+		Directories and files of a directory in name order, one request is accounted per LIST_PAGE_SIZE results
+		'''
+		path = self._path(share_name, directory_name)
+		if not os.path.isdir(path):
+			raise EmulatorHttpError(404, 'The specified resource does not exist')
+		names = sorted(name for name in os.listdir(path) if not name.endswith('.tmp'))
+		for _ in range(0, max(1, -(-len(names) // LIST_PAGE_SIZE))):
+			self._transfer(0)
+		return [_Model(name=name) for name in names]
+
+	def update_range(self, share_name, directory_name, file_name, data, start_range, end_range, **kwargs):
+		_validate_type_bytes('data', data)
+		if len(data) != end_range - start_range + 1:
+			raise EmulatorHttpError(400, 'The range specified is invalid for the current size of the data')
+		self._transfer(len(data))
+		path = self._path(share_name, directory_name, file_name)
+		if not os.path.exists(path):
+			raise EmulatorHttpError(404, 'The specified resource does not exist')
+		with open(path, 'r+b') as f:
+			f.seek(start_range)
+			f.write(data)